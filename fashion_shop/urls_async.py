@@ -0,0 +1,13 @@
+"""
+URL configuration used for requests served over ASGI.
+
+AsyncUrlconfMiddleware switches ASGI requests to this module: the catalogue read paths
+resolve to async views first, everything else falls through to fashion_shop.urls.
+"""
+from django.urls import path, include
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('store.urls_async')),
+    path('', include('store.urls_async')),
+] + sync_urlpatterns
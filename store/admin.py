@@ -1,30 +1,95 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Category, Brand, Product, Cart, CartItem, Review
+from .models import Category, Brand, Product, Cart, CartItem, Order, OrderLine, Review, Job
+from .pagination import EstimatedCountPaginator
+from .search import search_products
 
-admin.site.register(Category)
-admin.site.register(Brand)
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Lista dużej tabeli: liczba wierszy z estimate_count zamiast COUNT(*) przy każdej
+    stronie, bez drugiego COUNT dla licznika "z ... wszystkich".
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ["sku", "name", "price", "stock_count", "sale", "created_at"]
+class CappedInline(admin.TabularInline):
+    """Inline długiej listy (np. zamówienia użytkownika) - tylko max_rows najnowszych wierszy."""
+    max_rows = 20
+    newest_first = ['-id']
+
+    def capped_queryset(self, queryset, obj):
+        latest = queryset.filter(**{self.fk_name: obj}).order_by(*self.newest_first).values_list('pk', flat=True)
+        return queryset.filter(pk__in=list(latest[:self.max_rows])).order_by(*self.newest_first)
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+@admin.register(Brand)
+class BrandAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+class ProductAdmin(LargeTableAdmin):
+    list_display = ["sku", "name", "brand", "category", "price", "stock_count", "reserved_count", "sale", "created_at"]
+    list_select_related = ["brand", "category"]
     list_filter = ["category", "brand", "sale", "created_at"]
     readonly_fields = ["created_at", "updated_at", "sku"]
-    search_fields = ["name", "sku"]
+    autocomplete_fields = ["brand", "category", "owner"]
+    # Sortowanie tylko po kolumnach z indeksem.
+    sortable_by = ["sku", "price", "created_at"]
+    search_fields = ["sku__exact"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """SKU - dokładnie, po unikalnym indeksie; inne frazy - indeks pełnotekstowy (search.py), także w autocomplete."""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        by_sku = queryset.filter(sku=term.upper())
+        if by_sku.exists():
+            return by_sku, False
+        return search_products(queryset, term), False
 
 admin.site.register(Product, ProductAdmin)
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
+    autocomplete_fields = ['product']
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'is_ordered', 'status', 'created_at']
-    list_filter = ['status', 'is_ordered', 'created_at']
-    list_editable = ['status']
+class CartAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'is_ordered', 'item_count', 'total_price', 'created_at']
+    list_select_related = ['user']
+    list_filter = ['is_ordered', 'created_at']
+    search_fields = ['user__username__startswith']
+    sortable_by = ['id']
+    autocomplete_fields = ['user']
     inlines = [CartItemInline]
 
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    can_delete = False
+    fields = ['product_name', 'sku', 'quantity', 'unit_price', 'line_total']
+    readonly_fields = fields
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    """Zamówienia są niezmienne - w panelu edytowalny jest tylko status."""
+    list_display = ['id', 'user', 'ordered_at', 'status', 'item_count', 'total_price']
+    list_filter = ['status', 'ordered_at']
+    list_editable = ['status']
+    list_select_related = ['user']
+    search_fields = ['user__username__startswith']
+    sortable_by = ['id', 'ordered_at']
+    readonly_fields = ['user', 'cart', 'ordered_at', 'item_count', 'total_price']
+    inlines = [OrderLineInline]
+    def has_add_permission(self, request):
+        return False
+
 class ActiveCartInline(admin.TabularInline):
     model = Cart
     fk_name = "user"
@@ -36,37 +101,64 @@ class ActiveCartInline(admin.TabularInline):
     readonly_fields = ['created_at']
     def get_queryset(self, request):
         return super().get_queryset(request).filter(is_ordered=False)
-    
-class HistoryCartInline(admin.TabularInline):
-    model = Cart
+
+class OrderHistoryInline(CappedInline):
+    model = Order
     fk_name = "user"
-    verbose_name = "Zrealizowane "
-    verbose_name_plural = "Historia Zamówień"
+    newest_first = ['-ordered_at', '-id']
+    verbose_name = "Zamówienie"
+    verbose_name_plural = f"Historia Zamówień (ostatnie {CappedInline.max_rows})"
     extra = 0
+    can_delete = False
     show_change_link = True
-    fields = ['ordered_at', 'is_ordered', 'status']
-    readonly_fields = ['ordered_at', 'is_ordered']  
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(is_ordered=True)
+    fields = ['ordered_at', 'status', 'item_count', 'total_price']
+    readonly_fields = ['ordered_at', 'item_count', 'total_price']
+    def has_add_permission(self, request, obj=None):
+        return False
 
-class ReviewInline(admin.TabularInline):
+class ReviewInline(CappedInline):
     model = Review
+    fk_name = "user"
+    newest_first = ['-created_at', '-id']
+    verbose_name_plural = f"Opinie (ostatnie {CappedInline.max_rows})"
     extra = 0
     readonly_fields = ('created_at',)
     fields = ('product', 'rating', 'content', 'created_at')
+    autocomplete_fields = ('product',)
     can_delete = True
 
 class UserAdmin(BaseUserAdmin):
-    inlines = [ActiveCartInline, HistoryCartInline, ReviewInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Także dla autocomplete użytkownika w koszykach, opiniach i produktach.
+    search_fields = ['username__startswith']
+    inlines = [ActiveCartInline, OrderHistoryInline, ReviewInline]
+
+    def get_formset_kwargs(self, request, obj, inline, prefix):
+        kwargs = super().get_formset_kwargs(request, obj, inline, prefix)
+        if isinstance(inline, CappedInline) and obj.pk:
+            kwargs['queryset'] = inline.capped_queryset(kwargs['queryset'], obj)
+        return kwargs
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdmin):
     list_display = ['product', 'user', 'rating', 'created_at']
+    list_select_related = ['product', 'user']
     list_filter = ['rating', 'created_at']
-    search_fields = ['content']
+    # SKU produktu i początek loginu autora - pola z unikalnym indeksem zamiast skanu treści.
+    search_fields = ['product__sku__exact', 'user__username__startswith']
+    sortable_by = []
+    autocomplete_fields = ['product', 'user']
     readonly_fields = ['created_at']
 
 
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['idempotency_key']
+    readonly_fields = ['created_at', 'locked_by', 'locked_at', 'last_error']
+
+
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
-
@@ -0,0 +1,117 @@
+"""
+Widoki async gorących ścieżek katalogu - listy i szczegóły produktu, HTML i API.
+
+Pod ASGI AsyncUrlconfMiddleware kieruje na nie te same adresy (fashion_shop/urls_async.py),
+pod WSGI działają dalej widoki synchroniczne z views.py - async pod WSGI kosztowałby
+osobną pętlę zdarzeń na każde żądanie. Odczyt nie zajmuje wątku na czas oczekiwania
+na bazę, a niezależne zapytania (produkt i strona opinii) idą równolegle przez
+asyncio.gather. Cache stron i warunkowe GET-y działają tak samo jak w wersji synchronicznej.
+
+Zapisy (POST/PUT/DELETE) i przeglądarkowe API DRF wracają do widoków synchronicznych
+w wątku - DRF 3.16 nie obsługuje widoków async.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from . import views
+from .caching import cache_anonymous_page, detail_scopes, list_scopes
+from .conditional import conditional_detail, conditional_list
+from .models import Product, Review
+from .pagination import cursor_requested
+from .reviews import review_page
+from .serializers import ProductSerializer, ReviewSerializer
+
+sync_product_list = views.ProductList.as_view()
+sync_product_detail = views.ProductDetail.as_view()
+
+
+def wants_browsable_api(request):
+    return request.GET.get('format') == 'api' or 'text/html' in request.headers.get('Accept', '')
+
+
+def json_response(data, status=200):
+    response = HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+async def product_list(request):
+    if request.method != 'GET' or wants_browsable_api(request):
+        return await sync_to_async(sync_product_list)(request)
+    return await cached_product_list(request)
+
+
+@cache_anonymous_page(lambda request: list_scopes(request.GET))
+@conditional_list(keyset=cursor_requested)
+async def cached_product_list(request):
+    try:
+        data = await sync_to_async(paginated_product_list)(request)
+    except APIException as exc:
+        # Np. NotFound dla ?page=99 - ten sam błąd co pod WSGI, nie wyjątek z widoku.
+        return json_response({'detail': exc.detail}, exc.status_code)
+    return json_response(data)
+
+
+def paginated_product_list(request):
+    """
+    Widok DRF wyznacza queryset, serializer i paginację - ta sama odpowiedź co pod WSGI.
+    Całość w jednym przejściu do wątku: paginacja kursorem z ?count=estimated też pyta bazę.
+    """
+    view = views.ProductList()
+    view.setup(request)
+    view.request = view.initialize_request(request)
+    view.format_kwarg = None
+    page = view.paginate_queryset(view.get_queryset())
+    data = view.get_serializer(page, many=True).data
+    return view.get_paginated_response(data).data
+
+
+async def product_detail(request, pk):
+    if request.method != 'GET' or wants_browsable_api(request):
+        return await sync_to_async(sync_product_detail)(request, pk=pk)
+    return await cached_product_detail(request, pk=pk)
+
+
+@conditional_detail()
+async def cached_product_detail(request, pk):
+    product, reviews = await asyncio.gather(
+        Product.objects.with_relations().filter(pk=pk).afirst(),
+        alist(Review.objects.filter(product_id=pk).select_related('user').order_by('-created_at')),
+    )
+    if product is None:
+        return JsonResponse({'detail': str(NotFound.default_detail)}, status=404)
+    serializer = ProductSerializer(product, context={'request': request})
+    # Opinie pobrane równolegle z produktem - serializer nie może ich doczytywać sam.
+    serializer.fields.pop('reviews')
+    data = serializer.data
+    data['reviews'] = ReviewSerializer(reviews, many=True).data
+    return json_response(data)
+
+
+@cache_anonymous_page(lambda request: list_scopes(request.GET))
+@conditional_list(per_user=True, keyset=views.html_cursor)
+async def product_list_html(request):
+    context = await sync_to_async(views.product_list_context)(request)
+    return render(request, 'store/product-list.html', context)
+
+
+@cache_anonymous_page(lambda request, id: detail_scopes(id))
+@conditional_detail('id', per_user=True)
+async def product_detail_html(request, id):
+    product, reviews = await asyncio.gather(
+        Product.objects.filter(pk=id).afirst(),
+        sync_to_async(review_page)(id, request.GET.get('cursor')),
+    )
+    if product is None:
+        raise Http404
+    if await sync_to_async(views.submit_review)(request, product):
+        return redirect('product-detail-html', id=id)
+    return render(request, 'store/product-detail.html', views.product_detail_context(product, reviews))
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
@@ -0,0 +1,342 @@
+"""
+Pomocnicze narzędzia do benchmarków: deterministyczne dane i pomiar czasu.
+
+Komendy bench_* zapisują dane do skonfigurowanej bazy - uruchamiaj je na osobnej,
+tymczasowej bazie, nie na produkcji.
+"""
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import Brand, CartItem, Category, Order, OrderLine, Product, Review, GENDER, SIZES, FABRIC_TYPES, COLORS
+from .facets import rebuild_facet_counts
+from .ratings import rebuild_ratings
+from .reservations import OutOfStock, hold_stock
+from .rollups import rebuild_sales_rollups
+from .search import get_backend
+from .services import CheckoutError, add_to_cart, checkout_cart, get_open_cart
+
+BENCH_USERNAME = 'benchmark'
+# Ponowienia przy blokadzie bazy (retry_locked): łącznie kilka sekund czekania.
+LOCK_RETRY_ATTEMPTS = 100
+LOCK_RETRY_BASE_DELAY = 0.001
+LOCK_RETRY_MAX_DELAY = 0.05
+# Domyślny rozmiar katalogu benchmarku na bazie BENCH_DATABASE; pełną skalę podaje się jawnie.
+BENCH_PRODUCTS = 10_000
+BENCH_USER_PREFIX = 'bench-user-'
+BENCH_PASSWORD = 'benchmark'
+
+NOUNS = ['Koszulka', 'Bluza', 'Kurtka', 'Spodnie', 'Skarpetki', 'Sweter', 'Płaszcz', 'Sukienka', 'Spódnica', 'Czapka']
+ADJECTIVES = ['Czarna', 'Biała', 'Zielona', 'Lniana', 'Wełniana', 'Jedwabna', 'Sportowa', 'Klasyczna', 'Letnia', 'Zimowa']
+DESCRIPTION_WORDS = [
+    'wygodny', 'krój', 'miękki', 'materiał', 'łatwe', 'pranie', 'polski', 'producent', 'oddychająca', 'tkanina',
+    'ciepła', 'podszewka', 'na', 'co', 'dzień', 'elegancki', 'wzór', 'szwy', 'wzmocnione', 'ręcznie', 'szyte',
+]
+BRANDS = [('Wólczanka', 'PL'), ('Reserved', 'PL'), ('Vistula', 'PL'), ('Benetton', 'IT'), ('Lacoste', 'FR'), ('Mango', 'ES')]
+CATEGORIES = ['Koszulki', 'Bluzy', 'Kurtki', 'Spodnie', 'Skarpetki', 'Swetry']
+
+
+def bench_product_count(requested, default=BENCH_PRODUCTS):
+    """
+    Liczba produktów benchmarku: jawne --products albo `default` na bazie benchmarkowej.
+    Gołe wywołanie na zwykłej bazie kończy się błędem, zanim cokolwiek zapisze.
+    """
+    if requested is not None:
+        return requested
+    if not settings.BENCH_DATABASE:
+        raise CommandError(
+            "Komenda dopisuje produkty do skonfigurowanej bazy - podaj --products "
+            "albo uruchom ją na bazie benchmarkowej (BENCH_DATABASE=1)."
+        )
+    return default
+
+
+def bench_owner():
+    owner, created = User.objects.get_or_create(username=BENCH_USERNAME)
+    return owner
+
+
+def ensure_catalogue():
+    brands = [Brand.objects.get_or_create(name=name, defaults={'country': country})[0] for name, country in BRANDS]
+    categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+    return brands, categories
+
+
+def seed_products(count, batch_size=5000, seed=0, index=True):
+    """
+    Dokłada produkty benchmarkowe (bulk_create), aż będzie ich `count`.
+
+    Dane są deterministyczne dla danego `seed`, więc kolejne uruchomienia porównują
+    te same zbiory. Zwraca liczbę dodanych produktów.
+    """
+    owner = bench_owner()
+    brands, categories = ensure_catalogue()
+    existing = Product.objects.filter(owner=owner).count()
+    rng = random.Random(seed + existing)
+    backend = get_backend()
+    created = 0
+    while existing + created < count:
+        size = min(batch_size, count - existing - created)
+        batch = []
+        for i in range(existing + created, existing + created + size):
+            gender, size_code = rng.choice(GENDER)[0], rng.choice(SIZES)[0]
+            fabric, color = rng.choice(FABRIC_TYPES)[0], rng.choice(COLORS)[0]
+            batch.append(Product(
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+                sku=f"BENCH-{i:09d}",
+                description=' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(12)),
+                gender=gender, size=size_code, fabric=fabric, colors=color,
+                brand=rng.choice(brands), category=rng.choice(categories),
+                stock_count=rng.randint(0, 50), sale=rng.random() < 0.2,
+                price=Decimal(rng.randint(1999, 49999)) / 100,
+                owner=owner,
+            ))
+        with transaction.atomic():
+            Product.objects.bulk_create(batch)
+            if index:
+                if batch[0].pk is None:
+                    # Baza nie zwraca kluczy z bulk_create - doczytujemy zapisane wiersze.
+                    batch = Product.objects.filter(sku__in=[p.sku for p in batch]).select_related('brand', 'category')
+                backend.index(batch)
+        created += size
+    if created:
+        # bulk_create omija sygnały, więc liczniki faset przeliczamy raz na końcu.
+        rebuild_facet_counts()
+    return created
+
+
+def bench_product_ids():
+    """Zakres kluczy produktów benchmarkowych (bulk_create nadaje je kolejno)."""
+    bounds = Product.objects.filter(owner=bench_owner()).aggregate(low=Min('id'), high=Max('id'))
+    return bounds['low'], bounds['high']
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id')
+
+
+def seed_users(count, batch_size=5000):
+    """Dokłada użytkowników benchmarkowych z hasłem BENCH_PASSWORD, aż będzie ich `count`."""
+    existing = bench_users().count()
+    # Jeden skrót hasła dla wszystkich - haszowanie to setki milisekund na użytkownika.
+    password = make_password(BENCH_PASSWORD)
+    for start in range(existing, count, batch_size):
+        User.objects.bulk_create([
+            User(username=f'{BENCH_USER_PREFIX}{i:08d}', password=password)
+            for i in range(start, min(start + batch_size, count))
+        ])
+    return max(count - existing, 0)
+
+
+def seed_reviews(count, batch_size=5000, seed=0):
+    """Dokłada losowe opinie benchmarkowych użytkowników, aż będzie ich `count`."""
+    low, high = bench_product_ids()
+    user_ids = list(bench_users().values_list('id', flat=True))
+    existing = Review.objects.filter(user_id__in=user_ids).count() if user_ids else 0
+    if low is None or not user_ids or existing >= count:
+        return 0
+    rng = random.Random(seed + existing)
+    for start in range(existing, count, batch_size):
+        Review.objects.bulk_create([
+            Review(
+                product_id=rng.randint(low, high), user_id=rng.choice(user_ids),
+                rating=rng.choice([1, 2, 3, 3, 4, 4, 4, 5, 5, 5]),
+                content=' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(8)),
+            )
+            for _ in range(start, min(start + batch_size, count))
+        ])
+    # bulk_create omija sygnały - zagregowane oceny produktów przeliczamy raz.
+    rebuild_ratings()
+    return count - existing
+
+
+def seed_orders(count, items_per_order=3, batch_size=2000, seed=0):
+    """
+    Dokłada złożone zamówienia benchmarkowych użytkowników, aż będzie ich `count`.
+
+    Zamówienia mają pozycje z cenami produktów i daty z ostatniego roku; stany
+    magazynowe nie są zmieniane.
+    """
+    low, high = bench_product_ids()
+    user_ids = list(bench_users().values_list('id', flat=True))
+    existing = Order.objects.filter(user_id__in=user_ids).count() if user_ids else 0
+    if low is None or not user_ids or existing >= count:
+        return 0
+    rng = random.Random(seed + existing)
+    now = timezone.now()
+    for start in range(existing, count, batch_size):
+        size = min(batch_size, count - start)
+        lines = [[rng.randint(low, high) for _ in range(items_per_order)] for _ in range(size)]
+        products = Product.objects.in_bulk({pk for line in lines for pk in line})
+        with transaction.atomic():
+            orders = []
+            for line in lines:
+                items = [
+                    CartItem(product=products[pk], quantity=rng.randint(1, 3), unit_price=products[pk].price)
+                    for pk in dict.fromkeys(line) if pk in products
+                ]
+                orders.append((Order(
+                    user_id=rng.choice(user_ids),
+                    ordered_at=now - timedelta(minutes=rng.randint(0, 525600)),
+                    status=rng.choice(Order.Status.values),
+                    total_price=sum(item.get_total_price() for item in items),
+                    item_count=sum(item.quantity for item in items),
+                ), items))
+            Order.objects.bulk_create([order for order, _ in orders])
+            OrderLine.objects.bulk_create([OrderLine.snapshot(order, item) for order, items in orders for item in items])
+    # Zamówienia z bulk_create nie zlecają zadań - sumy sprzedaży przeliczamy raz.
+    rebuild_sales_rollups()
+    return count - existing
+
+
+def measure(fn, repeat=5):
+    """Wykonuje fn `repeat` razy i zwraca czasy w milisekundach."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summary(timings):
+    return {
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'min_ms': round(min(timings), 2),
+    }
+
+
+def latency_summary(timings):
+    """Percentyle do raportów porównywanych między commitami."""
+    return {f'p{pct}_ms': round(percentile(timings, pct), 2) for pct in (50, 95, 99)}
+
+
+def retry_locked(fn, stats=None, attempts=LOCK_RETRY_ATTEMPTS):
+    """
+    Ponawia fn, dopóki baza zgłasza blokadę (SQLite nie czeka na zwolnienie zapisu
+    przy podnoszeniu blokady odczytu do zapisu). Ponowienia liczone są w stats['locked'].
+
+    Przerwa rośnie wykładniczo (z losowym rozrzutem) do LOCK_RETRY_MAX_DELAY; po `attempts`
+    próbach wyjątek blokady jest zgłaszany dalej. Inne błędy bazy (brak tabeli, pełny
+    dysk) nie są ponawiane.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or attempt == attempts - 1:
+                raise
+            if stats is not None:
+                stats['locked'] += 1
+            delay = min(LOCK_RETRY_BASE_DELAY * 2 ** attempt, LOCK_RETRY_MAX_DELAY)
+            time.sleep(random.uniform(delay / 2, delay))
+
+
+def _buy_one(user, product):
+    cart = retry_locked(lambda: get_open_cart(user))
+
+    def reserve():
+        with transaction.atomic():
+            hold_stock(cart, product)
+            add_to_cart(cart, product)
+
+    try:
+        retry_locked(reserve)
+    except OutOfStock:
+        return 'rejected'
+    try:
+        retry_locked(lambda: checkout_cart(cart))
+    except CheckoutError:
+        return 'failed'
+    return 'sold'
+
+
+def run_flash_sale(product, users, threads=16):
+    """
+    Symuluje wyprzedaż: każdy użytkownik w puli wątków rezerwuje jedną sztukę
+    produktu i od razu składa zamówienie.
+
+    Zwraca liczniki wyników ('sold', 'rejected', 'failed') i czasy zakupów w ms.
+    'failed' oznacza zamówienie odrzucone mimo udanej rezerwacji - powinno być 0.
+    """
+    outcomes = {'sold': 0, 'rejected': 0, 'failed': 0}
+    timings = []
+    lock = threading.Lock()
+
+    def buy(user):
+        start = time.perf_counter()
+        try:
+            outcome = _buy_one(user, product)
+        finally:
+            connection.close()
+        with lock:
+            outcomes[outcome] += 1
+            timings.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(buy, users))
+    return outcomes, timings
+
+
+def run_cart_writes(users, products, threads=16, items_per_cart=3, seed=0):
+    """
+    Równoległe zapisy koszyka: każdy użytkownik dodaje `items_per_cart` produktów
+    (z rezerwacją) i składa zamówienie.
+
+    Zwraca (czasy operacji w ms, liczniki) - 'orders', 'adds' oraz 'locked', czyli
+    ile razy operację trzeba było powtórzyć z powodu blokady bazy.
+    """
+    stats = {'orders': 0, 'adds': 0, 'locked': 0}
+    timings = []
+    lock = threading.Lock()
+    rng = random.Random(seed)
+    baskets = [(user, rng.sample(products, items_per_cart)) for user in users]
+
+    def shop(basket):
+        user, chosen = basket
+        local = {'locked': 0}
+        spent = []
+        try:
+            cart = retry_locked(lambda: get_open_cart(user), local)
+            for product in chosen:
+                def add():
+                    with transaction.atomic():
+                        hold_stock(cart, product)
+                        add_to_cart(cart, product)
+                start = time.perf_counter()
+                retry_locked(add, local)
+                spent.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            retry_locked(lambda: checkout_cart(cart), local)
+            spent.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+        with lock:
+            stats['orders'] += 1
+            stats['adds'] += len(chosen)
+            stats['locked'] += local['locked']
+            timings.extend(spent)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(shop, baskets))
+    return timings, stats
@@ -0,0 +1,223 @@
+"""
+Warstwa cache katalogu.
+
+Klucze stron i fragmentów zawierają numery wersji zakresów, od których zależą: całego
+katalogu, kategorii albo pojedynczego produktu. Zapis produktu, opinii, marki lub kategorii
+podbija wersje (sygnały w signals.py) zamiast wyszukiwać i kasować klucze, więc
+unieważnianie działa tak samo w pamięci procesu, w plikach i w Redisie - stare wpisy
+po prostu przestają być czytane i wygasają same.
+
+Pełne odpowiedzi trzymane są tylko dla anonimowych GET-ów; trafienia i chybienia
+liczone są licznikami w samym cache (cache_stats()). cache_anonymous_page obsługuje
+także widoki async (async_views.py).
+"""
+import asyncio
+import hashlib
+import time
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from .filters import param_values
+
+PAGE_TIMEOUT = 300
+FRAGMENT_TIMEOUT = 600
+
+CATALOG = 'catalog'
+# Marki i kategorie - rzadkie zmiany, które dotykają list zawężonych do kategorii.
+TAXONOMY = 'taxonomy'
+STATS_KEYS = {'hits': 'store:stats:hits', 'misses': 'store:stats:misses'}
+# Parametry, które nie zmieniają zbioru produktów, a jedynie jego stronę.
+PAGING_PARAMS = {'page', 'cursor', 'page_size', 'pagination', 'count'}
+
+
+def product_scope(product_id):
+    return f'product:{product_id}'
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def version_key(scope):
+    return f'store:version:{scope}'
+
+
+def initial_version():
+    # Po wyparciu klucza wersji z cache nowa wersja nie może powtórzyć żadnej z poprzednich.
+    return time.time_ns() // 1000
+
+
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, initial_version(), None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def bump(*scopes):
+    """Unieważnia wszystko, co zapisano pod bieżącą wersją podanych zakresów."""
+    for scope in set(scopes):
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.add(version_key(scope), initial_version(), None)
+
+
+def bump_products(product_ids, category_ids=()):
+    bump(CATALOG, *map(product_scope, product_ids), *(category_scope(pk) for pk in category_ids if pk))
+
+
+def attach_versions(products):
+    """Ustawia product.cache_version - składnik klucza fragmentu wiersza na liście."""
+    products = list(products)
+    for product, version in zip(products, get_versions([product_scope(p.pk) for p in products])):
+        product.cache_version = version
+    return products
+
+
+def _count(outcome):
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats():
+    values = cache.get_many(list(STATS_KEYS.values()))
+    stats = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else None
+    return stats
+
+
+def reset_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+def list_scopes(params):
+    """Lista zawężona tylko do jednej kategorii zależy od tej kategorii, każda inna od całego katalogu."""
+    categories = param_values(params, 'category')
+    other = [name for name in params if name not in PAGING_PARAMS and name != 'category']
+    if len(categories) == 1 and not other:
+        return [category_scope(categories[0]), TAXONOMY]
+    return [CATALOG]
+
+
+def params_key(params):
+    """Parametry zawężające listę w stałej kolejności - bez stronicowania, które nie zmienia zbioru."""
+    pairs = [(name, value) for name in sorted(params) if name not in PAGING_PARAMS for value in params.getlist(name)]
+    return hashlib.md5('&'.join(f'{name}={value}' for name, value in pairs).encode()).hexdigest()
+
+
+def cached_result(name, scopes, params, compute, timeout=FRAGMENT_TIMEOUT):
+    """
+    Wynik compute() dla parametrów listy, trzymany pod wersjami zakresów - jak strony,
+    tylko dla dowolnej wartości (np. liczników faset). Trafienie to odczyt wersji i wpisu.
+    """
+    versions = '.'.join(str(version) for version in get_versions(scopes))
+    key = f"store:{name}:{'|'.join(scopes)}:{versions}:{params_key(params)}"
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, timeout)
+    return result
+
+
+def detail_scopes(product_id):
+    return [product_scope(product_id), TAXONOMY]
+
+
+def page_key(request, scopes):
+    versions = '.'.join(str(version) for version in get_versions(scopes))
+    url = hashlib.md5(
+        f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}".encode()
+    ).hexdigest()
+    return f"store:page:{'|'.join(scopes)}:{versions}:{url}"
+
+
+def is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and 'messages' not in request.COOKIES
+    )
+
+
+async def load_user(request):
+    """
+    Wczytuje request.user w wątku synchronicznym.
+
+    Użytkownik z sesji jest leniwy, a pierwsze odwołanie odpytuje bazę - w widoku async
+    zgłosiłoby SynchronousOnlyOperation. Po wczytaniu request.user jest już zwykłym obiektem.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def is_cacheable_response(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def cache_anonymous_page(scopes, timeout=PAGE_TIMEOUT):
+    """
+    Trzyma w cache całe odpowiedzi dla anonimowych GET-ów.
+
+    scopes(request, **kwargs) zwraca zakresy, od których zależy strona. Metody widoków
+    DRF dekoruje się przez method_decorator; ich odpowiedź trafia do cache dopiero
+    po wyrenderowaniu.
+    """
+    def cached_response(request, response):
+        _count('hits')
+        # Zapisana odpowiedź ma ETag z chwili zapisu, a wersje w kluczu gwarantują,
+        # że wciąż jest aktualny - 304 bez zapytania do bazy.
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+            response=response,
+        )
+
+    def store(key, response):
+        if is_cacheable_response(response):
+            if getattr(response, 'is_rendered', True):
+                cache.set(key, response, timeout)
+            else:
+                response.add_post_render_callback(lambda rendered: cache.set(key, rendered, timeout))
+        return response
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                await load_user(request)
+                if not is_cacheable_request(request):
+                    return await view(request, *args, **kwargs)
+                key = await sync_to_async(page_key)(request, scopes(request, **kwargs))
+                response = await cache.aget(key)
+                if response is not None:
+                    return await sync_to_async(cached_response)(request, response)
+                await sync_to_async(_count)('misses')
+                response = await view(request, *args, **kwargs)
+                return await sync_to_async(store)(key, response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+            key = page_key(request, scopes(request, **kwargs))
+            response = cache.get(key)
+            if response is not None:
+                return cached_response(request, response)
+            _count('misses')
+            return store(key, view(request, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,136 @@
+"""
+Warunkowe GET-y (ETag / Last-Modified) dla produktów.
+
+Znaczniki liczone są z updated_at jednym zapytaniem - bez wczytywania wierszy i przed
+serializacją - więc klient z aktualną kopią dostaje 304 prawie bez pracy bazy.
+Każda zmiana opinii odświeża updated_at produktu (ratings.py), a usunięcia, których samo
+MAX(updated_at) by nie zauważyło, podbijają wersję katalogu (caching.py) - ETag listy
+zawiera wersje jej zakresów. COUNT(*) liczony jest tylko przy numerach stron, gdzie
+paginator i tak go potrzebuje (known_list_count); strona kursora nie liczy wierszy.
+
+Dekoratory obsługują też widoki async: znaczniki liczone są wtedy jednym przejściem
+do wątku synchronicznego (condition() z Django 4.2 zna tylko widoki synchroniczne).
+"""
+import asyncio
+import datetime
+import hashlib
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from .caching import get_versions, list_scopes
+from .filters import filter_products
+from .models import Product
+
+
+def _etag(request, *parts, per_user=False):
+    if 'messages' in request.COOKIES:
+        # Strona z komunikatem jest jednorazowa - nie może udawać niezmienionej.
+        return None
+    if per_user:
+        parts += (request.user.pk,)
+    raw = '|'.join(str(part) for part in (request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), *parts))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def list_state(request, keyset=False):
+    """
+    (MAX(updated_at), COUNT(*), wersje zakresów) przefiltrowanej listy, liczone raz na żądanie.
+    Przy stronicowaniu kursorem (`keyset`) tylko MAX(updated_at) z product_updated_idx - COUNT jest None.
+    """
+    if not hasattr(request, '_list_state'):
+        products = filter_products(Product.objects.all(), request.GET).order_by()
+        if keyset:
+            state = {**products.aggregate(last=Max('updated_at')), 'count': None}
+        else:
+            state = products.aggregate(last=Max('updated_at'), count=Count('id'))
+        request._list_state = (state['last'], state['count'], get_versions(list_scopes(request.GET)))
+    return request._list_state
+
+
+def known_list_count(request):
+    """COUNT(*) listy, jeśli policzono go już przy ETag-u - paginacja nie musi liczyć drugi raz."""
+    state = getattr(request, '_list_state', None)
+    return state[1] if state else None
+
+
+def detail_state(request, pk):
+    if not hasattr(request, '_detail_state'):
+        request._detail_state = Product.objects.filter(pk=pk).values_list('updated_at', flat=True).order_by().first()
+    return request._detail_state
+
+
+def list_etag(request, per_user=False, keyset=False):
+    last, count, versions = list_state(request, keyset)
+    return _etag(request, last, count, *versions, per_user=per_user)
+
+
+def list_last_modified(request, keyset=False):
+    return list_state(request, keyset)[0]
+
+
+def detail_etag(request, pk, per_user=False):
+    updated_at = detail_state(request, pk)
+    return _etag(request, updated_at, per_user=per_user) if updated_at else None
+
+
+def detail_last_modified(request, pk):
+    return detail_state(request, pk)
+
+
+def _async_condition(etag_func, last_modified_func):
+    """Odpowiednik django.views.decorators.http.condition dla widoków async."""
+    def validators(request, *args, **kwargs):
+        etag = etag_func(request, *args, **kwargs)
+        last_modified = last_modified_func(request, *args, **kwargs)
+        if last_modified and not timezone.is_aware(last_modified):
+            last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+        return (
+            quote_etag(etag) if etag is not None else None,
+            int(last_modified.timestamp()) if last_modified else None,
+        )
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return wrapper
+    return decorator
+
+
+def _conditional(etag_func, last_modified_func):
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            return _async_condition(etag_func, last_modified_func)(view)
+        return condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+    return decorator
+
+
+def conditional_list(per_user=False, keyset=None):
+    """`keyset(params)` mówi, czy żądanie stronicowane jest kursorem - wtedy znaczniki bez COUNT(*)."""
+    def uses_keyset(request):
+        return bool(keyset and keyset(request.GET))
+
+    return _conditional(
+        etag_func=lambda request, **kwargs: list_etag(request, per_user, uses_keyset(request)),
+        last_modified_func=lambda request, **kwargs: list_last_modified(request, uses_keyset(request)),
+    )
+
+
+def conditional_detail(pk_kwarg='pk', per_user=False):
+    return _conditional(
+        etag_func=lambda request, **kwargs: detail_etag(request, kwargs[pk_kwarg], per_user),
+        last_modified_func=lambda request, **kwargs: detail_last_modified(request, kwargs[pk_kwarg]),
+    )
@@ -0,0 +1,60 @@
+"""
+Eksport katalogu produktów do CSV i JSONL.
+
+Wiersze czytane są iterator()-em w paczkach i od razu oddawane jako tekst, więc
+eksport dowolnej wielkości nie trzyma katalogu w pamięci. Kolumny odpowiadają
+formatowi importu (importer.py) - wyeksportowany plik można wczytać z powrotem.
+"""
+import csv
+import io
+import json
+from django.db.models import F
+
+EXPORT_FIELDS = [
+    'sku', 'name', 'description', 'gender', 'size', 'fabric', 'colors',
+    'price', 'stock_count', 'sale', 'brand', 'category',
+]
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+CHUNK_SIZE = 2000
+
+
+def export_rows(queryset):
+    own_fields = [field for field in EXPORT_FIELDS if field not in ('brand', 'category')]
+    rows = queryset.order_by('id').values(*own_fields, brand_name=F('brand__name'), category_name=F('category__name'))
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        row['brand'] = row.pop('brand_name') or ''
+        row['category'] = row.pop('category_name') or ''
+        row['price'] = str(row['price'])
+        yield row
+
+
+def export_csv(queryset):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in export_rows(queryset):
+        writer.writerow(row)
+        # Oddajemy tekst co kilka KB zamiast po każdym wierszu.
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(queryset):
+    lines = []
+    for row in export_rows(queryset):
+        lines.append(json.dumps({field: row[field] for field in EXPORT_FIELDS}, ensure_ascii=False))
+        if len(lines) >= CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORTERS = {'csv': export_csv, 'jsonl': export_jsonl}
+
+
+def export_products(queryset, file_format):
+    return EXPORTERS[file_format](queryset)
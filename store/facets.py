@@ -0,0 +1,152 @@
+"""
+Liczniki faset katalogu.
+
+Dla katalogu bez filtrów liczniki czytane są z tabeli FacetCount, którą sygnały
+aktualizują przyrostowo przy zapisie i usunięciu produktu - bez GROUP BY po całej
+tabeli produktów. Po zawężeniu filtrami liczniki liczone są grupowaniem po już
+zawężonym (indeksowanym) zbiorze, a wynik trafia do cache pod wersją katalogu
+(caching.cached_result) - powtórzone zapytanie nie grupuje drugi raz.
+"""
+from collections import Counter, defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Count, F, Value, When
+from .caching import CATALOG, cached_result
+from .filters import filter_products, has_filters
+from .models import Brand, Category, FacetCount, Product, GENDER, SIZES, FABRIC_TYPES, COLORS
+
+PRICE_BUCKETS = [(0, 50), (50, 100), (100, 200), (200, 500), (500, None)]
+
+FACET_FIELDS = {
+    'gender': 'gender',
+    'size': 'size',
+    'fabric': 'fabric',
+    'colors': 'colors',
+    'brand': 'brand_id',
+    'category': 'category_id',
+    'sale': 'sale',
+    'price': 'price',
+}
+
+CHOICE_LABELS = {
+    'gender': dict(GENDER),
+    'size': dict(SIZES),
+    'fabric': dict(FABRIC_TYPES),
+    'colors': dict(COLORS),
+    'sale': {'1': 'Wyprzedaż', '0': 'Cena regularna'},
+}
+
+
+def bucket_label(low, high):
+    return f"{low}-{high}" if high is not None else f"{low}-"
+
+
+def price_bucket(price):
+    for low, high in PRICE_BUCKETS:
+        if high is None or price < high:
+            return bucket_label(low, high)
+
+
+def price_bucket_expression():
+    whens = [When(price__lt=high, then=Value(bucket_label(low, high))) for low, high in PRICE_BUCKETS if high is not None]
+    low, high = PRICE_BUCKETS[-1]
+    return Case(*whens, default=Value(bucket_label(low, high)), output_field=CharField())
+
+
+def facet_value(facet, value):
+    if facet == 'price':
+        return price_bucket(value)
+    if facet == 'sale':
+        return '1' if value else '0'
+    return '' if value is None else str(value)
+
+
+def facet_values(values):
+    """Zamienia słownik pól produktu (jak w FACET_FIELDS) na pary (faseta, wartość)."""
+    return [(facet, facet_value(facet, values[field])) for facet, field in FACET_FIELDS.items()]
+
+
+def product_facet_values(product):
+    return facet_values({field: getattr(product, field) for field in FACET_FIELDS.values()})
+
+
+def stored_facet_values(product_id):
+    values = Product.objects.filter(pk=product_id).values(*FACET_FIELDS.values()).first()
+    return facet_values(values) if values else []
+
+
+def apply_deltas(deltas):
+    """Zmienia liczniki o podane różnice; Counter {(faseta, wartość): delta}."""
+    for (facet, value), delta in deltas.items():
+        if not delta:
+            continue
+        if FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                FacetCount.objects.create(facet=facet, value=value, count=delta)
+        except IntegrityError:
+            FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+
+
+def record_change(old_values, new_values):
+    deltas = Counter(new_values)
+    deltas.subtract(Counter(old_values))
+    apply_deltas(deltas)
+
+
+def grouped_counts(queryset, facet):
+    field = FACET_FIELDS[facet]
+    queryset = queryset.order_by()
+    if facet == 'price':
+        rows = queryset.annotate(bucket=price_bucket_expression()).values('bucket').annotate(n=Count('id'))
+        return {row['bucket']: row['n'] for row in rows}
+    rows = queryset.values(field).annotate(n=Count('id'))
+    return {facet_value(facet, row[field]): row['n'] for row in rows}
+
+
+def rebuild_facet_counts(product_model=Product, facet_model=FacetCount):
+    """Przelicza wszystkie liczniki od zera (GROUP BY po całej tabeli produktów)."""
+    with transaction.atomic():
+        facet_model.objects.all().delete()
+        facet_model.objects.bulk_create([
+            facet_model(facet=facet, value=value, count=count)
+            for facet in FACET_FIELDS
+            for value, count in grouped_counts(product_model.objects.all(), facet).items()
+        ])
+
+
+def facet_counts(params):
+    """Liczniki wszystkich faset dla podanych parametrów filtrowania."""
+    # Zawsze cały katalog, nie list_scopes: licznik fasety pomija jej własny filtr, więc
+    # liczniki dla ?category=1 zależą też od produktów z innych kategorii.
+    return cached_result('facets', [CATALOG], params, lambda: compute_facet_counts(params))
+
+
+def compute_facet_counts(params):
+    counts = defaultdict(dict)
+    if not has_filters(params):
+        for row in FacetCount.objects.filter(count__gt=0).values('facet', 'value', 'count'):
+            counts[row['facet']][row['value']] = row['count']
+    else:
+        for facet in FACET_FIELDS:
+            queryset = filter_products(Product.objects.all(), params, exclude=facet)
+            counts[facet] = {value: n for value, n in grouped_counts(queryset, facet).items() if n}
+    return label_counts(counts)
+
+
+def label_counts(counts):
+    brand_ids = [int(value) for value in counts.get('brand', {}) if value]
+    category_ids = [int(value) for value in counts.get('category', {}) if value]
+    labels = dict(CHOICE_LABELS)
+    labels['brand'] = {str(pk): name for pk, name in Brand.objects.filter(pk__in=brand_ids).values_list('id', 'name')}
+    labels['category'] = {str(pk): name for pk, name in Category.objects.filter(pk__in=category_ids).values_list('id', 'name')}
+    labels['price'] = {bucket_label(low, high): f"{low}+ PLN" if high is None else f"{low}-{high} PLN" for low, high in PRICE_BUCKETS}
+
+    result = {}
+    for facet in FACET_FIELDS:
+        values = counts.get(facet, {})
+        result[facet] = [
+            {'value': value, 'label': labels[facet].get(value, value or '-'), 'count': count}
+            for value, count in sorted(values.items(), key=lambda item: -item[1])
+        ]
+    return result
@@ -0,0 +1,77 @@
+from decimal import Decimal, InvalidOperation
+from .search import search_products
+
+CHOICE_FILTERS = ['gender', 'size', 'fabric', 'colors']
+RELATION_FILTERS = ['brand', 'category']
+FILTER_PARAMS = CHOICE_FILTERS + RELATION_FILTERS + ['sale', 'min_price', 'max_price']
+# ?sort=rating korzysta z zapisanych na produkcie ocen i indeksu product_rating_idx.
+SORT_ORDERINGS = {
+    'rating': ('-rating_average', '-review_count', '-id'),
+}
+
+
+def param_values(params, name):
+    """Obsługuje zarówno ?size=M&size=L, jak i ?size=M,L."""
+    values = []
+    for raw in params.getlist(name):
+        values.extend(value for value in raw.split(',') if value)
+    return values
+
+
+def parse_decimal(value):
+    """Liczba z parametru albo None - także dla NaN i Infinity, których baza nie porówna."""
+    try:
+        result = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    return result if result.is_finite() else None
+
+
+def sort_ordering(params):
+    return SORT_ORDERINGS.get(params.get('sort'))
+
+
+def custom_ordering(params):
+    """Wyszukiwanie (trafność) i ?sort=... mają własną kolejność - inną niż (created_at, id) kursora."""
+    return bool(params.get('q') or sort_ordering(params))
+
+
+def sort_products(queryset, params):
+    ordering = sort_ordering(params)
+    return queryset.order_by(*ordering) if ordering else queryset
+
+
+def has_filters(params):
+    return any(params.get(name) for name in FILTER_PARAMS + ['q', 'name'])
+
+
+def filter_products(queryset, params, exclude=None):
+    """
+    Zawęża queryset produktów parametrami z adresu.
+
+    Wartości w obrębie jednego atrybutu łączone są przez OR, różne atrybuty przez AND.
+    `exclude` pomija filtr jednego atrybutu - tak liczone są liczniki fasety,
+    żeby po wybraniu rozmiaru M nadal widać było ile jest produktów w rozmiarze L.
+    """
+    for name in CHOICE_FILTERS:
+        values = param_values(params, name)
+        if values and name != exclude:
+            queryset = queryset.filter(**{f'{name}__in': values})
+    for name in RELATION_FILTERS:
+        values = [int(value) for value in param_values(params, name) if value.isdigit()]
+        if values and name != exclude:
+            queryset = queryset.filter(**{f'{name}_id__in': values})
+    sale = params.get('sale')
+    if sale in ('1', 'true', 'True', '0', 'false', 'False') and exclude != 'sale':
+        queryset = queryset.filter(sale=sale in ('1', 'true', 'True'))
+    if exclude != 'price':
+        min_price = parse_decimal(params.get('min_price'))
+        max_price = parse_decimal(params.get('max_price'))
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lt=max_price)
+    query = params.get('q') or params.get('name')
+    if query:
+        queryset = search_products(queryset, query)
+    return queryset
@@ -0,0 +1,51 @@
+"""
+Historia zamówień i opinii użytkownika (profil i API).
+
+Zamówienia czytane są z niezmiennych tabel Order i OrderLine - suma, liczba sztuk
+oraz nazwa, SKU i cena każdej pozycji są zapisane przy zakupie, więc ani lista, ani
+szczegóły nie agregują pozycji i nie łączą produktów. Pozycje ładowane są dopiero
+na stronie szczegółów. Zamówienia
+i opinie stronicowane są kursorem po (ordered_at, id) i (created_at, id) - indeksy
+zaczynają się od użytkownika, więc koszt strony nie zależy od długości historii.
+"""
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from .models import Order, OrderLine, Review
+from .pagination import ProductKeysetPagination, keyset_page
+
+ORDER_PAGE_SIZE = 10
+REVIEW_PAGE_SIZE = 10
+ORDER_SUMMARY_FIELDS = ('id', 'user_id', 'ordered_at', 'status', 'total_price', 'item_count')
+
+
+def user_orders(user):
+    return Order.objects.filter(user=user).only(*ORDER_SUMMARY_FIELDS)
+
+
+def order_page(user, cursor=None, page_size=ORDER_PAGE_SIZE):
+    return keyset_page(user_orders(user), cursor, page_size, field='ordered_at')
+
+
+def order_detail(user, pk):
+    """Zamówienie użytkownika z pozycjami (dwa zapytania); 404 dla cudzego."""
+    lines = OrderLine.objects.defer('brand', 'category').order_by('id')
+    return get_object_or_404(user_orders(user).prefetch_related(Prefetch('lines', queryset=lines)), pk=pk)
+
+
+def user_reviews(user):
+    return Review.objects.filter(user=user).select_related('product').only(
+        'rating', 'content', 'created_at', 'product', 'product__name',
+    )
+
+
+def user_review_page(user, cursor=None, page_size=REVIEW_PAGE_SIZE):
+    return keyset_page(user_reviews(user), cursor, page_size)
+
+
+class OrderKeysetPagination(ProductKeysetPagination):
+    cursor_field = 'ordered_at'
+    page_size = ORDER_PAGE_SIZE
+
+
+class UserReviewPagination(ProductKeysetPagination):
+    page_size = REVIEW_PAGE_SIZE
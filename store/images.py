@@ -0,0 +1,130 @@
+"""
+Warianty zdjęć produktów.
+
+Z oryginału generowane są miniatury w kilku szerokościach i formatach (AVIF i WebP tam,
+gdzie Pillow je obsługuje, JPEG zawsze jako zapas). Ścieżki trafiają do
+Product.image_variants, wymiary oryginału do image_width/image_height, a szablony
+i API budują z nich srcset - lista produktów nie pobiera już wielomegabajtowych oryginałów.
+
+Przetwarzanie odbywa się po zatwierdzeniu transakcji w puli wątków, poza żądaniem;
+IMAGE_PROCESSING_WORKERS = 0 przetwarza synchronicznie.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from .caching import bump_products
+from .models import Product
+
+VARIANT_WIDTHS = (120, 240, 480)
+FORMATS = {
+    'avif': ('AVIF', {'quality': 50}),
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+_executor = None
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt == 'jpeg' or features.check(fmt)]
+
+
+def variant_name(image_name, width, fmt):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'products/variants/{stem}-{width}.{EXTENSIONS[fmt]}'
+
+
+def render_variant(image, width, fmt):
+    variant = image.copy()
+    variant.thumbnail((width, width * 4), Image.LANCZOS)
+    if fmt == 'jpeg' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    pil_format, options = FORMATS[fmt]
+    variant.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(image_name, storage=default_storage):
+    """Zwraca (szerokość, wysokość, {format: {szerokość: ścieżka}}) dla zapisanego zdjęcia."""
+    with storage.open(image_name) as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    variants = {}
+    # Nie powiększamy: szerokości większe niż oryginał zastępuje sam oryginalny rozmiar.
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    for fmt in available_formats():
+        for width in widths:
+            name = variant_name(image_name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            variants.setdefault(fmt, {})[str(width)] = storage.save(name, ContentFile(render_variant(image, width, fmt)))
+    return image.width, image.height, variants
+
+
+def delete_variants(variants, storage=default_storage):
+    for paths in (variants or {}).values():
+        for name in paths.values():
+            storage.delete(name)
+
+
+def process_product_image(product_id):
+    """Generuje warianty zdjęcia produktu. Zwraca False, gdy produkt lub zdjęcie zniknęły."""
+    product = Product.objects.filter(pk=product_id).only('image', 'image_variants', 'category').first()
+    if product is None or not product.image:
+        return False
+    try:
+        width, height, variants = build_variants(product.image.name)
+    except (OSError, Image.DecompressionBombError):
+        # Uszkodzony lub nieobsługiwany plik - lista pokaże oryginał.
+        return False
+    stale = {
+        fmt: {w: name for w, name in paths.items() if name not in variants.get(fmt, {}).values()}
+        for fmt, paths in (product.image_variants or {}).items()
+    }
+    # Zdjęcie mogło zostać podmienione w trakcie przetwarzania - zapisujemy tylko jeśli to wciąż to samo.
+    updated = Product.objects.filter(pk=product_id, image=product.image.name).update(
+        image_width=width, image_height=height, image_variants=variants, updated_at=timezone.now(),
+    )
+    if not updated:
+        delete_variants(variants)
+        return False
+    delete_variants(stale)
+    bump_products([product_id], [product.category_id])
+    return True
+
+
+def _run_in_worker(product_id):
+    try:
+        process_product_image(product_id)
+    finally:
+        # Każdy wątek puli ma własne połączenie z bazą - nie zostawiamy go otwartego.
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS, thread_name_prefix='product-images',
+        )
+    return _executor
+
+
+def schedule_image_processing(product_id):
+    """Zleca przetworzenie zdjęcia po zatwierdzeniu bieżącej transakcji."""
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(_run_in_worker, product_id)
+        else:
+            process_product_image(product_id)
+    transaction.on_commit(submit)
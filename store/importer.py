@@ -0,0 +1,215 @@
+"""
+Import katalogu produktów z CSV i JSONL.
+
+Plik czytany jest strumieniowo i przetwarzany partiami: każda partia to jedno zapytanie
+o istniejące SKU, jeden bulk_create nowych produktów, jeden bulk_update zmienionych
+i osobna transakcja - błąd w jednym wierszu trafia do raportu, a nie przerywa importu.
+Wiersze walidowane są regułami ProductSerializer, marki i kategorie rozwiązywane po
+nazwie ze słownika w pamięci. Ponieważ bulk_create/bulk_update omijają sygnały,
+indeks wyszukiwania, liczniki faset i wersje cache aktualizowane są tu jawnie, partiami.
+"""
+import codecs
+import csv
+import json
+import secrets
+from collections import Counter
+from django.db import transaction
+from django.utils import timezone
+from .caching import bump_products
+from .facets import apply_deltas, product_facet_values
+from .models import Brand, Category, Product
+from .search import get_backend
+from .serializers import ProductImportSerializer
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 1000
+# Raport trzyma tyle błędów w pamięci; pozostałe są tylko liczone (error_count, truncated).
+MAX_REPORTED_ERRORS = 1000
+SKU_SUFFIX_LENGTH = 8
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def truncated(self):
+        """True, gdy errors nie zawiera wszystkich błędnych wierszy."""
+        return self.error_count > len(self.errors)
+
+    def as_dict(self):
+        return {
+            'created': self.created, 'updated': self.updated, 'error_count': self.error_count,
+            'truncated': self.truncated, 'errors': self.errors,
+        }
+
+
+def _text_lines(stream):
+    """Strumień bajtów albo tekstu jako kolejne linie tekstu (UTF-8, z obsługą BOM)."""
+    decoder = None
+    for line in stream:
+        if isinstance(line, bytes):
+            decoder = decoder or codecs.getincrementaldecoder('utf-8-sig')()
+            line = decoder.decode(line)
+        yield line
+
+
+def read_csv(stream):
+    """Zwraca trójki (numer linii, wiersz albo None, błędy albo None)."""
+    reader = csv.DictReader(_text_lines(stream))
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key}, None
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(_text_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, {'non_field_errors': [f"Niepoprawny JSON: {exc}"]}
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, {'non_field_errors': ["Wiersz musi być obiektem JSON."]}
+            continue
+        yield line_number, row, None
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def name_lookup(model):
+    """Słownik {nazwa małymi literami: obiekt}; przy powtórzonych nazwach wygrywa najstarszy wpis."""
+    lookup = {}
+    for obj in model.objects.order_by('-id'):
+        lookup[obj.name.strip().lower()] = obj
+    return lookup
+
+
+def generate_skus(products):
+    """Nadaje SKU produktom bez SKU jednym losowaniem i jednym zapytaniem o kolizje."""
+    pending = [product for product in products if not product.sku]
+    while pending:
+        suffixes = secrets.token_hex(SKU_SUFFIX_LENGTH // 2 * len(pending)).upper()
+        for i, product in enumerate(pending):
+            product.sku = product.sku_with_suffix(suffixes[i * SKU_SUFFIX_LENGTH:(i + 1) * SKU_SUFFIX_LENGTH])
+        taken = set(Product.objects.filter(sku__in=[p.sku for p in pending]).values_list('sku', flat=True))
+        taken |= {sku for sku, count in Counter(p.sku for p in pending).items() if count > 1}
+        pending = [product for product in pending if product.sku in taken]
+        for product in pending:
+            product.sku = ''
+
+
+class ProductImporter:
+    update_fields = [
+        'name', 'description', 'gender', 'size', 'fabric', 'colors', 'price',
+        'stock_count', 'sale', 'brand', 'category', 'updated_at',
+    ]
+
+    def __init__(self, owner, batch_size=DEFAULT_BATCH_SIZE):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.brands = name_lookup(Brand)
+        self.categories = name_lookup(Category)
+        self.backend = get_backend()
+        self.report = ImportReport()
+
+    def run(self, stream, file_format):
+        batch = []
+        for line, row, error in READERS[file_format](stream):
+            if error:
+                self.report.add_error(line, error)
+                continue
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        return self.report
+
+    def resolve(self, data, errors):
+        """Zamienia nazwy marki i kategorii na obiekty; pomija pola, których wiersz nie zawiera."""
+        for field, lookup, message in (
+            ('brand', self.brands, "Nieznana marka: {}"),
+            ('category', self.categories, "Nieznana kategoria: {}"),
+        ):
+            if field not in data:
+                continue
+            name = (data[field] or '').strip()
+            data[field] = lookup.get(name.lower()) if name else None
+            if name and data[field] is None:
+                errors[field] = [message.format(name)]
+
+    def import_batch(self, batch):
+        skus = {str(row.get('sku') or '').strip().upper() for line, row in batch} - {''}
+        existing = {product.sku: product for product in Product.objects.filter(sku__in=skus).select_related('brand', 'category')}
+        old_facets = {sku: product_facet_values(product) for sku, product in existing.items()}
+        now = timezone.now()
+        to_create, to_update, seen = [], {}, set()
+
+        for line, row in batch:
+            sku = str(row.get('sku') or '').strip().upper()
+            if sku and sku in seen:
+                self.report.add_error(line, {'sku': [f"SKU {sku} powtarza się w pliku."]})
+                continue
+            product = existing.get(sku)
+            if product is not None and product.owner_id != self.owner.pk:
+                self.report.add_error(line, {'sku': [f"Brak uprawnień do produktu {sku}."]})
+                continue
+            serializer = ProductImportSerializer(data=row, partial=product is not None)
+            if not serializer.is_valid():
+                self.report.add_error(line, serializer.errors)
+                continue
+            data = dict(serializer.validated_data)
+            data.pop('sku', None)
+            errors = {}
+            self.resolve(data, errors)
+            if errors:
+                self.report.add_error(line, errors)
+                continue
+            if sku:
+                seen.add(sku)
+            if product is None:
+                to_create.append(Product(owner=self.owner, sku=sku, **data))
+            else:
+                for field, value in data.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                to_update[sku] = product
+
+        with transaction.atomic():
+            generate_skus(to_create)
+            Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+            Product.objects.bulk_update(list(to_update.values()), self.update_fields, batch_size=self.batch_size)
+            self.after_write(to_create, list(to_update.values()), old_facets)
+        self.report.created += len(to_create)
+        self.report.updated += len(to_update)
+
+    def after_write(self, created, updated, old_facets):
+        deltas = Counter()
+        for product in created:
+            deltas.update(product_facet_values(product))
+        for product in updated:
+            deltas.update(product_facet_values(product))
+            deltas.subtract(old_facets[product.sku])
+        apply_deltas(deltas)
+        self.backend.index(created + updated)
+        products = created + updated
+        if products:
+            bump_products([p.pk for p in products], {p.category_id for p in products})
+
+
+def import_products(stream, file_format, owner, batch_size=DEFAULT_BATCH_SIZE):
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Nieobsługiwany format: {file_format}")
+    return ProductImporter(owner, batch_size).run(stream, file_format)
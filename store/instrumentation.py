@@ -0,0 +1,237 @@
+"""
+Pomiar żądań: liczba i czas zapytań SQL, powtarzające się zapytania (N+1), czas
+renderowania szablonów i rozmiar odpowiedzi.
+
+RequestMetricsMiddleware zakłada na czas żądania obiekt RequestMetrics w zmiennej
+kontekstowej. Zapytania liczy wrapper podpinany do każdego połączenia (signals.py), więc
+obejmuje też zapytania z wątków sync_to_async w widokach async - asgiref przenosi
+kontekst do wątku. Szablony mierzy backend TimedDjangoTemplates (TEMPLATES w ustawieniach).
+
+Wynik trafia do nagłówka Server-Timing (SERVER_TIMING), do liczników w cache sumowanych
+po nazwie adresu (request_metrics(), endpoint metrics/) i do response.metrics.
+SELECT wykonany co najmniej DUPLICATE_THRESHOLD razy w jednym żądaniu to kandydat
+na N+1 - trafia do logu z przykładowym SQL.
+
+Budżety zapytań dla nazw adresów deklaruje QUERY_BUDGETS w urls.py. Przekroczenie
+budżetu jest logowane, a przy QUERY_BUDGET_STRICT kończy się wyjątkiem
+QueryBudgetExceeded - testy sprawdzają budżet każdego adresu ze sklepu.
+"""
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_THRESHOLD = 3
+FIELDS = ('requests', 'duration_us', 'queries', 'sql_us', 'template_us', 'bytes', 'duplicates', 'over_budget')
+METRICS_KEY = 'store:metrics:{name}:{field}'
+
+current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.queries = []
+        self.template_time = 0.0
+        self.size = None
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        """Sygnatury SELECT-ów wykonanych co najmniej DUPLICATE_THRESHOLD razy, z liczbą wykonań."""
+        # Powtarzane UPDATE-y są zamierzone (warunkowe zmiany stanu per pozycja w checkout_cart).
+        counts = Counter(query_signature(sql) for sql, _ in self.queries if sql.startswith('SELECT'))
+        return {sql: count for sql, count in counts.items() if count >= DUPLICATE_THRESHOLD}
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.duration * 1000:.1f}',
+        ])
+
+
+def query_signature(sql):
+    """SQL z parametrami już zastąpionymi %s; listy IN zwijamy, żeby różne długości dawały jedną sygnaturę."""
+    return re.sub(r'IN \((%s, )*%s\)', 'IN (...)', sql)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries.append((sql, time.perf_counter() - start))
+
+
+def instrument_connection(connection):
+    # Wrapper zostaje na obiekcie połączenia także po jego ponownym otwarciu.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Backend DjangoTemplates doliczający czas renderowania do pomiaru żądania."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def query_budgets():
+    from .urls import QUERY_BUDGETS
+    return QUERY_BUDGETS
+
+
+def query_budget(name, method):
+    """Budżet adresu: liczba dla wszystkich metod albo słownik metoda -> liczba."""
+    budget = query_budgets().get(name)
+    if isinstance(budget, dict):
+        return budget.get('GET' if method == 'HEAD' else method)
+    return budget
+
+
+def finish(request, response, metrics):
+    metrics.duration = time.perf_counter() - metrics.start
+    if not response.streaming:
+        metrics.size = len(response.content)
+    response.metrics = metrics
+    if getattr(settings, 'SERVER_TIMING', False):
+        response.headers['Server-Timing'] = metrics.server_timing()
+    match = getattr(request, 'resolver_match', None)
+    name = match.url_name if match else None
+    duplicates = metrics.duplicates()
+    for sql, count in duplicates.items():
+        logger.warning("%s: zapytanie wykonane %s razy (N+1?): %s", name or request.path, count, sql[:300])
+    budget = query_budget(name, request.method)
+    over_budget = budget is not None and metrics.query_count > budget
+    if name and getattr(settings, 'REQUEST_METRICS', True):
+        store(name, metrics, bool(duplicates), over_budget)
+    if over_budget:
+        message = f"{request.method} {name}: {metrics.query_count} zapytań przy budżecie {budget}"
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return response
+
+
+def store(name, metrics, duplicates, over_budget):
+    values = {
+        'requests': 1,
+        'duration_us': int(metrics.duration * 1e6),
+        'queries': metrics.query_count,
+        'sql_us': int(metrics.sql_time * 1e6),
+        'template_us': int(metrics.template_time * 1e6),
+        'bytes': metrics.size or 0,
+        'duplicates': int(duplicates),
+        'over_budget': int(over_budget),
+    }
+    for field, value in values.items():
+        if not value:
+            continue
+        key = METRICS_KEY.format(name=name, field=field)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            if not cache.add(key, value, None):
+                cache.incr(key, value)
+
+
+def metric_names():
+    from .urls import urlpatterns
+    return [pattern.name for pattern in urlpatterns if pattern.name]
+
+
+def request_metrics():
+    """Sumy i średnie dla każdej nazwy adresu ze sklepu, który obsłużył choć jedno żądanie."""
+    names = metric_names()
+    keys = {(name, field): METRICS_KEY.format(name=name, field=field) for name in names for field in FIELDS}
+    values = cache.get_many(list(keys.values()))
+    budgets = query_budgets()
+    result = {}
+    for name in names:
+        totals = {field: values.get(keys[name, field], 0) for field in FIELDS}
+        requests = totals['requests']
+        if not requests:
+            continue
+        result[name] = {
+            'requests': requests,
+            'avg_ms': round(totals['duration_us'] / requests / 1000, 2),
+            'avg_queries': round(totals['queries'] / requests, 2),
+            'avg_sql_ms': round(totals['sql_us'] / requests / 1000, 2),
+            'avg_template_ms': round(totals['template_us'] / requests / 1000, 2),
+            'avg_bytes': round(totals['bytes'] / requests),
+            'with_duplicates': totals['duplicates'],
+            'over_budget': totals['over_budget'],
+            'query_budget': budgets.get(name),
+        }
+    return result
+
+
+def reset_metrics():
+    cache.delete_many([METRICS_KEY.format(name=name, field=field) for name in metric_names() for field in FIELDS])
+
+
+class RequestMetricsMiddleware:
+    """Mierzy każde żądanie; działa pod WSGI i ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = current.set(RequestMetrics())
+        try:
+            response = self.get_response(request)
+            return finish(request, response, current.get())
+        finally:
+            current.reset(token)
+
+    async def __acall__(self, request):
+        token = current.set(RequestMetrics())
+        try:
+            response = await self.get_response(request)
+            return await sync_to_async(finish)(request, response, current.get())
+        finally:
+            current.reset(token)
@@ -0,0 +1,120 @@
+"""
+Trwała kolejka zadań w tabeli Job - bez zewnętrznego brokera.
+
+Zadanie zapisywane jest w tej samej transakcji co zmiana, która je wywołała (np. zamówienie
+w checkout_cart): wycofana transakcja nie zostawia zadania, zatwierdzona - nie gubi go.
+Worker (komenda run_jobs) przejmuje zadania warunkowym UPDATE z losowym znacznikiem,
+więc kilka workerów na jednej bazie nigdy nie wykona tego samego zadania dwa razy naraz.
+Nieudane zadanie wraca do kolejki z wykładniczo rosnącym opóźnieniem, po
+max_attempts próbach zostaje oznaczone jako FAILED.
+
+Klucz idempotencji jest unikalny: ponowne zlecenie z tym samym kluczem nic nie dodaje.
+Funkcje zadań rejestruje się dekoratorem @job('nazwa') (tasks.py) i dostają payload
+jako argumenty nazwane.
+"""
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+# Zadanie RUNNING dłużej niż tyle sekund uznajemy za porzucone przez martwy worker.
+STALE_AFTER = 600
+
+HANDLERS = {}
+
+
+def job(name):
+    def decorator(fn):
+        HANDLERS[name] = fn
+        return fn
+    return decorator
+
+
+def backoff(attempts):
+    """Opóźnienie (w sekundach) kolejnej próby po `attempts` nieudanych."""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def make_job(name, payload=None, key=None, delay=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    if name not in HANDLERS:
+        raise ValueError(f"Nieznane zadanie: {name}")
+    return Job(
+        name=name, payload=payload or {}, idempotency_key=key, max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_many(jobs):
+    """Zapisuje zadania jednym INSERT-em; zadania z zajętym kluczem idempotencji są pomijane."""
+    if jobs:
+        Job.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+def enqueue(name, payload=None, key=None, delay=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    enqueue_many([make_job(name, payload, key, delay, max_attempts)])
+
+
+def claim_jobs(limit, now=None):
+    """Przejmuje do `limit` zadań gotowych do wykonania i zwraca ich identyfikatory."""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        ready = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.PENDING, run_at__lte=now)
+            .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+        )
+        # Warunek status=PENDING w UPDATE rozstrzyga wyścig, gdy baza nie zna SKIP LOCKED (SQLite).
+        Job.objects.filter(pk__in=list(ready), status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(locked_by=token, status=Job.Status.RUNNING).values_list('id', flat=True))
+
+
+def run_job(job_id):
+    """Wykonuje przejęte zadanie i zapisuje wynik. Zwraca True, gdy się powiodło."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        HANDLERS[job.name](**job.payload)
+    except Exception:
+        logger.exception("Zadanie %s (%s) nie powiodło się", job.pk, job.name)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(status=Job.Status.FAILED, last_error=error, finished_at=timezone.now())
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.PENDING, last_error=error, locked_by='',
+                run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.Status.DONE, finished_at=timezone.now(), last_error='')
+    return True
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """Przywraca do kolejki zadania przejęte przez worker, który przestał działać."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.Status.PENDING, locked_by='', run_at=timezone.now(),
+    )
+
+
+def run_pending_jobs(limit=100):
+    """Wykonuje gotowe zadania w bieżącym wątku, aż kolejka się opróżni. Zwraca liczbę wykonanych."""
+    executed = 0
+    while True:
+        claimed = claim_jobs(limit)
+        if not claimed:
+            return executed
+        for job_id in claimed:
+            run_job(job_id)
+        executed += len(claimed)
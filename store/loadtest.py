@@ -0,0 +1,271 @@
+"""
+Scenariusze obciążeniowe gorących ścieżek sklepu i raporty do porównań między commitami.
+
+Scenariusz to funkcja zwracająca kroki jednej iteracji wirtualnego użytkownika - pary
+(etykieta, adres). Runner wykonuje iteracje w puli wątków (każdy wątek to osobny,
+zalogowany użytkownik benchmarkowy, więc cache stron anonimowych nie zaciera pomiaru)
+przez klienta testowego Django w tym samym procesie albo po HTTP na działającym
+serwerze (HttpSession). Dla każdej etykiety raport zawiera
+RPS, percentyle p50/p95/p99 i liczbę zapytań na żądanie - w procesie z response.metrics,
+po HTTP z nagłówka Server-Timing.
+
+Raport zapisywany jest jako JSON (komenda bench_scenarios); compare_reports() wskazuje
+regresje względem raportu z poprzedniego commita.
+"""
+import http.cookiejar
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from .bench import ADJECTIVES, BENCH_PASSWORD, NOUNS, bench_product_ids, bench_users, latency_summary
+from .models import SIZES, Brand, Category, Order, Product, Review
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _browse_params(rng, ctx):
+    choice = rng.randrange(4)
+    if choice == 0:
+        return {'category': rng.choice(ctx['category_ids'])}
+    if choice == 1:
+        return {'brand': rng.choice(ctx['brand_ids'])}
+    if choice == 2:
+        return {'size': rng.choice(SIZES)[0], 'sale': 1}
+    return {}
+
+
+def _url(name, args=None, params=None):
+    url = reverse(name, args=args)
+    return f'{url}?{urllib.parse.urlencode(params)}' if params else url
+
+
+def browse(rng, ctx):
+    return [('browse', _url('product-list-html', params=_browse_params(rng, ctx)))]
+
+
+def browse_api(rng, ctx):
+    return [('browse-api', _url('product-list', params=_browse_params(rng, ctx)))]
+
+
+def search(rng, ctx):
+    query = rng.choice(NOUNS) if rng.random() < 0.7 else f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+    return [('search', _url('product-list', params={'q': query}))]
+
+
+def product(rng, ctx):
+    return [('product', _url('product-detail-html', args=[rng.randint(*ctx['product_ids'])]))]
+
+
+def add_to_cart(rng, ctx):
+    return [('add-to-cart', _url('add-to-cart', args=[rng.randint(*ctx['product_ids'])]))]
+
+
+def checkout(rng, ctx):
+    steps = [('checkout:add', _url('add-to-cart', args=[rng.randint(*ctx['product_ids'])])) for _ in range(2)]
+    return steps + [('checkout', _url('checkout'))]
+
+
+def profile(rng, ctx):
+    return [('profile', _url('profile'))]
+
+
+SCENARIOS = {
+    'browse': browse,
+    'browse-api': browse_api,
+    'search': search,
+    'product': product,
+    'add-to-cart': add_to_cart,
+    'checkout': checkout,
+    'profile': profile,
+}
+
+
+class ClientSession:
+    """Klient testowy Django w bieżącym procesie; liczba zapytań z response.metrics."""
+
+    def __init__(self, user):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        metrics = getattr(response, 'metrics', None)
+        return response.status_code, metrics.query_count if metrics else None
+
+
+class HttpSession:
+    """Klient HTTP działającego serwera; loguje się formularzem logowania."""
+
+    def __init__(self, user, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect,
+        )
+        self.get(reverse('login'))
+        token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        data = urllib.parse.urlencode({
+            'username': user.username, 'password': BENCH_PASSWORD, 'csrfmiddlewaretoken': token,
+        }).encode()
+        request = urllib.request.Request(self.base_url + reverse('login'), data=data, headers={'Referer': self.base_url})
+        self._send(request)
+
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status, response.headers
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers
+
+    def get(self, url):
+        status, headers = self._send(urllib.request.Request(self.base_url + url))
+        match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+        return status, int(match.group(1)) if match else None
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Przekierowanie (np. po dodaniu do koszyka) mierzymy jako osobne żądanie - nie podążamy za nim."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def scenario_context():
+    return {
+        'product_ids': bench_product_ids(),
+        'brand_ids': list(Brand.objects.values_list('id', flat=True)),
+        'category_ids': list(Category.objects.values_list('id', flat=True)),
+    }
+
+
+def run_scenario(name, iterations, concurrency=8, seed=0, base_url=None, ctx=None):
+    """
+    Wykonuje `iterations` iteracji scenariusza w `concurrency` wątkach. Zwraca
+    statystyki dla każdej etykiety kroku.
+
+    concurrency=1 wykonuje wszystko w bieżącym wątku (np. w TestCase).
+    """
+    ctx = ctx or scenario_context()
+    build = SCENARIOS[name]
+    users = list(bench_users()[:concurrency])
+    if len(users) < concurrency:
+        raise ValueError(f"Potrzeba {concurrency} użytkowników benchmarkowych, jest {len(users)} (seed_users)")
+    samples = {}
+    lock = threading.Lock()
+    remaining = iter(range(iterations))
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        session = HttpSession(users[index], base_url) if base_url else ClientSession(users[index])
+        local = []
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                for label, url in build(rng, ctx):
+                    start = time.perf_counter()
+                    try:
+                        status, queries = session.get(url)
+                    except Exception:
+                        status, queries = None, None
+                    local.append((label, (time.perf_counter() - start) * 1000, status, queries))
+        finally:
+            if concurrency > 1:
+                # Wątek puli ma własne połączenie z bazą - nie zostawiamy go otwartego.
+                connection.close()
+        with lock:
+            for label, elapsed, status, queries in local:
+                samples.setdefault(label, []).append((elapsed, status, queries))
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+    return {label: step_stats(rows, wall) for label, rows in samples.items()}
+
+
+def step_stats(rows, wall):
+    timings = [elapsed for elapsed, _, _ in rows]
+    queries = [count for _, _, count in rows if count is not None]
+    return {
+        'requests': len(rows),
+        'errors': sum(status is None or status >= 500 for _, status, _ in rows),
+        'rps': round(len(rows) / wall, 2) if wall else None,
+        **latency_summary(timings),
+        'queries_avg': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_size():
+    return {
+        'products': Product.objects.count(),
+        'users': User.objects.count(),
+        'reviews': Review.objects.count(),
+        'orders': Order.objects.count(),
+    }
+
+
+def build_report(results, config, data):
+    return {
+        'created': timezone.now().isoformat(),
+        'commit': current_commit(),
+        'database': connection.vendor,
+        'config': config,
+        'data': data,
+        'results': results,
+    }
+
+
+def compare_reports(baseline, report, tolerance=0.1):
+    """
+    Regresje raportu względem bazowego: p95 lub RPS gorsze o więcej niż `tolerance`
+    (ułamek) albo więcej zapytań na żądanie. Zwraca listę opisów.
+    """
+    problems = []
+    for label, stats in report['results'].items():
+        old = baseline['results'].get(label)
+        if not old:
+            continue
+        if old['p95_ms'] and stats['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            problems.append(f"{label}: p95 {old['p95_ms']} -> {stats['p95_ms']} ms")
+        if old['rps'] and stats['rps'] < old['rps'] * (1 - tolerance):
+            problems.append(f"{label}: RPS {old['rps']} -> {stats['rps']}")
+        if old['queries_avg'] is not None and stats['queries_avg'] is not None and stats['queries_avg'] > old['queries_avg']:
+            problems.append(f"{label}: zapytań na żądanie {old['queries_avg']} -> {stats['queries_avg']}")
+    return problems
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2, ensure_ascii=False)
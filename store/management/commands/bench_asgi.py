@@ -0,0 +1,77 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from store.bench import bench_owner, bench_product_count, percentile, seed_products
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Porównuje przepustowość katalogu pod WSGI (pula wątków) i ASGI (pętla zdarzeń) "
+        "przy równoległych żądaniach, w procesie, bez serwera HTTP (uruchamiaj na bazie testowej)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, help="Domyślnie 2000, tylko z BENCH_DATABASE=1.")
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--threads', type=int, default=8, help="Wątki obsługujące żądania WSGI.")
+
+    def handle(self, *args, **options):
+        # Klient testowy wysyła Host: testserver i e-maile do pamięci.
+        setup_test_environment()
+        seed_products(bench_product_count(options['products'], default=2000))
+        product = Product.objects.order_by('-id').first()
+        # Zalogowany użytkownik omija cache stron - mierzymy pracę widoków, nie trafienia w cache.
+        login = Client()
+        login.force_login(bench_owner())
+        cookies = login.cookies
+        paths = {
+            'lista HTML': reverse('product-list-html'),
+            'produkt HTML': reverse('product-detail-html', args=[product.pk]),
+            'lista API': reverse('product-list'),
+            'produkt API': reverse('product-detail', args=[product.pk]),
+        }
+        for label, path in paths.items():
+            wsgi = self.run_wsgi(path, cookies, options)
+            asgi = asyncio.run(self.run_asgi(path, cookies, options))
+            self.stdout.write(
+                f"{label:14} WSGI {wsgi[0]:>8.1f} req/s (p95 {wsgi[1]:>7.1f} ms)   "
+                f"ASGI {asgi[0]:>8.1f} req/s (p95 {asgi[1]:>7.1f} ms)"
+            )
+
+    def run_wsgi(self, path, cookies, options):
+        def fetch(_):
+            client = Client()
+            client.cookies = cookies
+            start = time.perf_counter()
+            try:
+                client.get(path)
+            finally:
+                connection.close()
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            timings = list(pool.map(fetch, range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - start), percentile(timings, 95)
+
+    async def run_asgi(self, path, cookies, options):
+        client = AsyncClient()
+        client.cookies = cookies
+        limit = asyncio.Semaphore(options['concurrency'])
+
+        async def fetch():
+            async with limit:
+                start = time.perf_counter()
+                await client.get(path)
+                return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(fetch() for _ in range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - start), percentile(timings, 95)
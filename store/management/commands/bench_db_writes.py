@@ -0,0 +1,56 @@
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+from store.bench import bench_owner, run_cart_writes, summary
+from store.models import Product
+
+# Zachowanie SQLite bez strojenia: dziennik rollback, pełny fsync, 5 s oczekiwania na blokadę.
+SQLITE_DEFAULTS = {'journal_mode': 'delete', 'synchronous': 'full', 'busy_timeout': 5000, 'mmap_size': 0}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mierzy równoległe dodawanie do koszyka i zamówienia na skonfigurowanej bazie; "
+        "na SQLite porównuje ustawienia domyślne z SQLITE_PRAGMAS (uruchamiaj na bazie testowej)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--products', type=int, default=50)
+        parser.add_argument('--items', type=int, default=3, help="Produktów w każdym koszyku.")
+
+    def handle(self, *args, **options):
+        owner = bench_owner()
+        run_id = int(time.time())
+        Product.objects.bulk_create([
+            Product(name=f"Zapis {i}", sku=f'WRITE-{run_id}-{i}', price=Decimal('19.99'), stock_count=10 ** 6, owner=owner)
+            for i in range(options['products'])
+        ])
+        products = list(Product.objects.filter(sku__startswith=f'WRITE-{run_id}-'))
+
+        if connection.vendor == 'sqlite':
+            profiles = {'SQLite domyślne': SQLITE_DEFAULTS, 'SQLite strojone': settings.SQLITE_PRAGMAS}
+        else:
+            profiles = {connection.vendor: settings.SQLITE_PRAGMAS}
+        for number, (label, pragmas) in enumerate(profiles.items()):
+            prefix = f'writer-{run_id}-{number}-'
+            User.objects.bulk_create([User(username=f'{prefix}{i}') for i in range(options['buyers'])])
+            users = list(User.objects.filter(username__startswith=prefix))
+            # PRAGMA działają od nowego połączenia; journal_mode zmienia się tylko bez innych połączeń.
+            connections.close_all()
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                connection.ensure_connection()
+                start = time.perf_counter()
+                timings, stats = run_cart_writes(users, products, options['threads'], options['items'])
+                elapsed = time.perf_counter() - start
+                connections.close_all()
+            timing = summary(timings)
+            self.stdout.write(
+                f"{label:16} zamówień {stats['orders'] / elapsed:>7.1f}/s, operacji {len(timings) / elapsed:>7.1f}/s, "
+                f"mediana {timing['median_ms']} ms, p95 {timing['p95_ms']} ms, ponowień po blokadzie {stats['locked']}"
+            )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from store.bench import bench_product_count, measure, seed_products, summary
+from store.facets import FACET_FIELDS, compute_facet_counts, grouped_counts
+from store.filters import filter_products
+from store.models import Brand, Category, Product
+
+
+class Command(BaseCommand):
+    help = "Mierzy czas odpowiedzi faset na dużym katalogu (uruchamiaj na bazie testowej)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, help="Np. 1000000; bez niej tylko z BENCH_DATABASE=1.")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        created = seed_products(bench_product_count(options['products']))
+        self.stdout.write(f"Dodano produktów: {created}, w bazie: {Product.objects.count()}")
+        brand = Brand.objects.order_by('id').first()
+        category = Category.objects.order_by('id').first()
+        scenarios = {
+            'bez filtrów (tabela liczników)': '',
+            'rozmiar M': 'size=M',
+            'marka + wyprzedaż': f'brand={brand.pk}&sale=1',
+            'kategoria + płeć + cena': f'category={category.pk}&gender=K&min_price=100&max_price=200',
+            'wyszukiwanie + kolor': 'q=koszulka&colors=C',
+        }
+        repeat = options['repeat']
+
+        def full_group_by():
+            return {facet: grouped_counts(Product.objects.all(), facet) for facet in FACET_FIELDS}
+
+        baseline = summary(measure(full_group_by, repeat))
+        self.stdout.write(f"{'GROUP BY po całym katalogu':36} {baseline['median_ms']:>9} ms (p95 {baseline['p95_ms']})")
+        for label, query in scenarios.items():
+            params = QueryDict(query)
+
+            def request():
+                page = list(filter_products(Product.objects.all(), params)[:20])
+                return page, compute_facet_counts(params)
+
+            result = summary(measure(request, repeat))
+            self.stdout.write(f"{label:36} {result['median_ms']:>9} ms (p95 {result['p95_ms']})")
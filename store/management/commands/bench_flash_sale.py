@@ -0,0 +1,40 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from store.bench import bench_owner, run_flash_sale, summary
+from store.models import Product, StockHold
+
+
+class Command(BaseCommand):
+    help = "Symuluje wyprzedaż: wielu kupujących naraz rezerwuje i zamawia jeden produkt (uruchamiaj na bazie testowej)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=500)
+        parser.add_argument('--stock', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=16)
+
+    def handle(self, *args, **options):
+        product = Product.objects.create(
+            name="Wyprzedaż błyskawiczna", price=Decimal('49.99'), sale=True,
+            stock_count=options['stock'], owner=bench_owner(),
+        )
+        prefix = f'flash-{product.pk}-'
+        User.objects.bulk_create([User(username=f'{prefix}{i}') for i in range(options['buyers'])])
+        users = list(User.objects.filter(username__startswith=prefix))
+
+        outcomes, timings = run_flash_sale(product, users, options['threads'])
+        product.refresh_from_db()
+        timing = summary(timings)
+        self.stdout.write(
+            f"kupujących {len(users)}, wątków {options['threads']}: sprzedano {outcomes['sold']}, "
+            f"odrzucono {outcomes['rejected']}, błędy zamówienia {outcomes['failed']}"
+        )
+        self.stdout.write(f"czas zakupu: mediana {timing['median_ms']} ms, p95 {timing['p95_ms']} ms")
+        self.stdout.write(
+            f"stan po wyprzedaży: {product.stock_count}, zarezerwowane: {product.reserved_count}, "
+            f"rezerwacje: {StockHold.objects.filter(product=product).count()}"
+        )
+        if outcomes['sold'] + product.stock_count != options['stock'] or product.reserved_count:
+            self.stderr.write(self.style.ERROR("Niespójny stan magazynowy!"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Stan magazynowy spójny"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from store.bench import bench_product_count, measure, seed_products, summary
+from store.models import Product
+from store.pagination import encode_cursor, keyset_page
+
+
+class Command(BaseCommand):
+    help = "Porównuje czas głębokich stron: OFFSET + COUNT kontra kursor (uruchamiaj na bazie testowej)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, help="Np. 1000000; bez niej tylko z BENCH_DATABASE=1.")
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--pages', type=int, nargs='*', default=[1, 10, 100, 1000, 10000])
+
+    def handle(self, *args, **options):
+        seed_products(bench_product_count(options['products']))
+        size = options['page_size']
+        queryset = Product.objects.all()
+        total = queryset.count()
+        # Strony spoza mniejszego katalogu (np. BENCH_PRODUCTS) są pomijane.
+        for number in [number for number in options['pages'] if (number - 1) * size < total]:
+            offset = (number - 1) * size
+            anchor = queryset.order_by('-created_at', '-id')[offset - 1] if offset else None
+            cursor = encode_cursor(anchor) if anchor else None
+
+            def offset_page():
+                paginator = Paginator(queryset, size)
+                return list(paginator.page(number)) if number <= paginator.num_pages else []
+
+            def cursor_page():
+                return list(keyset_page(queryset, cursor, size))
+
+            old = summary(measure(offset_page, options['repeat']))
+            new = summary(measure(cursor_page, options['repeat']))
+            self.stdout.write(
+                f"strona {number:>7}: OFFSET+COUNT {old['median_ms']:>9} ms   kursor {new['median_ms']:>7} ms"
+            )
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+from store.bench import bench_product_count, seed_orders, seed_products, seed_reviews, seed_users
+from store.loadtest import (
+    SCENARIOS, build_report, compare_reports, dataset_size, load_report, run_scenario, save_report, scenario_context,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Zasiewa deterministyczne dane (produkty, użytkownicy, opinie, zamówienia) i mierzy "
+        "scenariusze gorących ścieżek sklepu: p50/p95/p99, RPS i zapytania na żądanie. "
+        "Raport JSON można porównać z raportem z poprzedniego commita (uruchamiaj na bazie testowej)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int,
+            help="Domyślnie 100000, tylko z BENCH_DATABASE=1; np. 2000000 dla pełnej skali.",
+        )
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=50_000)
+        parser.add_argument('--orders', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scenarios', nargs='*', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--iterations', type=int, default=200, help="Iteracji każdego scenariusza.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--url', help="Adres działającego serwera (np. http://127.0.0.1:8000) zamiast klienta w procesie.")
+        parser.add_argument('--output', help="Plik JSON na raport.")
+        parser.add_argument('--baseline', help="Raport JSON do porównania; regresje kończą komendę błędem.")
+        parser.add_argument('--tolerance', type=float, default=0.1, help="Dopuszczalne pogorszenie p95 i RPS (ułamek).")
+
+    def handle(self, *args, **options):
+        if not options['url']:
+            # Klient testowy wysyła Host: testserver.
+            setup_test_environment()
+        products = bench_product_count(options['products'], default=100_000)
+        seeded = {
+            'products': seed_products(products, seed=options['seed']),
+            'users': seed_users(max(options['users'], options['concurrency'])),
+            'reviews': seed_reviews(options['reviews'], seed=options['seed']),
+            'orders': seed_orders(options['orders'], seed=options['seed']),
+        }
+        self.stdout.write("Dodano: " + ', '.join(f"{name} {count}" for name, count in seeded.items()))
+
+        ctx = scenario_context()
+        results = {}
+        for name in options['scenarios']:
+            results.update(run_scenario(
+                name, options['iterations'], options['concurrency'], options['seed'], options['url'], ctx,
+            ))
+        self.stdout.write(f"{'krok':14} {'żądania':>8} {'błędy':>6} {'RPS':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'zapytania':>10}")
+        for label, stats in results.items():
+            queries = '-' if stats['queries_avg'] is None else f"{stats['queries_avg']:.1f}"
+            self.stdout.write(
+                f"{label:14} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {queries:>10}"
+            )
+
+        config = {name: options[name] for name in ('products', 'users', 'reviews', 'orders', 'seed', 'iterations', 'concurrency', 'url')}
+        report = build_report(results, config, dataset_size())
+        if options['output']:
+            save_report(report, options['output'])
+            self.stdout.write(f"Raport zapisany w {options['output']}")
+        if options['baseline']:
+            problems = compare_reports(load_report(options['baseline']), report, options['tolerance'])
+            for problem in problems:
+                self.stderr.write(f"  {problem}")
+            if problems:
+                raise CommandError(f"Regresje względem {options['baseline']}: {len(problems)}")
+            self.stdout.write(self.style.SUCCESS("Brak regresji względem raportu bazowego."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from store.bench import bench_product_count, measure, seed_products, summary
+from store.models import Product
+from store.search import get_backend
+
+DEFAULT_QUERIES = ['koszulka', 'lniana sukienka', 'wełniane swetry', 'wolczanka', 'podszewka zimowa', 'xyz']
+
+
+class Command(BaseCommand):
+    help = "Porównuje wyszukiwanie pełnotekstowe z dotychczasowym name__icontains (uruchamiaj na bazie testowej)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int,
+            help="Liczba produktów benchmarkowych w bazie (np. 1000000); bez niej tylko z BENCH_DATABASE=1.",
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=20, help="Rozmiar strony wyników.")
+        parser.add_argument('query', nargs='*', default=DEFAULT_QUERIES)
+
+    def handle(self, *args, **options):
+        created = seed_products(bench_product_count(options['products']))
+        self.stdout.write(f"Dodano produktów: {created}, w bazie: {Product.objects.count()}")
+        backend = get_backend()
+        limit = options['limit']
+
+        for query in options['query']:
+            def icontains():
+                queryset = Product.objects.filter(name__icontains=query)
+                return queryset.count(), list(queryset[:limit])
+
+            def fulltext():
+                queryset = backend.search(Product.objects.all(), query)
+                return queryset.count(), list(queryset[:limit])
+
+            old = summary(measure(icontains, options['repeat']))
+            new = summary(measure(fulltext, options['repeat']))
+            self.stdout.write(
+                f"{query!r:24} icontains: {old['median_ms']:>9} ms (p95 {old['p95_ms']})  "
+                f"{type(backend).__name__}: {new['median_ms']:>9} ms (p95 {new['p95_ms']})"
+            )
@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# Importy z aplikacji są leniwe: przy starcie procesów metodą "spawn" moduł jest
+# ładowany w procesie potomnym, zanim Django zostanie skonfigurowane.
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _process(product_id):
+    from store.images import process_product_image
+    return process_product_image(product_id)
+
+
+class Command(BaseCommand):
+    help = "Generuje warianty zdjęć produktów (miniatury, WebP/AVIF) równolegle w puli procesów."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Liczba procesów; 1 przetwarza w bieżącym procesie.")
+        parser.add_argument('--all', action='store_true', help="Przetwarza także produkty, które mają już warianty.")
+
+    def handle(self, *args, **options):
+        from store.models import Product
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.filter(image_variants={})
+        product_ids = list(products.order_by('id').values_list('id', flat=True))
+
+        if options['workers'] <= 1:
+            processed = sum(_process(product_id) for product_id in product_ids)
+        else:
+            # Procesy potomne otwierają własne połączenia - nie mogą dziedziczyć połączenia rodzica.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                processed = sum(pool.map(_process, product_ids, chunksize=8))
+        self.stdout.write(self.style.SUCCESS(f"Przetworzono zdjęć: {processed} z {len(product_ids)}"))
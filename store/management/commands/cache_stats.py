@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from store.caching import cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Pokazuje liczniki trafień i chybień cache stron katalogu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zeruje liczniki po wypisaniu.")
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        ratio = '-' if stats['hit_ratio'] is None else f"{stats['hit_ratio']:.1%}"
+        self.stdout.write(f"Trafienia: {stats['hits']}  chybienia: {stats['misses']}  skuteczność: {ratio}")
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from store.query_plans import audit
+
+
+class Command(BaseCommand):
+    help = "Sprawdza EXPLAIN kluczowych zapytań: błędem jest pełny skan tabeli albo sortowanie bez indeksu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', action='store_true', help="Wypisz plany wszystkich zapytań.")
+
+    def handle(self, *args, **options):
+        failures = 0
+        for name, lines, problems in audit():
+            if options['plans'] or problems:
+                self.stdout.write(name)
+                for line in lines:
+                    self.stdout.write(f"    {line}")
+            for problem in problems:
+                self.stderr.write(f"  {name}: {problem}")
+            failures += bool(problems)
+        if failures:
+            raise CommandError(f"Zapytania bez pasującego indeksu: {failures}")
+        self.stdout.write(self.style.SUCCESS("Wszystkie kluczowe zapytania korzystają z indeksów."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from store.exporter import EXPORT_CONTENT_TYPES, export_products
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Eksportuje katalog produktów do CSV lub JSONL (strumieniowo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', help="Plik wynikowy; domyślnie standardowe wyjście.")
+
+    def handle(self, *args, **options):
+        chunks = export_products(Product.objects.all(), options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,39 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from store.importer import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, import_products
+
+
+class Command(BaseCommand):
+    help = "Importuje produkty z pliku CSV lub JSONL partiami (bulk_create/bulk_update)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--owner', required=True, help="Nazwa użytkownika - właściciela nowych produktów.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Domyślnie z rozszerzenia pliku.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--errors', help="Zapisuje błędy wierszy do pliku JSONL.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"Nie ma użytkownika {options['owner']}")
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f"Nieobsługiwany format: {file_format}")
+
+        with open(options['path'], 'rb') as stream:
+            report = import_products(stream, file_format, owner, batch_size=options['batch_size'])
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as errors:
+                for error in report.errors:
+                    errors.write(json.dumps(error, ensure_ascii=False) + '\n')
+        for error in report.errors[:10]:
+            self.stderr.write(f"Linia {error['line']}: {error['errors']}")
+        if report.truncated:
+            self.stderr.write(f"Raport zawiera tylko {len(report.errors)} z {report.error_count} błędnych wierszy.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Utworzono: {report.created}, zaktualizowano: {report.updated}, błędne wiersze: {report.error_count}"
+        ))
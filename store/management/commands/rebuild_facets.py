@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from store.facets import rebuild_facet_counts
+from store.models import FacetCount
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera tabelę liczników faset katalogu."
+
+    def handle(self, *args, **options):
+        rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(f"Zapisano liczników: {FacetCount.objects.count()}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera zapisane na produktach oceny (liczba opinii, średnia, histogram)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono oceny produktów z opiniami: {updated}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera dzienne sumy sprzedaży (SalesRollup), czytając zamówienia partiami."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_sales_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Zapisano wierszy sum sprzedaży: {rows}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.models import Product
+from store.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Odtwarza indeks wyszukiwania pełnotekstowego produktów."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        with transaction.atomic():
+            count = backend.rebuild(Product.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Zaindeksowano produktów: {count} ({type(backend).__name__})"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from store.models import Cart
+from store.services import reconcile_cart_totals
+
+
+class Command(BaseCommand):
+    help = "Przelicza zapisane sumy koszyków z pozycji i naprawia rozbieżności."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Sprawdź także zrealizowane zamówienia.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.all() if options['all'] else Cart.objects.filter(is_ordered=False)
+        fixed = reconcile_cart_totals(carts, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Poprawiono koszyków: {fixed}"))
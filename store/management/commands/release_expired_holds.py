@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from store.reservations import DEFAULT_SWEEP_BATCH, reconcile_reserved_counts, sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Zwalnia przeterminowane rezerwacje koszyków (uruchamiaj z crona albo z --interval)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_SWEEP_BATCH)
+        parser.add_argument('--interval', type=int, default=0, help="Powtarzaj co tyle sekund zamiast jednego przebiegu.")
+        parser.add_argument('--reconcile', action='store_true', help="Przelicz też reserved_count z rezerwacji.")
+
+    def handle(self, *args, **options):
+        while True:
+            swept = sweep_expired_holds(batch_size=options['batch_size'])
+            self.stdout.write(f"Zwolniono rezerwacji: {swept}")
+            if options['reconcile']:
+                fixed = reconcile_reserved_counts()
+                self.stdout.write(f"Poprawiono liczników rezerwacji: {fixed}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS("Gotowe"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from store.instrumentation import request_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = "Pokazuje średni czas, liczbę zapytań i rozmiar odpowiedzi dla każdego adresu sklepu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zeruje liczniki po wypisaniu.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'adres':24} {'żądania':>8} {'ms':>8} {'zapytania':>10} {'budżet':>7} {'SQL ms':>8} "
+            f"{'szablon ms':>11} {'bajty':>9} {'N+1':>5}"
+        )
+        for name, stats in sorted(request_metrics().items(), key=lambda item: -item[1]['avg_ms']):
+            budget = '-' if stats['query_budget'] is None else stats['query_budget']
+            self.stdout.write(
+                f"{name:24} {stats['requests']:>8} {stats['avg_ms']:>8.2f} {stats['avg_queries']:>10.2f} {budget:>7} "
+                f"{stats['avg_sql_ms']:>8.2f} {stats['avg_template_ms']:>11.2f} {stats['avg_bytes']:>9} {stats['with_duplicates']:>5}"
+            )
+        if options['reset']:
+            reset_metrics()
@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+# Importy z aplikacji są leniwe: przy starcie procesów metodą "spawn" moduł jest
+# ładowany w procesie potomnym, zanim Django zostanie skonfigurowane.
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _run(job_id):
+    from store.jobs import run_job
+    try:
+        return run_job(job_id)
+    finally:
+        # Wątek puli ma własne połączenie z bazą - nie zostawiamy go otwartego.
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Worker kolejki zadań: wykonuje zadania z tabeli Job w puli wątków albo procesów."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Liczba wątków lub procesów; 1 wykonuje w bieżącym wątku.")
+        parser.add_argument('--processes', action='store_true', help="Pula procesów zamiast wątków.")
+        parser.add_argument('--poll', type=float, default=1.0, help="Odstęp (s) sprawdzania pustej kolejki.")
+        parser.add_argument('--once', action='store_true', help="Wykonaj gotowe zadania i zakończ.")
+
+    def handle(self, *args, **options):
+        from store.jobs import claim_jobs, requeue_stale, run_job
+
+        workers = options['workers']
+        if workers <= 1:
+            pool = None
+        elif options['processes']:
+            # Procesy potomne otwierają własne połączenia - nie mogą dziedziczyć połączenia rodzica.
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+        done = failed = 0
+        try:
+            while True:
+                requeue_stale()
+                claimed = claim_jobs(max(workers, 1) * 2)
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                results = pool.map(_run, claimed) if pool else map(run_job, claimed)
+                for succeeded in results:
+                    done += succeeded
+                    failed += not succeeded
+        except KeyboardInterrupt:
+            self.stdout.write("Przerwano - przejęte zadania wrócą do kolejki po czasie STALE_AFTER.")
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Wykonano zadań: {done}, nieudanych prób: {failed}"))
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.deprecation import MiddlewareMixin
+
+
+class AsyncUrlconfMiddleware(MiddlewareMixin):
+    """Pod ASGI kieruje gorące ścieżki katalogu do widoków async (store/async_views.py)."""
+
+    def process_request(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASYNC_ROOT_URLCONF
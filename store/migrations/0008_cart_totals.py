@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:52
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_prices_and_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    items = CartItem.objects.select_related('product').only('id', 'product__price')
+    batch = []
+    for item in items.iterator(chunk_size=1000):
+        item.unit_price = item.product.price
+        batch.append(item)
+        if len(batch) >= 1000:
+            CartItem.objects.bulk_update(batch, ['unit_price'])
+            batch = []
+    CartItem.objects.bulk_update(batch, ['unit_price'])
+
+    line_total = models.ExpressionWrapper(F('cart_items__unit_price') * F('cart_items__quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    carts = Cart.objects.annotate(actual_total=Sum(line_total), actual_count=Sum('cart_items__quantity')).filter(actual_count__gt=0)
+    batch = []
+    for cart in carts.iterator(chunk_size=1000):
+        cart.total_price = cart.actual_total or Decimal('0.00')
+        cart.item_count = cart.actual_count
+        batch.append(cart)
+        if len(batch) >= 1000:
+            Cart.objects.bulk_update(batch, ['total_price', 'item_count'])
+            batch = []
+    Cart.objects.bulk_update(batch, ['total_price', 'item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_cart_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, help_text='Liczba sztuk w koszyku.'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Suma koszyka aktualizowana przy każdej zmianie pozycji.', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Cena produktu w chwili dodania do koszyka.', max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_prices_and_totals, migrations.RunPython.noop),
+    ]
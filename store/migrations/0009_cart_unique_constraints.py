@@ -0,0 +1,54 @@
+# Generated by Django 4.2.27 on 2026-10-18 20:05
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """Scala zdublowane otwarte koszyki i pozycje, zanim pojawią się unikalne indeksy."""
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    touched = set()
+
+    users = Cart.objects.filter(is_ordered=False).values('user_id').annotate(n=Count('id')).filter(n__gt=1)
+    for row in users:
+        carts = list(Cart.objects.filter(user_id=row['user_id'], is_ordered=False).order_by('created_at', 'id'))
+        keep, duplicates = carts[0], carts[1:]
+        CartItem.objects.filter(cart__in=duplicates).update(cart=keep)
+        Cart.objects.filter(pk__in=[cart.pk for cart in duplicates]).delete()
+        touched.add(keep.pk)
+
+    lines = CartItem.objects.values('cart_id', 'product_id').annotate(n=Count('id'), qty=Sum('quantity')).filter(n__gt=1)
+    for row in lines:
+        items = list(CartItem.objects.filter(cart_id=row['cart_id'], product_id=row['product_id']).order_by('id'))
+        keep = items[0]
+        keep.quantity = row['qty']
+        keep.save(update_fields=['quantity'])
+        CartItem.objects.filter(pk__in=[item.pk for item in items[1:]]).delete()
+        touched.add(row['cart_id'])
+
+    line_total = models.ExpressionWrapper(F('cart_items__unit_price') * F('cart_items__quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    for cart in Cart.objects.filter(pk__in=touched).annotate(actual_total=Sum(line_total), actual_count=Sum('cart_items__quantity')):
+        cart.total_price = cart.actual_total or Decimal('0.00')
+        cart.item_count = cart.actual_count or 0
+        cart.save(update_fields=['total_price', 'item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_ordered', False)), fields=('user',), name='unique_open_cart_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
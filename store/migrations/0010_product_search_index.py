@@ -0,0 +1,89 @@
+# Generated by Django 4.2.27 on 2026-10-18 20:31
+
+import unicodedata
+from django.db import migrations
+
+BATCH_SIZE = 1000
+POLISH_LETTERS = str.maketrans({'ł': 'l', 'Ł': 'l'})
+
+# Schemat indeksu i jego wypełnienie zapisane wprost, bez importu store.search - migracja
+# nie może zależeć od bieżącej wersji modułu. Dalej wiersze indeksuje store.search
+# (sygnały przy zapisie produktu); rebuild_search_index odtwarza indeks od zera.
+CREATE_SQL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts "
+        "USING fts5(name, description, brand, category, tokenize='unicode61 remove_diacritics 2')",
+        # Wagi bm25 dla kolumn name, description, brand, category.
+        "INSERT INTO store_product_fts (store_product_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 4.0, 4.0)')",
+    ],
+    'postgresql': [
+        "CREATE TABLE IF NOT EXISTS store_product_search ("
+        "product_id bigint PRIMARY KEY REFERENCES store_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "document tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS store_product_search_document_gin ON store_product_search USING GIN (document)",
+    ],
+}
+INSERT_SQL = {
+    'sqlite': "INSERT INTO store_product_fts (rowid, name, description, brand, category) VALUES (%s, %s, %s, %s, %s)",
+    'postgresql': (
+        "INSERT INTO store_product_search (product_id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'B')) "
+        "ON CONFLICT (product_id) DO NOTHING"
+    ),
+}
+DROP_SQL = {
+    'sqlite': ["DROP TABLE IF EXISTS store_product_fts"],
+    'postgresql': ["DROP TABLE IF EXISTS store_product_search"],
+}
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+def fold(text):
+    """Małe litery, bez polskich znaków diakrytycznych - jak search.fold w chwili tej migracji."""
+    text = (text or '').translate(POLISH_LETTERS).lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def index_products(apps, schema_editor):
+    """Indeksuje istniejące produkty, partiami po BATCH_SIZE - wyszukiwanie działa od razu po migracji."""
+    sql = INSERT_SQL.get(schema_editor.connection.vendor)
+    if sql is None:
+        return
+    Product = apps.get_model('store', 'Product')
+    products = Product.objects.select_related('brand', 'category').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        rows = [
+            (
+                product.pk, fold(product.name), fold(product.description),
+                fold(product.brand.name if product.brand_id else ''),
+                fold(product.category.name if product.category_id else ''),
+            )
+            for product in batch
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_cart_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_vendor_sql(CREATE_SQL), run_vendor_sql(DROP_SQL)),
+        migrations.RunPython(index_products, migrations.RunPython.noop),
+    ]
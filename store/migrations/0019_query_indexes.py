@@ -0,0 +1,66 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_job'),
+    ]
+
+    # Nowe indeksy powstają przed usunięciem starych - zapytania nie zostają bez indeksu.
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('is_ordered', True)), fields=['user', '-ordered_at'], name='cart_user_ordered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='product_category_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand', '-created_at', '-id'], name='product_brand_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['sale', '-created_at', '-id'], name='product_sale_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['gender', 'size', '-created_at', '-id'], name='product_gender_size_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['size', '-created_at', '-id'], name='product_size_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_average', '-review_count', '-id'], name='product_rating_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-created_at'], name='review_user_created_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_category_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_brand_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_sale_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_gender_size_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_rating_idx',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_query_indexes'),
+    ]
+
+    # Nowe indeksy powstają przed usunięciem starych - zapytania nie zostają bez indeksu.
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('is_ordered', True)), fields=['user', '-ordered_at', '-id'], name='cart_user_ordered_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='review_user_created_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='cart_user_ordered_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_user_created_idx',
+        ),
+    ]
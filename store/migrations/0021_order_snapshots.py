@@ -0,0 +1,97 @@
+# Generated by Django 4.2.27 on 2026-10-19 04:20
+
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def backfill_orders(apps, schema_editor):
+    """Zapisuje zamówione koszyki jako Order/OrderLine, partiami po BATCH_SIZE koszyków."""
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    Order = apps.get_model('store', 'Order')
+    OrderLine = apps.get_model('store', 'OrderLine')
+    carts = Cart.objects.filter(is_ordered=True, order__isnull=True).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(carts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        items = defaultdict(list)
+        for item in CartItem.objects.filter(cart_id__in=[cart.pk for cart in batch]).select_related('product').order_by('id'):
+            items[item.cart_id].append(item)
+        Order.objects.bulk_create([
+            Order(
+                user_id=cart.user_id, cart_id=cart.pk, ordered_at=cart.ordered_at or cart.created_at, status=cart.status,
+                total_price=sum((item.unit_price * item.quantity for item in items[cart.pk]), Decimal('0.00')),
+                item_count=sum(item.quantity for item in items[cart.pk]),
+            )
+            for cart in batch
+        ])
+        # bulk_create nie na każdej bazie zwraca klucze - identyfikatory czytamy po cart_id.
+        order_ids = dict(Order.objects.filter(cart_id__in=items).values_list('cart_id', 'id'))
+        OrderLine.objects.bulk_create([
+            OrderLine(
+                order_id=order_ids[cart_id], product_id=item.product_id, brand_id=item.product.brand_id,
+                category_id=item.product.category_id, product_name=item.product.name, sku=item.product.sku,
+                quantity=item.quantity, unit_price=item.unit_price, line_total=item.unit_price * item.quantity,
+            )
+            for cart_id, cart_items in items.items() for item in cart_items
+        ])
+
+
+def restore_cart_status(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    Order = apps.get_model('store', 'Order')
+    for status in Order.objects.values_list('status', flat=True).distinct():
+        Cart.objects.filter(order__status=status).update(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0020_history_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordered_at', models.DateTimeField(editable=False)),
+                ('status', models.CharField(choices=[('waiting', 'Oczekujące na wpłatę'), ('processing', 'W realizacji'), ('shipped', 'Wysłane'), ('delivered', 'Dostarczone'), ('cancelled', 'Anulowane')], default='waiting', max_length=20)),
+                ('total_price', models.DecimalField(decimal_places=2, editable=False, max_digits=12)),
+                ('item_count', models.PositiveIntegerField(editable=False)),
+                ('cart', models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order', to='store.cart')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', '-ordered_at', '-id'], name='order_user_ordered_id_idx'),
+                    models.Index(fields=['-ordered_at', '-id'], name='order_ordered_id_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=50)),
+                ('sku', models.CharField(blank=True, max_length=30)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='store.order')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_lines', to='store.product')),
+                ('brand', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.brand')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.category')),
+            ],
+        ),
+        migrations.RunPython(backfill_orders, restore_cart_status),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-19 04:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_order_snapshots'),
+    ]
+
+    # Status i historia zamówień są już w Order (0021) - koszyk ich nie przechowuje.
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='cart_user_ordered_id_idx',
+        ),
+        migrations.RemoveField(
+            model_name='cart',
+            name='status',
+        ),
+    ]
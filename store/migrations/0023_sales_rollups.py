@@ -0,0 +1,85 @@
+# Generated by Django 4.2.27 on 2026-10-19 05:40
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+# Wymiar -> pole pozycji zamówienia z kluczem (stan z chwili tej migracji, niezależny od store.rollups).
+DIMENSIONS = {'product': 'product_id', 'brand': 'brand_id', 'category': 'category_id'}
+
+
+def add(row, orders, units, revenue):
+    row[0] += orders
+    row[1] += units
+    row[2] += revenue
+
+
+def fill_rollups(apps, schema_editor):
+    """Liczy sumy istniejących zamówień, partiami po BATCH_SIZE; później utrzymuje je zadanie sales.rollup."""
+    Order = apps.get_model('store', 'Order')
+    OrderLine = apps.get_model('store', 'OrderLine')
+    SalesRollup = apps.get_model('store', 'SalesRollup')
+    totals = defaultdict(lambda: [0, 0, Decimal('0.00')])
+    orders = Order.objects.only('id', 'ordered_at', 'status', 'total_price', 'item_count').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(orders.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        lines = defaultdict(list)
+        for line in OrderLine.objects.filter(order_id__in=[order.pk for order in batch]):
+            lines[line.order_id].append(line)
+        for order in batch:
+            day = timezone.localdate(order.ordered_at)
+            add(totals['total', 0, day, order.status], 1, order.item_count, order.total_price)
+            for dimension, field in DIMENSIONS.items():
+                counted = set()
+                for line in lines[order.pk]:
+                    key = getattr(line, field) or 0
+                    add(totals[dimension, key, day, order.status], int(key not in counted), line.quantity, line.line_total)
+                    counted.add(key)
+    SalesRollup.objects.bulk_create([
+        SalesRollup(dimension=dimension, key=key, day=day, status=status, orders=orders, units=units, revenue=revenue)
+        for (dimension, key, day, status), (orders, units, revenue) in totals.items()
+    ], batch_size=BATCH_SIZE)
+    Order.objects.update(rollup_status=F('status'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_remove_cart_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='rollup_status',
+            field=models.CharField(blank=True, editable=False, help_text='Status, z którym zamówienie jest wliczone w SalesRollup.', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('waiting', 'Oczekujące na wpłatę'), ('processing', 'W realizacji'), ('shipped', 'Wysłane'), ('delivered', 'Dostarczone'), ('cancelled', 'Anulowane')], max_length=20)),
+                ('dimension', models.CharField(max_length=10)),
+                ('key', models.BigIntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'day'], name='sales_rollup_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key', 'day', 'status'), name='unique_sales_rollup'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,16 @@
 import uuid
+from decimal import Decimal
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Prefetch, Q, Sum
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# Formaty wariantów zdjęć w kolejności preferencji przeglądarki (store/images.py).
+IMAGE_FORMATS = (
+    ('avif', 'image/avif'),
+    ('webp', 'image/webp'),
+    ('jpeg', 'image/jpeg'),
+)
 
 GENDER = (
     ('K', 'Kobieta'),
@@ -69,6 +79,16 @@ class Brand(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_relations(self):
+        return self.select_related('brand', 'category', 'owner')
+
+    def with_reviews(self):
+        return self.prefetch_related(
+            Prefetch('reviews', queryset=Review.objects.select_related('user').order_by('-created_at'))
+        )
+
+
 class Product(models.Model):
     """Model reprezentujący koszulkę w sklepie."""
     name = models.CharField(max_length=50)
@@ -79,21 +99,33 @@ class Product(models.Model):
     fabric = models.CharField(max_length=1, choices=FABRIC_TYPES, default='C')
     colors = models.CharField(max_length=1, choices=COLORS, default='B')
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Ścieżki miniatur: {format: {szerokość: plik}}.")
     brand = models.ForeignKey(Brand, null=True, blank=True, on_delete=models.SET_NULL)
     category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL)
     stock_count = models.PositiveIntegerField(default=1, help_text="Ilość sztuk w magazynie.")
+    reserved_count = models.PositiveIntegerField(default=0, editable=False, help_text="Sztuki zarezerwowane w otwartych koszykach.")
     sale = models.BooleanField(default=False, help_text="Czy produkt jest na wyprzedaży?")
     price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Cena w PLN")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(User, related_name='products', on_delete=models.CASCADE)    
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(default=0, editable=False, help_text="Średnia ocena, 0 gdy brak opinii.")
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if not self.sku:
-            safe_size = str(self.size).replace("-", "")
-            base_code = f"{self.gender}-{self.fabric}-{self.colors}-{self.size}"
             random_suffix = str(uuid.uuid4())[:8].upper()
-            self.sku = f"{base_code}-{random_suffix}"
+            self.sku = self.sku_with_suffix(random_suffix)
         if self.price < 0:
             raise ValueError("Nie moze być ujemna")
         if self.sku:
@@ -101,46 +133,260 @@ class Product(models.Model):
 
         super().save(*args, **kwargs)
 
+    def sku_with_suffix(self, suffix):
+        base_code = f"{self.gender}-{self.fabric}-{self.colors}-{self.size}"
+        return f"{base_code}-{suffix}"
+
     def __str__(self):
         return f"[{self.sku}] {self.name} ({self.get_size_display()})"
+
+    @property
+    def available_count(self):
+        """Sztuki, które można jeszcze dodać do koszyka."""
+        return max(self.stock_count - self.reserved_count, 0)
+
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}') for rating in range(1, 6)}
+
+    def image_variant_urls(self):
+        """{format: [(szerokość, url), ...]} od najmniejszej szerokości."""
+        storage = self.image.storage
+        return {
+            fmt: sorted((int(width), storage.url(name)) for width, name in self.image_variants[fmt].items())
+            for fmt, _ in IMAGE_FORMATS if fmt in (self.image_variants or {})
+        }
+
+    def image_srcsets(self):
+        """Pary (typ MIME, srcset) dla elementów <source> w <picture>."""
+        content_types = dict(IMAGE_FORMATS)
+        return [
+            (content_types[fmt], ', '.join(f'{url} {width}w' for width, url in urls))
+            for fmt, urls in self.image_variant_urls().items()
+        ]
+
+    def thumbnail_url(self):
+        urls = self.image_variant_urls().get('jpeg')
+        if urls:
+            return urls[0][1]
+        return self.image.url if self.image else None
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            # Filtr + pełna kolejność kursora (created_at, id) - strona bez sortowania wyników
+            # (store/query_plans.py sprawdza plany tych zapytań).
+            models.Index(fields=['category', '-created_at', '-id'], name='product_category_keyset_idx'),
+            models.Index(fields=['brand', '-created_at', '-id'], name='product_brand_keyset_idx'),
+            models.Index(fields=['sale', '-created_at', '-id'], name='product_sale_keyset_idx'),
+            models.Index(fields=['gender', 'size', '-created_at', '-id'], name='product_gender_size_keyset_idx'),
+            models.Index(fields=['size', '-created_at', '-id'], name='product_size_keyset_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['-rating_average', '-review_count', '-id'], name='product_rating_id_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
+
+
+class FacetCount(models.Model):
+    """Liczba produktów dla jednej wartości atrybutu - aktualizowana przy każdym zapisie produktu."""
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=20, blank=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_facet_value'),
+        ]
 
 class Cart(models.Model):
-    class Status(models.TextChoices):
-        WAITING = 'waiting', 'Oczekujące na wpłatę'
-        PROCESSING = 'processing', 'W realizacji'
-        SHIPPED = 'shipped', 'Wysłane'
-        DELIVERED = 'delivered', 'Dostarczone'
-        CANCELLED = 'cancelled', 'Anulowane'
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='carts')
     created_at = models.DateTimeField(auto_now_add=True)
     is_ordered = models.BooleanField(default=False, verbose_name="Czy kupione?")
     ordered_at = models.DateTimeField(null=True, blank=True)
-    status = models.CharField(max_length=20,choices=Status.choices,default=Status.WAITING)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Suma koszyka aktualizowana przy każdej zmianie pozycji.")
+    item_count = models.PositiveIntegerField(default=0, help_text="Liczba sztuk w koszyku.")
 
     def __str__(self):
         if self.is_ordered:
-            return f"Zamówienie {self.id} ({self.get_status_display()}) - {self.user.username}"
+            return f"Zamówiony koszyk {self.id} - {self.user.username}"
         return f"Koszyk {self.user.username}"
     
+    def calculate_totals(self):
+        """Liczy sumę i liczbę sztuk bezpośrednio w bazie (jedno zapytanie agregujące)."""
+        line_total = ExpressionWrapper(F('unit_price') * F('quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        totals = self.cart_items.aggregate(total=Sum(line_total), count=Sum('quantity'))
+        return totals['total'] or Decimal('0.00'), totals['count'] or 0
+
     def get_total_cart_price(self):
-        total = 0
-        for item in self.cart_items.all():
-            total += item.get_total_price()
-        return total
-    
+        return self.calculate_totals()[0]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=Q(is_ordered=False), name='unique_open_cart_per_user'),
+        ]
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name='cart_items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Cena produktu w chwili dodania do koszyka.")
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
     
     def get_total_price(self):
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+class Order(models.Model):
+    """
+    Złożone zamówienie - niezmienny zapis tworzony przez checkout_cart.
+
+    Suma, liczba sztuk i pozycje (OrderLine) z cenami, nazwą i SKU produktu są
+    zamrożone w chwili zakupu, więc historia i raporty czytają tylko tę tabelę
+    i nie zależą od późniejszych zmian produktów. Zmienia się wyłącznie status.
+    """
+    class Status(models.TextChoices):
+        WAITING = 'waiting', 'Oczekujące na wpłatę'
+        PROCESSING = 'processing', 'W realizacji'
+        SHIPPED = 'shipped', 'Wysłane'
+        DELIVERED = 'delivered', 'Dostarczone'
+        CANCELLED = 'cancelled', 'Anulowane'
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    cart = models.OneToOneField(Cart, null=True, blank=True, on_delete=models.SET_NULL, related_name='order', editable=False)
+    ordered_at = models.DateTimeField(editable=False)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.WAITING)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    item_count = models.PositiveIntegerField(editable=False)
+    rollup_status = models.CharField(max_length=20, blank=True, editable=False, help_text="Status, z którym zamówienie jest wliczone w SalesRollup.")
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Zapis istniejącego zamówienia zmienia tylko status; rollup_status ustawia rollups.py.
+            kwargs['update_fields'] = ['status']
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Zamówienie {self.id} ({self.get_status_display()})"
+
+    class Meta:
+        indexes = [
+            # Historia zamówień użytkownika, od najnowszych (kursor po ordered_at, id).
+            models.Index(fields=['user', '-ordered_at', '-id'], name='order_user_ordered_id_idx'),
+            models.Index(fields=['-ordered_at', '-id'], name='order_ordered_id_idx'),
+        ]
+
+class OrderLine(models.Model):
+    """Pozycja zamówienia z migawką produktu; produkt, marka i kategoria mogą już nie istnieć."""
+    order = models.ForeignKey(Order, related_name='lines', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, null=True, related_name='order_lines', on_delete=models.SET_NULL)
+    brand = models.ForeignKey(Brand, null=True, related_name='+', on_delete=models.SET_NULL)
+    category = models.ForeignKey(Category, null=True, related_name='+', on_delete=models.SET_NULL)
+    product_name = models.CharField(max_length=50)
+    sku = models.CharField(max_length=30, blank=True)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Pozycje złożonego zamówienia nie mogą być zmieniane.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+    @classmethod
+    def snapshot(cls, order, item):
+        """Pozycja zamówienia z pozycji koszyka (item.product musi być załadowany)."""
+        product = item.product
+        return cls(
+            order=order, product=product, brand_id=product.brand_id, category_id=product.category_id,
+            product_name=product.name, sku=product.sku, quantity=item.quantity,
+            unit_price=item.unit_price, line_total=item.unit_price * item.quantity,
+        )
+
+class SalesRollup(models.Model):
+    """
+    Dzienne sumy sprzedaży (rollups.py) dla dnia i statusu zamówienia: łącznie
+    (dimension='total', key=0) albo dla produktu, marki lub kategorii (key to ich id, 0 - brak).
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    dimension = models.CharField(max_length=10)
+    key = models.BigIntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}:{self.key} ({self.status}): {self.units} szt., {self.revenue} zł"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key', 'day', 'status'], name='unique_sales_rollup'),
+        ]
+        indexes = [
+            # Raporty za okres: wszystkie klucze wymiaru z zakresu dni.
+            models.Index(fields=['dimension', 'day'], name='sales_rollup_day_idx'),
+        ]
+
+class StockHold(models.Model):
+    """Czasowa rezerwacja sztuk produktu przez otwarty koszyk (reservations.py)."""
+    cart = models.ForeignKey(Cart, related_name='holds', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='holds', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} do {self.expires_at:%H:%M}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product_hold'),
+        ]
+
+class Job(models.Model):
+    """Zadanie w tle zapisane w bazie (jobs.py)."""
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Oczekuje'
+        RUNNING = 'running', 'W trakcie'
+        DONE = 'done', 'Wykonane'
+        FAILED = 'failed', 'Nieudane'
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['locked_by'], name='job_locked_by_idx'),
+        ]
+
 class Review(models.Model):
     product = models.ForeignKey(Product, related_name='reviews', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -149,4 +395,10 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.product.name} ({self.rating}/5)"
\ No newline at end of file
+        return f"{self.user.username} - {self.product.name} ({self.rating}/5)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='review_user_created_id_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,181 @@
+import base64
+from functools import partial
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from .conditional import known_list_count
+from .filters import custom_ordering
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KEYSET_ORDERING = ('-created_at', '-id')
+
+
+def estimate_count(queryset):
+    """
+    Przybliżona liczba wierszy bez pełnego COUNT(*).
+
+    PostgreSQL podaje szacunek planera z EXPLAIN. SQLite nie ma statystyk wierszy,
+    więc dla niefiltrowanej tabeli bierzemy MAX(id) (odczyt z końca indeksu PK),
+    a dla zawężonego zbioru wracamy do dokładnego COUNT.
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+    if not queryset.query.where:
+        return queryset.model.objects.aggregate(last=Max('id'))['last'] or 0
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class KnownCountPaginator(Paginator):
+    """Paginator z liczbą wyników policzoną wcześniej w tym samym żądaniu."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+class ProductPagination(PageNumberPagination):
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get('count') == 'estimated':
+            self.django_paginator_class = EstimatedCountPaginator
+        elif known_list_count(request) is not None:
+            self.django_paginator_class = partial(KnownCountPaginator, count=known_list_count(request))
+        return super().paginate_queryset(queryset, request, view)
+
+
+def cursor_requested(params):
+    """?cursor=... albo ?pagination=cursor - poza wyszukiwaniem i sortowaniem, które zostają przy numerach stron."""
+    return ('cursor' in params or params.get('pagination') == 'cursor') and not custom_ordering(params)
+
+
+def encode_cursor(obj, reverse=False, field='created_at'):
+    raw = f"{'p' if reverse else 'n'}|{getattr(obj, field).isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    """Zwraca (kierunek_wstecz, wartość pola, id) albo None dla niepoprawnego kursora."""
+    try:
+        direction, created_at, pk = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None or direction not in ('n', 'p'):
+            return None
+        return direction == 'p', created_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """Strona wyników stronicowanych po (pole daty, id) - bez OFFSET i bez COUNT."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, cursor, page_size, field='created_at'):
+    """
+    Zwraca stronę po kursorze: WHERE (created_at, id) < (c, i) ORDER BY created_at DESC, id DESC LIMIT n.
+
+    Koszt nie zależy od numeru strony - indeks (created_at, id) pozwala zacząć
+    od miejsca wskazanego przez kursor zamiast przewijać OFFSET wierszy. `field`
+    zmienia pole daty (np. ordered_at dla zamówień).
+    """
+    position = decode_cursor(cursor) if cursor else None
+    backwards = bool(position and position[0])
+    if position:
+        _, value, pk = position
+        # Warunek pole <= c wyznacza zakres w indeksie; samo OR zmusza bazę do skanowania.
+        if backwards:
+            queryset = queryset.filter(Q(**{f'{field}__gte': value}), Q(**{f'{field}__gt': value}) | Q(id__gt=pk))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__lte': value}), Q(**{f'{field}__lt': value}) | Q(id__lt=pk))
+    ordering = (field, 'id') if backwards else (f'-{field}', '-id')
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows, None, None)
+
+    if backwards:
+        next_cursor = encode_cursor(rows[-1], field=field)
+        previous_cursor = encode_cursor(rows[0], reverse=True, field=field) if has_more else None
+    else:
+        next_cursor = encode_cursor(rows[-1], field=field) if has_more else None
+        previous_cursor = encode_cursor(rows[0], reverse=True, field=field) if position else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class ProductKeysetPagination(BasePagination):
+    """Stronicowanie kursorem dla API: ?cursor=...; ?count=estimated dokłada przybliżoną liczbę wyników."""
+    cursor_query_param = 'cursor'
+    cursor_field = 'created_at'
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.queryset = queryset
+        self.page = keyset_page(
+            queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request), self.cursor_field,
+        )
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(remove_query_param(url, 'page'), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        }
+        if self.request.query_params.get('count') == 'estimated':
+            payload = {'count': estimate_count(self.queryset), **payload}
+        return Response(payload)
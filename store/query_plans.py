@@ -0,0 +1,100 @@
+"""
+Audyt planów zapytań: kluczowe zapytania sklepu przepuszczane przez EXPLAIN.
+
+Każde zapytanie z KEY_QUERIES powinno czytać tabelę przez indeks. Pełny skan tabeli
+(SQLite: "SCAN tabela" bez indeksu, PostgreSQL: "Seq Scan") jest błędem; zapytania
+oznaczone index_order muszą też dostać kolejność z indeksu, bez sortowania wyników
+(SQLite: "USE TEMP B-TREE FOR ORDER BY", PostgreSQL: węzeł Sort). Komenda
+check_query_plans uruchamia audyt w CI.
+
+Na PostgreSQL planista na małej bazie wybiera Seq Scan nawet przy dobrym indeksie,
+więc audyt wyłącza skanowanie sekwencyjne (enable_seqscan = off) - Seq Scan w planie
+oznacza wtedy, że pasującego indeksu nie ma.
+"""
+import json
+import re
+from datetime import timedelta
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from .filters import filter_products, sort_products
+from .history import user_orders, user_reviews
+from .models import Cart, CartItem, Job, OrderLine, Product, StockHold
+from .pagination import KEYSET_ORDERING
+from .reviews import product_reviews
+from .rollups import sales_rows, top_product_rows
+
+PAGE = 7
+
+
+def catalogue(query=''):
+    params = QueryDict(query)
+    return sort_products(filter_products(Product.objects.all(), params), params)
+
+
+# (nazwa, funkcja zwracająca queryset, czy kolejność musi pochodzić z indeksu)
+KEY_QUERIES = [
+    ('lista produktów', lambda: catalogue().order_by(*KEYSET_ORDERING)[:PAGE], True),
+    ('lista: kategoria', lambda: catalogue('category=1').order_by(*KEYSET_ORDERING)[:PAGE], True),
+    ('lista: marka', lambda: catalogue('brand=1').order_by(*KEYSET_ORDERING)[:PAGE], True),
+    ('lista: wyprzedaż', lambda: catalogue('sale=1').order_by(*KEYSET_ORDERING)[:PAGE], True),
+    ('lista: płeć i rozmiar', lambda: catalogue('gender=K&size=M').order_by(*KEYSET_ORDERING)[:PAGE], True),
+    ('lista: rozmiar', lambda: catalogue('size=M').order_by(*KEYSET_ORDERING)[:PAGE], True),
+    ('lista: przedział cen', lambda: catalogue('min_price=100&max_price=200')[:PAGE], False),
+    ('lista: według oceny', lambda: catalogue('sort=rating')[:PAGE], True),
+    ('produkt po SKU', lambda: Product.objects.filter(sku='M-C-B-M-00000000'), False),
+    ('opinie produktu', lambda: product_reviews(1).order_by('-created_at', '-id')[:11], True),
+    ('opinie użytkownika', lambda: user_reviews(1).order_by('-created_at', '-id')[:PAGE], True),
+    ('otwarty koszyk', lambda: Cart.objects.filter(user_id=1, is_ordered=False), False),
+    ('historia zamówień', lambda: user_orders(1).order_by('-ordered_at', '-id')[:PAGE], True),
+    ('pozycje zamówienia', lambda: OrderLine.objects.filter(order_id=1).order_by('id'), True),
+    ('pozycje koszyka', lambda: CartItem.objects.filter(cart_id=1).order_by('product_id'), False),
+    ('rezerwacje do zwolnienia', lambda: StockHold.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')[:1000], True),
+    ('sprzedaż według kategorii', lambda: sales_rows(timezone.localdate() - timedelta(days=29), timezone.localdate(), 'category'), False),
+    ('najlepiej sprzedające się', lambda: top_product_rows(timezone.localdate() - timedelta(days=6), timezone.localdate()), False),
+    ('zadania do wykonania', lambda: Job.objects.filter(status=Job.Status.PENDING, run_at__lte=timezone.now()).order_by('run_at', 'id')[:8], False),
+]
+
+
+def plan_lines(queryset):
+    """Plan zapytania jako lista linii (SQLite) albo nazw węzłów z tabelą i indeksem (PostgreSQL)."""
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        lines = []
+
+        def walk(node):
+            lines.append(' '.join(filter(None, [node['Node Type'], node.get('Relation Name'), node.get('Index Name')])))
+            for child in node.get('Plans', []):
+                walk(child)
+        walk(plan)
+        return lines
+    # Django poprzedza każdy krok planu SQLite numerami (id, rodzic, nieużywane).
+    return [re.sub(r'^(\d+\s+){3}', '', line.strip()) for line in queryset.explain().splitlines()]
+
+
+def plan_problems(lines, index_order):
+    problems = []
+    for line in lines:
+        words = line.split()
+        if connection.vendor == 'postgresql':
+            if line.startswith('Seq Scan'):
+                problems.append(f"pełny skan: {line}")
+            elif index_order and line.startswith(('Sort', 'Incremental Sort')):
+                problems.append(f"sortowanie bez indeksu: {line}")
+            continue
+        if words[:1] == ['SCAN'] and 'INDEX' not in words:
+            problems.append(f"pełny skan: {line}")
+        elif index_order and 'TEMP B-TREE' in line and 'ORDER BY' in line:
+            problems.append(f"sortowanie bez indeksu: {line}")
+    return problems
+
+
+def audit():
+    """Zwraca listę (nazwa, plan, problemy) dla każdego kluczowego zapytania."""
+    results = []
+    for name, build, index_order in KEY_QUERIES:
+        lines = plan_lines(build())
+        results.append((name, lines, plan_problems(lines, index_order)))
+    return results
@@ -0,0 +1,79 @@
+"""
+Zdenormalizowane oceny produktu.
+
+Product przechowuje liczbę opinii, sumę ocen, średnią i histogram 1-5. Każda zmiana
+opinii to jeden UPDATE produktu z wyrażeniami F(), więc lista produktów i sortowanie
+po ocenie nie potrzebują agregacji po tabeli opinii.
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from .models import Product, Review
+
+RATINGS = range(1, 6)
+
+
+def apply_rating_deltas(product_id, ratings_delta):
+    """
+    ratings_delta: Counter {ocena: zmiana liczby opinii z tą oceną}.
+
+    UPDATE wykonywany jest także przy zerowych różnicach (edycja samej treści opinii),
+    bo odświeża updated_at, z którego liczone są ETag-i strony produktu.
+    """
+    count_delta = sum(ratings_delta.values())
+    sum_delta = sum(rating * delta for rating, delta in ratings_delta.items())
+    new_count = F('review_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    fields = {
+        f'rating_{rating}': F(f'rating_{rating}') + delta
+        for rating, delta in ratings_delta.items() if delta
+    }
+    Product.objects.filter(pk=product_id).update(
+        review_count=new_count,
+        rating_sum=new_sum,
+        # W jednym UPDATE wszystkie F() widzą stare wartości, więc średnią liczymy z nowych sum jawnie.
+        rating_average=Case(
+            When(Q(review_count__gt=-count_delta), then=Cast(new_sum, FloatField()) / Cast(new_count, FloatField())),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        updated_at=timezone.now(),
+        **fields,
+    )
+
+
+def record_review_change(old, new):
+    """old/new to pary (product_id, rating) albo None - przy dodaniu, edycji i usunięciu opinii."""
+    changes = {}
+    if old:
+        changes.setdefault(old[0], Counter())[old[1]] -= 1
+    if new:
+        changes.setdefault(new[0], Counter())[new[1]] += 1
+    for product_id, ratings_delta in changes.items():
+        apply_rating_deltas(product_id, ratings_delta)
+
+
+def rebuild_ratings(product_model=Product, review_model=Review, batch_size=1000):
+    """Przelicza oceny wszystkich produktów z tabeli opinii. Zwraca liczbę produktów z opiniami."""
+    histogram = {f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in RATINGS}
+    rows = review_model.objects.order_by().values('product_id').annotate(n=Count('id'), total=Sum('rating'), **histogram)
+    with transaction.atomic():
+        zeros = {'review_count': 0, 'rating_sum': 0, 'rating_average': 0, **{f'rating_{r}': 0 for r in RATINGS}}
+        product_model.objects.update(**zeros)
+        batch = []
+        updated = 0
+        fields = list(zeros)
+        for row in rows.iterator(chunk_size=batch_size):
+            product = product_model(pk=row['product_id'], review_count=row['n'], rating_sum=row['total'])
+            product.rating_average = row['total'] / row['n']
+            for rating in RATINGS:
+                setattr(product, f'rating_{rating}', row[f'rating_{rating}'])
+            batch.append(product)
+            if len(batch) >= batch_size:
+                product_model.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        product_model.objects.bulk_update(batch, fields)
+    return updated + len(batch)
@@ -0,0 +1,123 @@
+"""
+Czasowe rezerwacje stanu magazynowego dla otwartych koszyków.
+
+Dodanie do koszyka blokuje sztuki na STOCK_HOLD_MINUTES: Product.reserved_count
+rośnie warunkowym UPDATE ... WHERE stock_count - reserved_count >= n, więc dwa
+równoległe koszyki nie zarezerwują tej samej sztuki, a dostępne jest zawsze
+stock_count - reserved_count. Każda rezerwacja ma wiersz StockHold (koszyk, produkt),
+z którego zamówienie zamienia ją w sprzedaż (services.checkout_cart), a
+sweep_expired_holds zwalnia przeterminowane partiami.
+
+Rezerwacje nie zmieniają updated_at produktu - strony katalogu w cache i ETag-i
+pozostają ważne przy każdym kliknięciu "Dodaj do koszyka".
+"""
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Product, StockHold
+
+DEFAULT_SWEEP_BATCH = 1000
+
+
+class OutOfStock(Exception):
+    """Brak wolnych (niezarezerwowanych) sztuk produktu."""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        super().__init__(f"Brak {quantity} wolnych sztuk produktu {product.name}")
+
+
+def hold_ttl():
+    return timedelta(minutes=settings.STOCK_HOLD_MINUTES)
+
+
+def release_reserved(product_id, quantity):
+    # Greatest chroni przed ujemnym licznikiem, gdyby rozjechał się z wierszami StockHold.
+    Product.objects.filter(pk=product_id).update(reserved_count=Greatest(F('reserved_count') - quantity, Value(0)))
+
+
+def hold_stock(cart, product, quantity=1):
+    """
+    Rezerwuje `quantity` sztuk produktu dla koszyka i przedłuża jego rezerwację.
+
+    Zgłasza OutOfStock, gdy wolnych sztuk jest za mało - wtedy nic nie jest zmieniane.
+    """
+    expires_at = timezone.now() + hold_ttl()
+    with transaction.atomic():
+        reserved = Product.objects.filter(
+            pk=product.pk, stock_count__gte=F('reserved_count') + quantity,
+        ).update(reserved_count=F('reserved_count') + quantity)
+        if not reserved:
+            raise OutOfStock(product, quantity)
+        hold = StockHold.objects.filter(cart=cart, product=product)
+        if not hold.update(quantity=F('quantity') + quantity, expires_at=expires_at):
+            try:
+                with transaction.atomic():
+                    StockHold.objects.create(cart=cart, product=product, quantity=quantity, expires_at=expires_at)
+            except IntegrityError:
+                # Równoległe żądanie tego samego koszyka utworzyło rezerwację pierwsze.
+                hold.update(quantity=F('quantity') + quantity, expires_at=expires_at)
+
+
+def release_stock(cart, product_id, quantity=None):
+    """Zwalnia `quantity` sztuk (domyślnie całą rezerwację) produktu w koszyku. Zwraca liczbę zwolnionych sztuk."""
+    with transaction.atomic():
+        hold = StockHold.objects.select_for_update().filter(cart=cart, product_id=product_id).first()
+        if hold is None:
+            return 0
+        released = hold.quantity if quantity is None else min(quantity, hold.quantity)
+        if released == hold.quantity:
+            hold.delete()
+        else:
+            StockHold.objects.filter(pk=hold.pk).update(quantity=F('quantity') - released)
+        release_reserved(product_id, released)
+    return released
+
+
+def sweep_expired_holds(now=None, batch_size=DEFAULT_SWEEP_BATCH):
+    """
+    Usuwa przeterminowane rezerwacje i oddaje ich sztuki do sprzedaży. Zwraca liczbę usuniętych rezerwacji.
+
+    Każda partia to osobna transakcja: SELECT ... FOR UPDATE SKIP LOCKED (rezerwacje
+    zamawianego właśnie koszyka są pomijane), jeden DELETE i jeden UPDATE
+    reserved_count = reserved_count - CASE id WHEN ... END.
+    """
+    now = now or timezone.now()
+    swept = 0
+    while True:
+        with transaction.atomic():
+            expired = list(
+                StockHold.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now).order_by('expires_at')
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not expired:
+                return swept
+            StockHold.objects.filter(pk__in=[hold_id for hold_id, _, _ in expired]).delete()
+            totals = Counter()
+            for _, product_id, quantity in expired:
+                totals[product_id] += quantity
+            released = Case(
+                *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in totals.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            Product.objects.filter(pk__in=totals).update(reserved_count=Greatest(F('reserved_count') - released, Value(0)))
+        swept += len(expired)
+        if len(expired) < batch_size:
+            return swept
+
+
+def reconcile_reserved_counts():
+    """Przelicza reserved_count z wierszy StockHold (np. po usunięciu koszyków kaskadą). Zwraca liczbę poprawek."""
+    held = Subquery(
+        StockHold.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        .annotate(total=Sum('quantity')).values('total')[:1]
+    )
+    drifted = Product.objects.annotate(actual=Coalesce(held, 0)).exclude(reserved_count=F('actual'))
+    return Product.objects.filter(pk__in=drifted.values('pk')).update(reserved_count=Coalesce(held, 0))
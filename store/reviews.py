@@ -0,0 +1,48 @@
+"""
+Stronicowany kanał opinii produktu.
+
+Opinie czytane są kursorem po indeksie (product, -created_at, -id), więc koszt strony
+nie zależy od liczby opinii. Pierwsza strona - ta, którą dostaje każdy odwiedzający
+stronę produktu - trzymana jest w cache i usuwana z niego przy każdej zmianie opinii.
+"""
+from django.core.cache import cache
+from .models import Review
+from .pagination import ProductKeysetPagination, keyset_page
+
+REVIEW_PAGE_SIZE = 10
+FIRST_PAGE_TIMEOUT = 600
+
+
+def first_page_key(product_id):
+    return f'store:reviews:first:{product_id}'
+
+
+def product_reviews(product_id):
+    return Review.objects.filter(product_id=product_id).select_related('user')
+
+
+def review_page(product_id, cursor=None, page_size=REVIEW_PAGE_SIZE):
+    """Strona opinii produktu; pierwsza strona o domyślnym rozmiarze pochodzi z cache."""
+    if cursor or page_size != REVIEW_PAGE_SIZE:
+        return keyset_page(product_reviews(product_id), cursor, page_size)
+    key = first_page_key(product_id)
+    page = cache.get(key)
+    if page is None:
+        page = keyset_page(product_reviews(product_id), None, page_size)
+        cache.set(key, page, FIRST_PAGE_TIMEOUT)
+    return page
+
+
+def invalidate_first_page(*product_ids):
+    cache.delete_many([first_page_key(product_id) for product_id in product_ids])
+
+
+class ReviewKeysetPagination(ProductKeysetPagination):
+    page_size = REVIEW_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.queryset = queryset
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.page = review_page(view.kwargs['pk'], cursor, self.get_page_size(request))
+        return list(self.page)
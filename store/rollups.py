@@ -0,0 +1,185 @@
+"""
+Dzienne sumy sprzedaży do raportów.
+
+SalesRollup przechowuje dla każdego dnia i statusu zamówienia liczbę zamówień, sztuk
+i przychód - łącznie (wymiar 'total') oraz osobno dla każdego produktu, marki
+i kategorii ze snapshotu pozycji zamówienia. Raport za okres czyta tylko wiersze
+z tych dni, więc jego koszt zależy od liczby dni i sprzedanych produktów, a nie od
+liczby zamówień.
+
+Sumy aktualizuje przyrostowo zadanie 'sales.rollup' (tasks.py), zlecane przez
+checkout_cart i przy zmianie statusu zamówienia. Order.rollup_status pamięta status,
+z którym zamówienie jest wliczone: ponowne wykonanie zadania niczego nie dolicza,
+a zmiana statusu przenosi zamówienie między wierszami. rebuild_sales_rollups przelicza
+wszystko od zera, czytając zamówienia partiami (komenda rebuild_sales_rollups).
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import Brand, Category, Order, OrderLine, Product, SalesRollup
+
+# Wymiar -> pole pozycji zamówienia z kluczem.
+DIMENSIONS = {
+    'total': None,
+    'product': 'product_id',
+    'brand': 'brand_id',
+    'category': 'category_id',
+}
+ORDER_FIELDS = ('id', 'ordered_at', 'status', 'rollup_status', 'total_price', 'item_count')
+LINE_FIELDS = ('order_id', 'product_id', 'brand_id', 'category_id', 'quantity', 'line_total')
+REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+# Raporty domyślnie pomijają anulowane zamówienia.
+REPORT_STATUSES = [status for status in Order.Status.values if status != Order.Status.CANCELLED]
+
+
+def new_totals():
+    return defaultdict(lambda: [0, 0, Decimal('0.00')])
+
+
+def add_order(totals, order, lines, status, sign=1):
+    """Dolicza (sign=1) albo odejmuje (sign=-1) zamówienie w totals {(wymiar, klucz, dzień, status): [zamówienia, sztuki, przychód]}."""
+    day = timezone.localdate(order.ordered_at)
+    row = totals['total', 0, day, status]
+    row[0] += sign
+    row[1] += sign * order.item_count
+    row[2] += sign * order.total_price
+    for dimension, field in DIMENSIONS.items():
+        if field is None:
+            continue
+        counted = set()
+        for line in lines:
+            key = getattr(line, field) or 0
+            row = totals[dimension, key, day, status]
+            if key not in counted:
+                # Zamówienie liczy się raz dla klucza, nawet z kilkoma pozycjami tej samej marki.
+                counted.add(key)
+                row[0] += sign
+            row[1] += sign * line.quantity
+            row[2] += sign * line.line_total
+
+
+def apply_totals(totals):
+    """Zmienia wiersze SalesRollup o podane różnice (UPDATE z F(), brakujący wiersz - INSERT)."""
+    for (dimension, key, day, status), (orders, units, revenue) in totals.items():
+        if not (orders or units or revenue):
+            continue
+        rows = SalesRollup.objects.filter(dimension=dimension, key=key, day=day, status=status)
+        changes = {'orders': F('orders') + orders, 'units': F('units') + units, 'revenue': F('revenue') + revenue}
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                SalesRollup.objects.create(
+                    dimension=dimension, key=key, day=day, status=status, orders=orders, units=units, revenue=revenue,
+                )
+        except IntegrityError:
+            rows.update(**changes)
+
+
+def sync_order_rollup(order_id):
+    """Uzgadnia sumy z bieżącym statusem zamówienia. Zwraca True, jeśli coś zmieniono."""
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(pk=order_id).only(*ORDER_FIELDS).first()
+        if order is None or order.rollup_status == order.status:
+            return False
+        lines = list(order.lines.only(*LINE_FIELDS))
+        totals = new_totals()
+        if order.rollup_status:
+            add_order(totals, order, lines, order.rollup_status, sign=-1)
+        add_order(totals, order, lines, order.status)
+        apply_totals(totals)
+        Order.objects.filter(pk=order.pk).update(rollup_status=order.status)
+    return True
+
+
+def rebuild_sales_rollups(batch_size=1000):
+    """
+    Przelicza wszystkie sumy od zera, czytając zamówienia partiami po `batch_size`.
+    Zablokowane zamówienia czekają na koniec przeliczenia. Zwraca liczbę wierszy.
+    """
+    with transaction.atomic():
+        SalesRollup.objects.all().delete()
+        totals = new_totals()
+        orders = Order.objects.select_for_update().only(*ORDER_FIELDS).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(orders.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            lines = defaultdict(list)
+            for line in OrderLine.objects.filter(order_id__in=[order.pk for order in batch]).only(*LINE_FIELDS):
+                lines[line.order_id].append(line)
+            for order in batch:
+                add_order(totals, order, lines[order.pk], order.status)
+        SalesRollup.objects.bulk_create([
+            SalesRollup(dimension=dimension, key=key, day=day, status=status, orders=orders, units=units, revenue=revenue)
+            for (dimension, key, day, status), (orders, units, revenue) in totals.items()
+        ], batch_size=batch_size)
+        Order.objects.update(rollup_status=F('status'))
+    return len(totals)
+
+
+def rollup_rows(start, end, dimension, statuses=None):
+    return SalesRollup.objects.filter(
+        dimension=dimension, day__gte=start, day__lte=end, status__in=statuses or REPORT_STATUSES,
+    ).order_by()
+
+
+def key_labels(dimension, keys):
+    """Nazwy kluczy wymiaru: {klucz: nazwa}; klucz 0 i usunięte obiekty nie mają nazwy."""
+    if dimension == 'brand':
+        return dict(Brand.objects.filter(pk__in=keys).values_list('id', 'name'))
+    if dimension == 'category':
+        return dict(Category.objects.filter(pk__in=keys).values_list('id', 'name'))
+    if dimension == 'product':
+        return dict(Product.objects.filter(pk__in=keys).values_list('id', 'name'))
+    return {}
+
+
+def rollup_sums(rows, *fields):
+    return rows.values(*fields).annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+
+
+def sales_rows(start, end, dimension='total', statuses=None, keys=None):
+    rows = rollup_rows(start, end, dimension, statuses)
+    if keys:
+        rows = rows.filter(key__in=keys)
+    return rollup_sums(rows, 'day', 'key').order_by('day', 'key')
+
+
+def top_product_rows(start, end, statuses=None, order_by='units', limit=10):
+    rows = rollup_rows(start, end, 'product', statuses).exclude(key=0)
+    return rollup_sums(rows, 'key').order_by(f'-{order_by}', 'key')[:limit]
+
+
+def sales_report(start, end, dimension='total', statuses=None, keys=None):
+    """Sprzedaż dzień po dniu w zakresie [start, end] dla każdego klucza wymiaru."""
+    rows = list(sales_rows(start, end, dimension, statuses, keys))
+    labels = key_labels(dimension, {row['key'] for row in rows})
+    for row in rows:
+        row['label'] = labels.get(row['key'], '-') if dimension != 'total' else None
+    return rows
+
+
+def top_products(start, end, statuses=None, order_by='units', limit=10):
+    """Najlepiej sprzedające się produkty w zakresie dni, z bieżącym stanem magazynowym."""
+    rows = list(top_product_rows(start, end, statuses, order_by, limit))
+    products = Product.objects.only('name', 'sku', 'stock_count', 'reserved_count').in_bulk([row['key'] for row in rows])
+    result = []
+    for row in rows:
+        product = products.get(row['key'])
+        result.append({
+            'product': row['key'],
+            'name': product.name if product else None,
+            'sku': product.sku if product else None,
+            'stock_count': product.stock_count if product else None,
+            'available': product.stock_count - product.reserved_count if product else None,
+            'orders': row['orders'],
+            'units': row['units'],
+            'revenue': row['revenue'],
+        })
+    return result
@@ -0,0 +1,218 @@
+"""
+Wyszukiwanie pełnotekstowe produktów.
+
+Każdy backend trzyma osobny indeks (wirtualna tabela FTS5 w SQLite, tabela z kolumną
+tsvector i indeksem GIN w PostgreSQL) i udostępnia ten sam interfejs: index(), remove(),
+search() oraz rebuild(). Tekst indeksowany i zapytania przechodzą przez fold(), więc
+"łódź", "Lodz" i "ŁÓDŹ" trafiają w ten sam token bez rozszerzeń po stronie bazy.
+"""
+import re
+import unicodedata
+from django.db import connection as default_connection
+from django.db.models.expressions import RawSQL
+
+POLISH_LETTERS = str.maketrans({'ł': 'l', 'Ł': 'l'})
+
+# Najczęstsze końcówki fleksyjne; odcinamy je tylko w zapytaniu, a dopasowanie
+# prefiksowe ("koszulk*") łapie pozostałe formy słowa w indeksie.
+POLISH_SUFFIXES = (
+    'owie', 'ami', 'ach', 'owi', 'ego', 'emu', 'ymi', 'imi', 'ich', 'ow',
+    'om', 'em', 'ie', 'ej', 'ym', 'ka', 'ki', 'ke', 'ce', 'a', 'e', 'i', 'o', 'u', 'y',
+)
+MIN_STEM_LENGTH = 4
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Małe litery, bez polskich znaków diakrytycznych."""
+    text = (text or '').translate(POLISH_LETTERS).lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(token):
+    for suffix in POLISH_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def query_terms(query):
+    return [stem(token) for token in TOKEN_RE.findall(fold(query))]
+
+
+def product_document(product):
+    """Pola indeksu w kolejności: nazwa, opis, marka, kategoria."""
+    brand = product.brand.name if product.brand_id else ''
+    category = product.category.name if product.category_id else ''
+    return fold(product.name), fold(product.description), fold(brand), fold(category)
+
+
+class SearchBackend:
+    def __init__(self, connection=None):
+        self.connection = connection or default_connection
+
+    def create_index(self):
+        pass
+
+    def drop_index(self):
+        pass
+
+    def clear(self):
+        pass
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def rebuild(self, products, batch_size=1000):
+        """Odtwarza cały indeks z podanego querysetu produktów, partiami."""
+        self.create_index()
+        self.clear()
+        batch = []
+        count = 0
+        for product in products.select_related('brand', 'category').iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                self.index(batch)
+                count += len(batch)
+                batch = []
+        self.index(batch)
+        return count + len(batch)
+
+
+class IcontainsSearchBackend(SearchBackend):
+    """Zapasowy backend dla baz bez wyszukiwania pełnotekstowego."""
+
+    def search(self, queryset, query):
+        for term in TOKEN_RE.findall(query):
+            queryset = queryset.filter(name__icontains=term) | queryset.filter(description__icontains=term)
+        return queryset
+
+
+class SQLiteSearchBackend(SearchBackend):
+    table = 'store_product_fts'
+    # Wagi bm25 dla kolumn name, description, brand, category (zapisane w konfiguracji tabeli jako rank).
+    weights = '10.0, 1.0, 4.0, 4.0'
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(name, description, brand, category, tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}, rank) VALUES ('rank', %s)", [f"bm25({self.weights})"])
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def index(self, products):
+        rows = [(product.pk, *product_document(product)) for product in products]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, description, brand, category) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = queryset.model._meta.db_table
+        # Złączenie z tabelą FTS zamiast podzapytania z bm25() dla każdego wiersza:
+        # MATCH wybiera kandydatów z indeksu, a ukryta kolumna rank liczy trafność raz.
+        return queryset.extra(
+            tables=[self.table],
+            where=[f"{self.table}.rowid = {table}.id", f"{self.table} MATCH %s"],
+            params=[match],
+            select={'search_rank': f"{self.table}.rank"},
+            order_by=['search_rank', '-created_at'],
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    table = 'store_product_search'
+    document_sql = (
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'B')"
+    )
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"product_id bigint PRIMARY KEY REFERENCES store_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin ON {self.table} USING GIN (document)")
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def index(self, products):
+        rows = [(product.pk, *product_document(product)) for product in products]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (product_id, document) VALUES (%s, {self.document_sql}) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE product_id = ANY(%s)", [list(product_ids)])
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        table = queryset.model._meta.db_table
+        matching_ids = RawSQL(
+            f"SELECT product_id FROM {self.table} WHERE document @@ to_tsquery('simple', %s)", [tsquery]
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {self.table} WHERE product_id = {table}.id",
+            [tsquery],
+        )
+        return queryset.filter(pk__in=matching_ids).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    connection = connection or default_connection
+    return BACKENDS.get(connection.vendor, IcontainsSearchBackend)(connection)
+
+
+def search_products(queryset, query):
+    return get_backend().search(queryset, query)
@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from .models import Product, Brand, Category, Review, SIZES, FABRIC_TYPES, GENDER, COLORS
+from .models import Product, Brand, Category, Review, Order, OrderLine, SIZES, FABRIC_TYPES, GENDER, COLORS
 from django.contrib.auth.models import User
+from datetime import timedelta
+from django.utils import timezone
+from .rollups import DIMENSIONS, MAX_REPORT_DAYS, REPORT_DAYS
 
 def validate_letters(value):
     clean_value = value.replace(" ", "")
@@ -28,11 +31,23 @@ class ProductSerializer(serializers.Serializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), allow_null=True)
     owner = serializers.ReadOnlyField(source='owner.username')
     image = serializers.ImageField(required=False, allow_null=True)
+    image_width = serializers.IntegerField(read_only=True)
+    image_height = serializers.IntegerField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
     reviews = ReviewSerializer(many=True, read_only=True)
     colors = serializers.ChoiceField(choices=COLORS, default='B')
     description = serializers.CharField(required=False, allow_null=True)
 
 
+    def get_image_variants(self, product):
+        """Miniatury po formatach: {"webp": [{"width": 120, "url": ...}, ...], ...}."""
+        request = self.context.get('request')
+        absolute = request.build_absolute_uri if request else str
+        return {
+            fmt: [{'width': width, 'url': absolute(url)} for width, url in urls]
+            for fmt, urls in product.image_variant_urls().items()
+        }
+
     def create(self, validated_data):
         return Product.objects.create(**validated_data)
     
@@ -47,6 +62,32 @@ class ProductSerializer(serializers.Serializer):
 
         instance.save()
         return instance
+
+class ProductListSerializer(ProductSerializer):
+    """Lekka reprezentacja do list: zamiast pełnych opinii tylko ich liczba i średnia ocena."""
+    reviews = None
+    review_count = serializers.IntegerField(read_only=True)
+    average_rating = serializers.SerializerMethodField()
+
+    def get_average_rating(self, product):
+        # Produkt bez opinii nie ma średniej - null, tak jak na stronie produktu.
+        return product.rating_average if product.review_count else None
+
+class ProductImportSerializer(ProductSerializer):
+    """Wiersz importu katalogu: marka i kategoria po nazwie, bez zdjęć i opinii."""
+    sku = serializers.CharField(required=False, allow_blank=True, max_length=30)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    brand = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    category = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    sale = serializers.BooleanField(required=False, default=False)
+    owner = None
+    image = None
+    image_width = None
+    image_height = None
+    image_variants = None
+    reviews = None
+
 class BrandSerializer(serializers.ModelSerializer):
     class Meta:
         model = Brand
@@ -75,4 +116,119 @@ class CategorySerializer(serializers.ModelSerializer):
     name = serializers.CharField(validators=[validate_letters])
     class Meta:
         model = Category
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class CartLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=100, default=1)
+
+
+class CartBulkAddSerializer(serializers.Serializer):
+    items = CartLineSerializer(many=True, allow_empty=False, max_length=200)
+
+
+class ProductChangeSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=30)
+    stock_count = serializers.IntegerField(min_value=0, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    sale = serializers.BooleanField(required=False)
+
+    def validate_sku(self, value):
+        return value.strip().upper()
+
+    def validate(self, data):
+        if len(data) == 1:
+            raise serializers.ValidationError("Podaj co najmniej jedno z pól: stock_count, price, sale.")
+        return data
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    items = ProductChangeSerializer(many=True, allow_empty=False, max_length=5000)
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=30)
+    delta = serializers.IntegerField()
+
+    def validate_sku(self, value):
+        return value.strip().upper()
+
+
+class StockAdjustSerializer(serializers.Serializer):
+    items = StockAdjustmentSerializer(many=True, allow_empty=False, max_length=5000)
+
+
+class UserReviewSerializer(serializers.ModelSerializer):
+    product_name = serializers.ReadOnlyField(source='product.name')
+
+    class Meta:
+        model = Review
+        fields = ['id', 'product', 'product_name', 'rating', 'content', 'created_at']
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    status_display = serializers.ReadOnlyField(source='get_status_display')
+
+    class Meta:
+        model = Order
+        fields = ['id', 'ordered_at', 'status', 'status_display', 'total_price', 'item_count']
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ['product', 'product_name', 'sku', 'quantity', 'unit_price', 'line_total']
+
+
+class OrderSerializer(OrderSummarySerializer):
+    items = OrderItemSerializer(source='lines', many=True, read_only=True)
+
+    class Meta(OrderSummarySerializer.Meta):
+        fields = OrderSummarySerializer.Meta.fields + ['items']
+
+
+class SalesReportParamsSerializer(serializers.Serializer):
+    """Zakres raportu: domyślnie REPORT_DAYS dni do dziś, najwyżej MAX_REPORT_DAYS."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.MultipleChoiceField(choices=Order.Status.choices, required=False)
+
+    def validate(self, data):
+        data['end'] = data.get('end') or timezone.localdate()
+        data['start'] = data.get('start') or data['end'] - timedelta(days=REPORT_DAYS - 1)
+        if data['start'] > data['end']:
+            raise serializers.ValidationError("Data początkowa jest późniejsza niż końcowa.")
+        if (data['end'] - data['start']).days >= MAX_REPORT_DAYS:
+            raise serializers.ValidationError(f"Raport obejmuje najwyżej {MAX_REPORT_DAYS} dni.")
+        data['status'] = sorted(data.get('status') or [])
+        return data
+
+
+class SalesSeriesParamsSerializer(SalesReportParamsSerializer):
+    dimension = serializers.ChoiceField(choices=list(DIMENSIONS), default='total')
+    key = serializers.ListField(child=serializers.IntegerField(min_value=0), required=False, max_length=100)
+
+
+class TopProductsParamsSerializer(SalesReportParamsSerializer):
+    order_by = serializers.ChoiceField(choices=['units', 'revenue'], default='units')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class SalesRowSerializer(serializers.Serializer):
+    day = serializers.DateField()
+    key = serializers.IntegerField()
+    label = serializers.CharField(allow_null=True)
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class TopProductSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    name = serializers.CharField(allow_null=True)
+    sku = serializers.CharField(allow_null=True)
+    stock_count = serializers.IntegerField(allow_null=True)
+    available = serializers.IntegerField(allow_null=True)
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
@@ -0,0 +1,331 @@
+from collections import Counter
+from decimal import Decimal
+from functools import partial
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    BooleanField, Case, DecimalField, ExpressionWrapper, F, IntegerField, PositiveIntegerField, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .caching import bump_products
+from .facets import FACET_FIELDS, apply_deltas, facet_values
+from .jobs import enqueue_many, make_job
+from .models import Cart, CartItem, Order, OrderLine, Product, StockHold
+from .reservations import release_reserved, release_stock
+
+# Pola zmieniane hurtowo i typy wyrażeń CASE dla każdego z nich.
+BULK_UPDATE_FIELDS = {
+    'stock_count': PositiveIntegerField(),
+    'price': DecimalField(max_digits=10, decimal_places=2),
+    'sale': BooleanField(),
+}
+
+
+class CheckoutError(Exception):
+    """Zamówienie nie może zostać zrealizowane - lista pozycji bez pokrycia w magazynie."""
+
+    def __init__(self, failed_items):
+        self.failed_items = failed_items
+        names = ", ".join(item.product.name for item in failed_items)
+        super().__init__(f"Brak wystarczającej ilości produktów: {names}")
+
+
+def checkout_cart(cart):
+    """
+    Realizuje zamówienie w jednej transakcji.
+
+    Stan magazynowy zmniejszany jest warunkowym UPDATE ... WHERE stock_count >= quantity,
+    więc dwa równoległe zamówienia nie mogą sprzedać tej samej sztuki. Jeśli którakolwiek
+    pozycja nie ma pokrycia, cała transakcja jest wycofywana, a CheckoutError zawiera
+    wszystkie brakujące pozycje.
+
+    Rezerwacje koszyka (reservations.py) zamieniane są w sprzedaż tym samym UPDATE-em:
+    zarezerwowane sztuki schodzą jednocześnie ze stock_count i reserved_count, a
+    rezerwacje innych koszyków nie mogą zostać sprzedane.
+
+    Zamówienie zapisywane jest jako niezmienny Order z pozycjami OrderLine (ceny,
+    nazwy i SKU z chwili zakupu) - zwracany jest ten obiekt.
+
+    Potwierdzenie e-mail i alerty o niskim stanie nie są wysyłane w żądaniu - zamówienie
+    zapisuje je jako zadania w kolejce (jobs.py), które wykonuje worker run_jobs.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Zajęcie koszyka jest pierwszym zapisem w transakcji: blokuje podwójne złożenie
+        # tego samego zamówienia, a w SQLite od razu przejmuje blokadę zapisu.
+        claimed = Cart.objects.filter(pk=cart.pk, is_ordered=False).update(is_ordered=True, ordered_at=now)
+        if not claimed:
+            raise Cart.DoesNotExist("Koszyk został już zamówiony.")
+        # Blokada rezerwacji koszyka: sweep_expired_holds pomija je (SKIP LOCKED) do końca transakcji.
+        holds = dict(StockHold.objects.select_for_update().filter(cart=cart).values_list('product_id', 'quantity'))
+        had_holds = bool(holds)
+        items = list(cart.cart_items.select_related('product').order_by('product_id'))
+        failed_items = []
+        for item in items:
+            held = holds.pop(item.product_id, 0)
+            updated = Product.objects.filter(
+                pk=item.product_id, stock_count__gte=F('reserved_count') - held + item.quantity
+            ).update(
+                stock_count=F('stock_count') - item.quantity,
+                reserved_count=Greatest(F('reserved_count') - held, Value(0)),
+                updated_at=now,
+            )
+            if not updated:
+                failed_items.append(item)
+        if failed_items:
+            raise CheckoutError(failed_items)
+        order = Order.objects.create(
+            user_id=cart.user_id, cart=cart, ordered_at=now,
+            total_price=sum((item.get_total_price() for item in items), Decimal('0.00')),
+            item_count=sum(item.quantity for item in items),
+        )
+        OrderLine.objects.bulk_create([OrderLine.snapshot(order, item) for item in items])
+        enqueue_order_jobs(order, items)
+        # UPDATE stanu omija sygnały zapisu produktu - strony katalogu unieważniamy sami.
+        invalidate_on_commit([item.product_id for item in items], {item.product.category_id for item in items})
+        if had_holds:
+            for product_id, held in holds.items():
+                # Rezerwacja bez pozycji w koszyku - tylko oddajemy sztuki.
+                release_reserved(product_id, held)
+            StockHold.objects.filter(cart=cart).delete()
+        Cart.objects.create(user_id=cart.user_id, is_ordered=False)
+
+    cart.is_ordered = True
+    cart.ordered_at = now
+    return order
+
+
+def enqueue_order_jobs(order, items):
+    """Zleca dalszą obsługę zamówienia workerowi - w transakcji zamówienia, jednym INSERT-em."""
+    jobs = [
+        make_job('orders.confirmation', {'order_id': order.pk}, key=f'order-confirmation:{order.pk}'),
+        make_job('sales.rollup', {'order_id': order.pk}, key=f'sales-rollup:{order.pk}'),
+    ]
+    low_stock = [
+        item.product_id for item in items
+        if item.product.stock_count - item.quantity <= settings.LOW_STOCK_THRESHOLD
+    ]
+    if low_stock:
+        jobs.append(make_job('products.low_stock', {'product_ids': low_stock}, key=f'low-stock:{order.pk}'))
+    enqueue_many(jobs)
+
+
+def get_open_cart(user):
+    """Zwraca otwarty koszyk użytkownika. Unikalny indeks gwarantuje, że istnieje co najwyżej jeden."""
+    cart, created = Cart.objects.get_or_create(user=user, is_ordered=False)
+    return cart
+
+
+def _increment_cart_totals(cart, total_delta, count_delta):
+    Cart.objects.filter(pk=cart.pk).update(
+        total_price=F('total_price') + total_delta,
+        item_count=F('item_count') + count_delta,
+    )
+
+
+def add_to_cart(cart, product, quantity=1):
+    """
+    Dodaje produkt do koszyka atomowym UPDATE quantity = quantity + n.
+
+    Jeśli pozycji jeszcze nie ma, jest tworzona; gdy równoległe żądanie utworzy ją
+    pierwsze, unikalny indeks (cart, product) zgłasza IntegrityError i ponawiamy
+    inkrementację zamiast tworzyć duplikat.
+    """
+    with transaction.atomic():
+        line = CartItem.objects.filter(cart=cart, product=product)
+        if not line.update(quantity=F('quantity') + quantity):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=cart, product=product, quantity=quantity, unit_price=product.price)
+            except IntegrityError:
+                line.update(quantity=F('quantity') + quantity)
+        unit_price = Subquery(line.values('unit_price')[:1])
+        _increment_cart_totals(cart, unit_price * quantity, quantity)
+
+
+def add_many_to_cart(cart, lines):
+    """
+    Dodaje wiele produktów naraz: lines to lista par (product, quantity).
+
+    Istniejące pozycje zwiększane są jednym UPDATE ... CASE, nowe tworzone jednym
+    bulk_create, a sumy koszyka aktualizowane jednym zapytaniem.
+    """
+    quantities = {}
+    products = {}
+    for product, quantity in lines:
+        quantities[product.pk] = quantities.get(product.pk, 0) + quantity
+        products[product.pk] = product
+    if not quantities:
+        return
+
+    with transaction.atomic():
+        existing = dict(
+            CartItem.objects.filter(cart=cart, product_id__in=quantities).values_list('product_id', 'unit_price')
+        )
+        if existing:
+            CartItem.objects.filter(cart=cart, product_id__in=existing).update(
+                quantity=F('quantity') + Case(
+                    *[When(product_id=product_id, then=Value(quantities[product_id])) for product_id in existing],
+                    output_field=PositiveIntegerField(),
+                )
+            )
+        new_items = [
+            CartItem(cart=cart, product_id=product_id, quantity=quantity, unit_price=products[product_id].price)
+            for product_id, quantity in quantities.items() if product_id not in existing
+        ]
+        try:
+            with transaction.atomic():
+                CartItem.objects.bulk_create(new_items)
+        except IntegrityError:
+            # Ktoś równolegle dodał część z tych produktów - wracamy do ścieżki pojedynczej.
+            for item in new_items:
+                add_to_cart(cart, products[item.product_id], item.quantity)
+            new_items = []
+
+        total_delta = sum(existing[product_id] * quantities[product_id] for product_id in existing)
+        total_delta += sum(item.unit_price * item.quantity for item in new_items)
+        count_delta = sum(quantities[product_id] for product_id in existing)
+        count_delta += sum(item.quantity for item in new_items)
+        _increment_cart_totals(cart, total_delta, count_delta)
+
+
+def remove_from_cart(cart, cart_item):
+    """Usuwa pozycję z koszyka, odejmuje jej aktualną wartość od zapisanych sum i zwalnia rezerwację."""
+    with transaction.atomic():
+        cart_item = CartItem.objects.select_for_update().filter(pk=cart_item.pk, cart=cart).first()
+        if cart_item is None:
+            return
+        cart_item.delete()
+        _increment_cart_totals(cart, -cart_item.get_total_price(), -cart_item.quantity)
+        release_stock(cart, cart_item.product_id)
+
+
+def reconcile_cart_totals(carts, batch_size=1000):
+    """Porównuje zapisane sumy z agregatem z bazy i poprawia rozbieżne koszyki. Zwraca liczbę poprawek."""
+    line_total = ExpressionWrapper(
+        F('cart_items__unit_price') * F('cart_items__quantity'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    drifted = carts.annotate(
+        actual_total=Coalesce(Sum(line_total), Value(Decimal('0.00')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        actual_count=Coalesce(Sum('cart_items__quantity'), 0),
+    ).exclude(total_price=F('actual_total'), item_count=F('actual_count'))
+    fixed = 0
+    batch = []
+    for cart in drifted.iterator(chunk_size=batch_size):
+        cart.total_price = cart.actual_total
+        cart.item_count = cart.actual_count
+        batch.append(cart)
+        if len(batch) >= batch_size:
+            Cart.objects.bulk_update(batch, ['total_price', 'item_count'])
+            fixed += len(batch)
+            batch = []
+    Cart.objects.bulk_update(batch, ['total_price', 'item_count'])
+    return fixed + len(batch)
+
+
+def _lock_products_by_sku(skus, fields):
+    rows = Product.objects.select_for_update().filter(sku__in=skus).values('id', 'sku', 'owner_id', *fields)
+    return {row['sku']: row for row in rows}
+
+
+def invalidate_on_commit(product_ids, category_ids):
+    """
+    Podbija wersje cache produktów po zatwierdzeniu transakcji - podbicie przed COMMIT
+    pozwoliłoby równoległemu żądaniu zapisać w cache jeszcze stary stan.
+    """
+    transaction.on_commit(partial(bump_products, list(product_ids), set(category_ids)))
+
+
+def _after_bulk_change(rows):
+    invalidate_on_commit([row['id'] for row in rows], {row['category_id'] for row in rows})
+
+
+def bulk_update_products(user, changes):
+    """
+    Zmienia stan, cenę i wyprzedaż wielu produktów naraz: changes to lista
+    {sku, [stock_count], [price], [sale]}.
+
+    Każde pole zapisywane jest jednym UPDATE ... SET pole = CASE id WHEN ... END
+    w jednej transakcji. Wiersze cudzych lub nieistniejących produktów są pomijane;
+    wynik zawiera status każdego wiersza w kolejności wejścia.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = _lock_products_by_sku({change['sku'] for change in changes}, FACET_FIELDS.values())
+        results = []
+        accepted = {}
+        for change in changes:
+            row = rows.get(change['sku'])
+            if row is None:
+                results.append({'sku': change['sku'], 'updated': False, 'error': "Produkt nie istnieje"})
+            elif row['owner_id'] != user.pk:
+                results.append({'sku': change['sku'], 'updated': False, 'error': "Brak uprawnień do produktu"})
+            else:
+                # Kilka zmian tego samego SKU w jednym żądaniu składa się w kolejności.
+                accepted.setdefault(change['sku'], {}).update(change)
+                results.append({'sku': change['sku'], 'updated': True})
+        if not accepted:
+            return results
+
+        updates = {}
+        for field, output_field in BULK_UPDATE_FIELDS.items():
+            whens = [
+                When(pk=rows[sku]['id'], then=Value(change[field]))
+                for sku, change in accepted.items() if field in change
+            ]
+            if whens:
+                updates[field] = Case(*whens, default=F(field), output_field=output_field)
+        changed = [rows[sku] for sku in accepted]
+        Product.objects.filter(pk__in=[row['id'] for row in changed]).update(updated_at=now, **updates)
+
+        deltas = Counter()
+        for sku, change in accepted.items():
+            deltas.subtract(facet_values(rows[sku]))
+            deltas.update(facet_values({**rows[sku], **change}))
+        apply_deltas(deltas)
+        _after_bulk_change(changed)
+    return results
+
+
+def adjust_stock(user, adjustments):
+    """
+    Zmienia stany magazynowe o podane różnice: adjustments to lista {sku, delta}.
+
+    Różnice dla tego samego SKU są sumowane; produkt, którego stan spadłby poniżej
+    zera, jest pomijany w całości. Wszystkie zmiany to jeden UPDATE
+    stock_count = stock_count + CASE id WHEN ... END.
+    """
+    totals = Counter()
+    for adjustment in adjustments:
+        totals[adjustment['sku']] += adjustment['delta']
+    now = timezone.now()
+    with transaction.atomic():
+        rows = _lock_products_by_sku(set(totals), ['stock_count', 'category_id'])
+        results = {}
+        accepted = {}
+        for sku, delta in totals.items():
+            row = rows.get(sku)
+            if row is None:
+                results[sku] = {'sku': sku, 'updated': False, 'error': "Produkt nie istnieje"}
+            elif row['owner_id'] != user.pk:
+                results[sku] = {'sku': sku, 'updated': False, 'error': "Brak uprawnień do produktu"}
+            elif row['stock_count'] + delta < 0:
+                results[sku] = {'sku': sku, 'updated': False, 'error': "Stan magazynowy nie może być ujemny",
+                                'stock_count': row['stock_count']}
+            else:
+                accepted[sku] = delta
+                results[sku] = {'sku': sku, 'updated': True, 'stock_count': row['stock_count'] + delta}
+        changed = [rows[sku] for sku in accepted]
+        if accepted:
+            Product.objects.filter(pk__in=[row['id'] for row in changed]).update(
+                stock_count=F('stock_count') + Case(
+                    *[When(pk=rows[sku]['id'], then=Value(delta)) for sku, delta in accepted.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                updated_at=now,
+            )
+            _after_bulk_change(changed)
+    return list(results.values())
@@ -0,0 +1,187 @@
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .caching import CATALOG, TAXONOMY, bump, bump_products, category_scope
+from .facets import apply_deltas, product_facet_values, record_change, stored_facet_values
+from .images import delete_variants, schedule_image_processing
+from .instrumentation import instrument_connection
+from .jobs import enqueue
+from .models import Brand, Category, FacetCount, Order, Product, Review
+from .ratings import record_review_change
+from .reviews import invalidate_first_page
+from .search import get_backend
+
+REINDEX_BATCH_SIZE = 1000
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Ustawia SQLITE_PRAGMAS na każdym nowym połączeniu SQLite (WAL, busy_timeout, mmap)."""
+    if connection.vendor != 'sqlite':
+        return
+    # Surowe połączenie - PRAGMA nie trafiają do licznika zapytań.
+    for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    instrument_connection(connection)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def reindex_related_products(sender, instance, created, raw=False, **kwargs):
+    """Zmiana nazwy marki lub kategorii zmienia dokument każdego powiązanego produktu."""
+    if created or raw:
+        return
+    field = 'brand' if sender is Brand else 'category'
+    products = Product.objects.filter(**{field: instance}).select_related('brand', 'category')
+    backend = get_backend()
+    batch = []
+    for product in products.iterator(chunk_size=REINDEX_BATCH_SIZE):
+        batch.append(product)
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            backend.index(batch)
+            batch = []
+    backend.index(batch)
+
+
+@receiver(pre_save, sender=Product)
+def remember_facet_values(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._old_facet_values = stored_facet_values(instance.pk) if instance.pk else []
+
+
+@receiver(post_save, sender=Product)
+def update_facet_counts(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_change(getattr(instance, '_old_facet_values', []), product_facet_values(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_facet_counts(sender, instance, **kwargs):
+    record_change(product_facet_values(instance), [])
+
+
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+def move_facet_counts_to_empty(sender, instance, **kwargs):
+    """Usunięcie marki/kategorii ustawia NULL w produktach (SET_NULL) z pominięciem sygnałów produktu."""
+    facet = 'brand' if sender is Brand else 'category'
+    stored = FacetCount.objects.filter(facet=facet, value=str(instance.pk)).first()
+    if stored and stored.count:
+        apply_deltas(Counter({(facet, str(instance.pk)): -stored.count, (facet, ''): stored.count}))
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._old_rating = Review.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_product_rating(sender, instance, raw=False, **kwargs):
+    if not raw:
+        old = getattr(instance, '_old_rating', None)
+        record_review_change(old, (instance.product_id, instance.rating))
+        invalidate_first_page(instance.product_id, *([old[0]] if old else []))
+
+
+def deleted_with_product(kwargs):
+    """Opinia usuwana kaskadowo razem z produktem - ocena i strony produktu znikają z nim."""
+    return isinstance(kwargs.get('origin'), Product)
+
+
+@receiver(post_delete, sender=Review)
+def remove_product_rating(sender, instance, **kwargs):
+    if not deleted_with_product(kwargs):
+        record_review_change((instance.product_id, instance.rating), None)
+    invalidate_first_page(instance.product_id)
+
+
+@receiver(post_save, sender=Order)
+def schedule_sales_rollup(sender, instance, created, raw=False, **kwargs):
+    """Zmiana statusu przenosi zamówienie w sumach sprzedaży; nowe zamówienia zleca checkout_cart."""
+    if not created and not raw:
+        enqueue('sales.rollup', {'order_id': instance.pk})
+
+
+def _categories(facet_values):
+    return [value for facet, value in facet_values if facet == 'category']
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        old_categories = _categories(getattr(instance, '_old_facet_values', []))
+        bump_products([instance.pk], [instance.category_id, *old_categories])
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_pages(sender, instance, **kwargs):
+    bump_products([instance.pk], [instance.category_id])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_pages(sender, instance, raw=False, **kwargs):
+    """Opinia zmienia ocenę produktu widoczną na liście i stronie produktu."""
+    if raw or deleted_with_product(kwargs):
+        return
+    old = getattr(instance, '_old_rating', None)
+    product_ids = {instance.product_id, *([old[0]] if old else [])}
+    category_ids = Product.objects.filter(pk__in=product_ids).values_list('category_id', flat=True)
+    bump_products(product_ids, category_ids)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_taxonomy_pages(sender, instance, **kwargs):
+    scopes = [CATALOG, TAXONOMY]
+    if sender is Category:
+        scopes.append(category_scope(instance.pk))
+    bump(*scopes)
+
+
+@receiver(pre_save, sender=Product)
+def remember_new_image(sender, instance, raw=False, **kwargs):
+    """Nowo wgrany plik nie jest jeszcze zapisany (_committed) - stare warianty idą do usunięcia."""
+    if raw:
+        return
+    image = instance.image
+    instance._image_changed = bool(image) and not image._committed
+    if (instance._image_changed or not image) and instance.image_variants:
+        old_variants = instance.image_variants
+        transaction.on_commit(lambda: delete_variants(old_variants))
+        instance.image_variants = {}
+        instance.image_width = instance.image_height = None
+
+
+@receiver(post_save, sender=Product)
+def process_new_image(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_image_changed', False):
+        schedule_image_processing(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def delete_image_variants(sender, instance, **kwargs):
+    if instance.image_variants:
+        variants = instance.image_variants
+        transaction.on_commit(lambda: delete_variants(variants))
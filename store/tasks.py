@@ -0,0 +1,51 @@
+"""
+Zadania wykonywane w tle przez worker kolejki (jobs.py, komenda run_jobs).
+
+Zadanie może zostać wykonane więcej niż raz (ponowienie po błędzie albo po
+przerwaniu workera), więc każde czyta aktualny stan z bazy zamiast polegać na payloadzie.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.core.mail import send_mail
+from .jobs import job
+from .models import Order, Product
+from .rollups import sync_order_rollup
+
+
+@job('orders.confirmation')
+def send_order_confirmation(order_id=None, cart_id=None):
+    # Zadania zlecone przed wprowadzeniem Order wskazują zamówiony koszyk.
+    orders = Order.objects.filter(pk=order_id) if order_id is not None else Order.objects.filter(cart_id=cart_id)
+    order = orders.select_related('user').first()
+    if order is None or not order.user.email:
+        return
+    lines = [f"{line.quantity} x {line.product_name} - {line.line_total} zł" for line in order.lines.order_by('id')]
+    send_mail(
+        f"Potwierdzenie zamówienia nr {order.pk}",
+        "Dziękujemy za zamówienie!\n\n" + "\n".join(lines) + f"\n\nRazem: {order.total_price} zł",
+        None, [order.user.email],
+    )
+
+
+@job('products.low_stock')
+def notify_low_stock(product_ids):
+    """Powiadamia właścicieli produktów, których stan spadł do LOW_STOCK_THRESHOLD lub niżej."""
+    products = Product.objects.filter(
+        pk__in=product_ids, stock_count__lte=settings.LOW_STOCK_THRESHOLD,
+    ).select_related('owner').order_by('name')
+    by_owner = defaultdict(list)
+    for product in products:
+        if product.owner.email:
+            by_owner[product.owner.email].append(product)
+    for email, owned in by_owner.items():
+        send_mail(
+            "Kończący się stan magazynowy",
+            "\n".join(f"{product.sku} {product.name}: {product.stock_count} szt." for product in owned),
+            None, [email],
+        )
+
+
+@job('sales.rollup')
+def update_sales_rollup(order_id):
+    """Wlicza zamówienie w dzienne sumy sprzedaży albo przenosi je do nowego statusu."""
+    sync_order_rollup(order_id)
@@ -2,12 +2,50 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth.models import User
-from django.test import TestCase
-from .models import Product, Brand, Category, Review, Cart, CartItem
+import asyncio
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction, IntegrityError, OperationalError
+from django.test import TestCase, TransactionTestCase
+from .models import Product, Brand, Category, Review, Cart, CartItem, FacetCount, Order, OrderLine, SalesRollup, StockHold, Job
 from django.core.files.uploadedfile import SimpleUploadedFile
+from .caching import cache_stats
+from .facets import rebuild_facet_counts
+from .importer import import_products
+from .instrumentation import QueryBudgetExceeded, RequestMetrics, metric_names, reset_metrics
+from .jobs import HANDLERS, enqueue, run_pending_jobs
+from .loadtest import SCENARIOS, build_report, compare_reports, dataset_size, run_scenario
+from .ratings import rebuild_ratings
+from .rollups import rebuild_sales_rollups, sync_order_rollup
+from .bench import retry_locked, run_flash_sale, seed_orders, seed_products, seed_reviews, seed_users
+from .reservations import OutOfStock, hold_stock, sweep_expired_holds
+from .search import search_products
+from .urls import QUERY_BUDGETS
+from .services import checkout_cart, get_open_cart, add_to_cart, remove_from_cart, CheckoutError
+from decimal import Decimal
+from io import BytesIO, StringIO
+import os
+from django.core.management import CommandError, call_command
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core import mail
+from unittest import mock
+from django.utils import timezone
+from datetime import timedelta
+from django.test import override_settings
+from django.conf import settings
+from PIL import Image
+import shutil
+import tempfile
 
 class ProductAPITests(APITestCase):
     def setUp(self):
+        # Przesłane zdjęcia trafiają do katalogu tymczasowego, nie do media/ projektu.
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=0)
+        self.settings_override.enable()
         self.user = User.objects.create_user(username='tester', password='testpassword')
         self.brand = Brand.objects.create(name="TestBrand", country="PL")
         self.category = Category.objects.create(name="TestCategory")
@@ -23,6 +61,10 @@ class ProductAPITests(APITestCase):
         )
         self.url = reverse('product-list')
 
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
     def test_product_model_str(self):
         """Sprawdza czy stringowa reprezentacja produktu jest poprawna"""
         product = Product.objects.get(id=self.product.id)
@@ -112,3 +154,1339 @@ class CartModelTest(TestCase):
         CartItem.objects.create(cart=self.cart, product=self.p1, quantity=2)
         CartItem.objects.create(cart=self.cart, product=self.p2, quantity=1)
         self.assertEqual(self.cart.get_total_cart_price(), 250.00)
+
+    def test_cart_totals_follow_add_and_remove(self):
+        """Sprawdza czy zapisane sumy koszyka zmieniają się przy dodawaniu i usuwaniu"""
+        add_to_cart(self.cart, self.p1)
+        add_to_cart(self.cart, self.p1)
+        add_to_cart(self.cart, self.p2)
+        item = CartItem.objects.get(cart=self.cart, product=self.p2)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_price, Decimal('250.00'))
+        self.assertEqual(self.cart.item_count, 3)
+        remove_from_cart(self.cart, item)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_price, Decimal('200.00'))
+        self.assertEqual(self.cart.item_count, 2)
+
+    def test_cart_item_keeps_price_snapshot(self):
+        """Zmiana ceny produktu nie zmienia ceny pozycji już dodanej do koszyka"""
+        add_to_cart(self.cart, self.p1)
+        self.p1.price = 999
+        self.p1.save()
+        self.assertEqual(self.cart.get_total_cart_price(), Decimal('100.00'))
+
+    def test_only_one_open_cart_per_user(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(user=self.user)
+        self.assertEqual(get_open_cart(self.user), self.cart)
+
+    def test_add_to_cart_merges_lines(self):
+        add_to_cart(self.cart, self.p1, quantity=2)
+        add_to_cart(self.cart, self.p1, quantity=3)
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=self.p1).quantity, 5)
+
+    def test_bulk_add_endpoint(self):
+        """Sprawdza czy jedno żądanie API dodaje wiele produktów i raportuje błędne pozycje"""
+        add_to_cart(self.cart, self.p1)
+        Product.objects.filter(pk=self.p2.pk).update(stock_count=2)
+        self.client.force_login(self.user)
+        data = {'items': [
+            {'product': self.p1.id, 'quantity': 1},
+            {'product': self.p2.id, 'quantity': 1},
+            {'product': self.p2.id, 'quantity': 1},
+            {'product': 999999, 'quantity': 1},
+        ]}
+        response = self.client.post(reverse('cart-bulk-add'), data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line['added'] for line in response.json()['items']], [True, True, True, False])
+        self.assertEqual(response.json()['item_count'], 4)
+        self.assertEqual(Decimal(response.json()['total_price']), Decimal('300.00'))
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=self.p2).quantity, 2)
+
+    def test_reconcile_command_repairs_drift(self):
+        CartItem.objects.create(cart=self.cart, product=self.p1, quantity=2)
+        call_command('reconcile_carts', stdout=StringIO())
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_price, Decimal('200.00'))
+        self.assertEqual(self.cart.item_count, 2)
+
+    def test_cart_page_query_count_does_not_grow_with_items(self):
+        """Strona koszyka wykonuje stałą liczbę zapytań niezależnie od liczby pozycji"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('cart-detail'))
+        add_to_cart(self.cart, self.p1)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('cart-detail'))
+        for i in range(30):
+            product = Product.objects.create(name=f"Extra{i}", price=1, owner=self.user)
+            add_to_cart(self.cart, product)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('cart-detail'))
+        self.assertContains(response, "Extra29")
+        self.assertEqual(len(small), len(large))
+
+
+class CheckoutServiceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='password')
+        self.p1 = Product.objects.create(name="P1", price=100.00, stock_count=5, owner=self.user)
+        self.p2 = Product.objects.create(name="P2", price=50.00, stock_count=1, owner=self.user)
+        self.p3 = Product.objects.create(name="P3", price=20.00, stock_count=3, owner=self.user)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_checkout_decrements_stock(self):
+        """Sprawdza czy zamówienie zmniejsza stany i tworzy nowy koszyk"""
+        CartItem.objects.create(cart=self.cart, product=self.p1, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.p2, quantity=1)
+        checkout_cart(self.cart)
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.p1.stock_count, 3)
+        self.assertEqual(self.p2.stock_count, 0)
+        self.assertTrue(self.cart.is_ordered)
+        self.assertTrue(Cart.objects.filter(user=self.user, is_ordered=False).exists())
+
+    def test_checkout_snapshots_the_order(self):
+        """Zamówienie zachowuje ceny, nazwy i SKU z chwili zakupu"""
+        CartItem.objects.create(cart=self.cart, product=self.p1, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.p3, quantity=1)
+        checkout_cart(self.cart)
+        Product.objects.filter(pk=self.p1.pk).update(price=999, name="Nowa nazwa")
+        order = Order.objects.get(cart=self.cart)
+        self.assertEqual((order.total_price, order.item_count), (Decimal('220.00'), 3))
+        self.assertEqual(
+            list(order.lines.order_by('id').values_list('product_name', 'sku', 'quantity', 'unit_price', 'line_total')),
+            [("P1", self.p1.sku, 2, Decimal('100.00'), Decimal('200.00')), ("P3", self.p3.sku, 1, Decimal('20.00'), Decimal('20.00'))],
+        )
+        line = order.lines.first()
+        line.quantity = 5
+        with self.assertRaises(ValueError):
+            line.save()
+
+    def test_checkout_reports_all_failed_items_and_rolls_back(self):
+        """Sprawdza czy brakujące pozycje są zgłaszane, a stany nie zmieniają się"""
+        CartItem.objects.create(cart=self.cart, product=self.p1, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.p2, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=self.p3, quantity=4)
+        with self.assertRaises(CheckoutError) as ctx:
+            checkout_cart(self.cart)
+        failed = {item.product_id for item in ctx.exception.failed_items}
+        self.assertEqual(failed, {self.p2.id, self.p3.id})
+        self.p1.refresh_from_db()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.p1.stock_count, 5)
+        self.assertFalse(self.cart.is_ordered)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_query_count_is_bounded(self):
+        """Sprawdza czy liczba zapytań rośnie tylko o jeden UPDATE na pozycję"""
+        CartItem.objects.create(cart=self.cart, product=self.p1, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.p2, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.p3, quantity=1)
+        with self.assertNumQueries(12):
+            checkout_cart(self.cart)
+
+    def test_checkout_view_shows_errors(self):
+        CartItem.objects.create(cart=self.cart, product=self.p2, quantity=2)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('checkout'), follow=True)
+        self.assertRedirects(response, reverse('cart-detail'))
+        self.assertContains(response, "P2")
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p2.stock_count, 1)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='seller', password='password', email='seller@example.com')
+        self.buyer = User.objects.create_user(username='buyer', password='password', email='buyer@example.com')
+        self.product = Product.objects.create(name="Czapka", price=30, stock_count=5, owner=self.owner)
+        self.cart = get_open_cart(self.buyer)
+        add_to_cart(self.cart, self.product, 3)
+
+    def test_checkout_enqueues_jobs_for_the_worker(self):
+        """Zamówienie tylko zapisuje zadania - e-maile wysyła dopiero worker"""
+        checkout_cart(self.cart)
+        self.assertEqual(sorted(Job.objects.values_list('name', flat=True)), ['orders.confirmation', 'products.low_stock', 'sales.rollup'])
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('run_jobs', '--once', '--workers=1', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['buyer@example.com', 'seller@example.com'])
+        self.assertIn("Czapka: 2 szt.", [m for m in mail.outbox if m.to == ['seller@example.com']][0].body)
+
+    def test_failed_checkout_leaves_no_jobs_and_keys_deduplicate(self):
+        add_to_cart(self.cart, self.product, 10)
+        with self.assertRaises(CheckoutError):
+            checkout_cart(self.cart)
+        self.assertFalse(Job.objects.exists())
+        enqueue('orders.confirmation', {'cart_id': self.cart.pk}, key='same')
+        enqueue('orders.confirmation', {'cart_id': self.cart.pk}, key='same')
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failing_job_is_retried_with_backoff(self):
+        flaky = mock.Mock(side_effect=[RuntimeError("SMTP nie odpowiada"), None])
+        with mock.patch.dict(HANDLERS, {'test.flaky': flaky}):
+            enqueue('test.flaky', {'value': 1}, max_attempts=2)
+            with self.assertLogs('store.jobs', 'ERROR'):
+                self.assertEqual(run_pending_jobs(), 1)
+            job = Job.objects.get()
+            self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+            self.assertIn("SMTP nie odpowiada", job.last_error)
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertEqual(run_pending_jobs(), 0)
+            Job.objects.update(run_at=timezone.now())
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.DONE, 2))
+        flaky.assert_called_with(value=1)
+
+    def test_job_fails_after_max_attempts(self):
+        with mock.patch.dict(HANDLERS, {'test.broken': mock.Mock(side_effect=ValueError)}):
+            enqueue('test.broken', max_attempts=1)
+            with self.assertLogs('store.jobs', 'ERROR'):
+                run_pending_jobs()
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+
+class StockHoldTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='seller', password='password')
+        self.first = User.objects.create_user(username='first', password='password')
+        self.second = User.objects.create_user(username='second', password='password')
+        self.product = Product.objects.create(name="Hit", price=10, stock_count=3, sale=True, owner=self.owner)
+
+    def hold(self, user, quantity=1):
+        cart = get_open_cart(user)
+        hold_stock(cart, self.product, quantity)
+        add_to_cart(cart, self.product, quantity)
+        return cart
+
+    def test_holds_block_other_carts(self):
+        """Zarezerwowane sztuki nie są dostępne dla innych koszyków"""
+        self.hold(self.first, 2)
+        self.hold(self.first, 1)
+        with self.assertRaises(OutOfStock):
+            self.hold(self.second)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved_count, self.product.available_count), (3, 0))
+        self.assertEqual(StockHold.objects.get().quantity, 3)
+        self.client.force_login(self.second)
+        response = self.client.get(reverse('add-to-cart', args=[self.product.id]))
+        self.assertRedirects(response, reverse('product-list-html'), fetch_redirect_response=False)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.second).exists())
+
+    def test_remove_and_sweep_release_holds(self):
+        cart = self.hold(self.first, 2)
+        self.hold(self.second, 1)
+        remove_from_cart(cart, CartItem.objects.get(cart=cart))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_count, 1)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(sweep_expired_holds(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved_count, self.product.available_count), (0, 3))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_checkout_converts_holds_into_sale(self):
+        cart = self.hold(self.first, 2)
+        self.hold(self.second, 1)
+        checkout_cart(cart)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_count, self.product.reserved_count), (1, 1))
+        self.assertEqual(list(StockHold.objects.values_list('cart__user__username', flat=True)), ['second'])
+
+    def test_checkout_without_hold_cannot_take_reserved_stock(self):
+        self.hold(self.first, 2)
+        cart = get_open_cart(self.second)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        with self.assertRaises(CheckoutError):
+            checkout_cart(cart)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_count, self.product.reserved_count), (3, 2))
+
+
+class FlashSaleTest(TransactionTestCase):
+    buyers = 60
+    stock = 15
+
+    def test_flash_sale_never_over_reserves(self):
+        """Równoległe rezerwacje produktu z wyprzedaży sprzedają dokładnie cały stan"""
+        owner = User.objects.create_user(username='owner', password='password')
+        product = Product.objects.create(name="Flash", price=10, stock_count=self.stock, sale=True, owner=owner)
+        User.objects.bulk_create([User(username=f'flash{i}') for i in range(self.buyers)])
+
+        outcomes, timings = run_flash_sale(product, list(User.objects.filter(username__startswith='flash')), threads=8)
+
+        product.refresh_from_db()
+        self.assertEqual(outcomes, {'sold': self.stock, 'rejected': self.buyers - self.stock, 'failed': 0})
+        self.assertEqual(len(timings), self.buyers)
+        self.assertEqual((product.stock_count, product.reserved_count), (0, 0))
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart__is_ordered=False).count(), 0)
+
+    def test_retry_locked_retries_only_lock_errors(self):
+        calls = []
+
+        def fail(message):
+            calls.append(message)
+            raise OperationalError(message)
+
+        with self.assertRaises(OperationalError):
+            retry_locked(lambda: fail("no such table: store_missing"))
+        self.assertEqual(len(calls), 1)
+        with mock.patch('store.bench.time.sleep'), self.assertRaises(OperationalError):
+            retry_locked(lambda: fail("database is locked"), attempts=3)
+        self.assertEqual(len(calls), 4)
+
+
+class LoadTestScenarioTest(TestCase):
+    def test_scenarios_report_latency_and_queries(self):
+        seed_products(30)
+        seed_users(2)
+        self.assertEqual(seed_reviews(20), 20)
+        self.assertEqual(seed_orders(4), 4)
+        self.assertEqual(Order.objects.count(), 4)
+        results = {}
+        for name in SCENARIOS:
+            results.update(run_scenario(name, iterations=2, concurrency=1))
+        self.assertEqual(set(results), {'browse', 'browse-api', 'search', 'product', 'add-to-cart', 'checkout:add', 'checkout', 'profile'})
+        for label, stats in results.items():
+            self.assertEqual(stats['errors'], 0, label)
+            self.assertGreater(stats['queries_avg'], 0, label)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+        report = build_report(results, {}, dataset_size())
+        slower = json.loads(json.dumps(report))
+        slower['results']['browse']['p95_ms'] = report['results']['browse']['p95_ms'] * 2 + 1
+        slower['results']['profile']['queries_avg'] += 1
+        self.assertEqual(compare_reports(report, report), [])
+        self.assertEqual([problem.split(':')[0] for problem in compare_reports(report, slower)], ['browse', 'profile'])
+
+
+class DatabaseProfileTest(TestCase):
+    def test_sqlite_connections_are_tuned(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("PRAGMA dotyczą tylko SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+
+class QueryPlanTest(TestCase):
+    def test_key_queries_use_indexes(self):
+        """Kluczowe zapytania nie robią pełnych skanów ani sortowania poza indeksem"""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn("korzystają z indeksów", out.getvalue())
+
+
+class CheckoutConcurrencyTest(TransactionTestCase):
+    buyers = 200
+    stock = 50
+
+    def test_parallel_checkouts_never_oversell(self):
+        """Wiele równoległych zamówień tego samego SKU nie może sprzedać więcej niż stan"""
+        owner = User.objects.create_user(username='owner', password='password')
+        product = Product.objects.create(name="Hit", price=10, stock_count=self.stock, owner=owner)
+        User.objects.bulk_create([User(username=f'buyer{i}') for i in range(self.buyers)])
+        users = User.objects.filter(username__startswith='buyer')
+        Cart.objects.bulk_create([Cart(user=user) for user in users])
+        carts = list(Cart.objects.filter(user__in=users))
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1, unit_price=product.price) for cart in carts])
+
+        results = []
+
+        def buy(cart):
+            try:
+                while True:
+                    try:
+                        checkout_cart(cart)
+                        results.append(True)
+                        return
+                    except CheckoutError:
+                        results.append(False)
+                        return
+                    except OperationalError:
+                        # SQLite zgłasza blokadę zamiast czekać - ponawiamy próbę.
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(results), self.buyers)
+        self.assertEqual(results.count(True), self.stock)
+        self.assertEqual(product.stock_count, 0)
+        self.assertEqual(Cart.objects.filter(is_ordered=True).count(), self.stock)
+
+
+class CartConcurrencyTest(TransactionTestCase):
+    def test_parallel_adds_do_not_lose_increments(self):
+        """Równoległe kliknięcia "Dodaj do koszyka" nie gubią sztuk ani nie dublują pozycji"""
+        user = User.objects.create_user(username='clicker', password='password')
+        product = Product.objects.create(name="Hit", price=10, stock_count=100, owner=user)
+        cart = get_open_cart(user)
+        errors = []
+
+        def click():
+            try:
+                while True:
+                    try:
+                        add_to_cart(cart, product)
+                        return
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        # SQLite zgłasza blokadę zamiast czekać - ponawiamy po stałej przerwie.
+                        time.sleep(0.005)
+            except Exception as exc:
+                # Wyjątek w wątku nie przerywa testu - sprawdzamy je w wątku głównym.
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=click) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        cart.refresh_from_db()
+        self.assertEqual(CartItem.objects.filter(cart=cart).count(), 1)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 50)
+        self.assertEqual(cart.item_count, 50)
+        self.assertEqual(cart.total_price, Decimal('500.00'))
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='password')
+        self.brand = Brand.objects.create(name="Wólczanka", country="PL")
+        self.category = Category.objects.create(name="Koszule")
+        self.shirt = Product.objects.create(name="Koszulka lniana", description="Lekka na lato", price=80, owner=self.user)
+        self.jacket = Product.objects.create(
+            name="Kurtka", description="Ciepła, z koszulką w zestawie", price=300, owner=self.user,
+            brand=self.brand, category=self.category,
+        )
+
+    def test_search_matches_description_brand_and_ranks_name_first(self):
+        """Wyszukiwanie obejmuje opis i markę, a trafienia w nazwie są wyżej"""
+        results = list(search_products(Product.objects.all(), "koszulki"))
+        self.assertEqual(results, [self.shirt, self.jacket])
+        self.assertEqual(list(search_products(Product.objects.all(), "wolczanka")), [self.jacket])
+
+    def test_search_folds_polish_diacritics(self):
+        self.assertEqual(list(search_products(Product.objects.all(), "CIEPLA")), [self.jacket])
+        self.assertEqual(list(search_products(Product.objects.all(), "ciepłą")), [self.jacket])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.shirt.name = "Bluza"
+        self.shirt.save()
+        self.assertFalse(search_products(Product.objects.all(), "lniana").exists())
+        self.assertTrue(search_products(Product.objects.all(), "bluza").exists())
+        self.brand.name = "Vistula"
+        self.brand.save()
+        self.assertEqual(list(search_products(Product.objects.all(), "vistula")), [self.jacket])
+        self.jacket.delete()
+        self.assertFalse(search_products(Product.objects.all(), "vistula").exists())
+
+    def test_html_list_uses_search(self):
+        response = self.client.get(reverse('product-list-html'), {'q': 'zestaw'})
+        self.assertContains(response, "Kurtka")
+        self.assertNotContains(response, "Koszulka lniana")
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(search_products(Product.objects.all(), "lato")), [self.shirt])
+
+    def test_bench_command_refuses_to_seed_without_explicit_size(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_search', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+
+
+class ProductFacetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='merchant', password='password')
+        self.brand = Brand.objects.create(name="BrandF", country="PL")
+        Product.objects.create(name="A", price=40, size='M', gender='K', owner=self.user, brand=self.brand)
+        Product.objects.create(name="B", price=150, size='L', gender='K', owner=self.user, sale=True)
+        self.product = Product.objects.create(name="C", price=150, size='M', gender='M', owner=self.user)
+
+    def stored_counts(self):
+        return {(row.facet, row.value): row.count for row in FacetCount.objects.filter(count__gt=0)}
+
+    def test_incremental_counts_match_rebuild(self):
+        """Liczniki aktualizowane przy zapisie zgadzają się z pełnym przeliczeniem"""
+        self.product.size = 'L'
+        self.product.price = 600
+        self.product.save()
+        Product.objects.get(name="A").delete()
+        self.brand.delete()
+        incremental = self.stored_counts()
+        rebuild_facet_counts()
+        self.assertEqual(incremental, self.stored_counts())
+        self.assertEqual(incremental[('size', 'L')], 2)
+
+    def test_facet_endpoint_filters_and_counts(self):
+        response = self.client.get(reverse('product-facets'), {'size': 'M', 'gender': 'K'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.data['results']], ["A"])
+        sizes = {row['value']: row['count'] for row in response.data['facets']['size']}
+        self.assertEqual(sizes, {'M': 1, 'L': 1})
+        genders = {row['value']: row['count'] for row in response.data['facets']['gender']}
+        self.assertEqual(genders, {'K': 1, 'M': 1})
+
+    def test_filtered_counts_are_cached_until_catalog_changes(self):
+        url = reverse('product-facets')
+        self.client.get(url, {'size': 'M'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'size': 'M', 'page': 1})
+        self.assertNotIn('GROUP BY', ' '.join(query['sql'] for query in queries))
+        self.product.size = 'L'
+        self.product.save()
+        sizes = {row['value']: row['count'] for row in self.client.get(url, {'size': 'M'}).data['facets']['size']}
+        self.assertEqual(sizes, {'M': 1, 'L': 2})
+
+    def test_unfiltered_facets_use_stored_counts(self):
+        response = self.client.get(reverse('product-facets'))
+        prices = {row['value']: row['count'] for row in response.data['facets']['price']}
+        self.assertEqual(prices, {'0-50': 1, '100-200': 2})
+
+    def test_price_range_filter(self):
+        response = self.client.get(reverse('product-list'), {'min_price': '100', 'max_price': '200', 'sale': '1'})
+        self.assertEqual([p['name'] for p in response.data['results']], ["B"])
+
+    def test_non_finite_prices_are_ignored(self):
+        for params in ({'min_price': 'NaN'}, {'max_price': 'Infinity'}, {'min_price': '-inf', 'sale': '1'}):
+            for url in (reverse('product-list'), reverse('product-facets')):
+                self.assertEqual(self.client.get(url, params).status_code, status.HTTP_200_OK, (url, params))
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='paginator', password='password')
+        self.products = [Product.objects.create(name=f"Produkt {i}", price=10, owner=self.user) for i in range(12)]
+        # Część produktów z identycznym created_at - kursor musi rozstrzygać remisy po id.
+        Product.objects.filter(pk__in=[p.pk for p in self.products[3:7]]).update(created_at=self.products[3].created_at)
+        self.expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_api_cursor_walks_every_product_once(self):
+        url = reverse('product-list') + '?pagination=cursor&page_size=5'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_api_cursor_previous_link(self):
+        first = self.client.get(reverse('product-list'), {'pagination': 'cursor', 'page_size': 5}).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([p['id'] for p in back['results']], self.expected[:5])
+        self.assertIsNone(back['previous'])
+
+    def test_api_cursor_keeps_sort_order(self):
+        best = self.products[0]
+        Product.objects.filter(pk=best.pk).update(rating_average=5, review_count=1)
+        response = self.client.get(reverse('product-list'), {'pagination': 'cursor', 'sort': 'rating'})
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(response.data['results'][0]['id'], best.pk)
+
+    def test_deep_page_uses_no_offset_or_count(self):
+        first = self.client.get(reverse('product-list'), {'pagination': 'cursor', 'page_size': 5}).data
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_estimated_count(self):
+        response = self.client.get(reverse('product-list'), {'count': 'estimated'})
+        self.assertEqual(response.data['count'], self.products[-1].pk)
+
+    def test_html_list_uses_cursor_links(self):
+        response = self.client.get(reverse('product-list-html'))
+        page = response.context['products']
+        self.assertEqual([p.id for p in page], self.expected[:6])
+        response = self.client.get(reverse('product-list-html'), {'cursor': page.next_cursor})
+        self.assertEqual([p.id for p in response.context['products']], self.expected[6:12])
+        self.assertFalse(response.context['products'].has_next)
+
+
+class ProductQueryCountTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='critic', password='password')
+        brand = Brand.objects.create(name="BrandQ", country="PL")
+        category = Category.objects.create(name="CatQ")
+        reviewers = [User.objects.create_user(username=f'reviewer{i}', password='password') for i in range(3)]
+        for i in range(30):
+            product = Product.objects.create(name=f"Produkt {i}", price=10, owner=self.user, brand=brand, category=category)
+            for j, reviewer in enumerate(reviewers):
+                Review.objects.create(product=product, user=reviewer, rating=j + 3, content="ok")
+
+    def test_list_query_count_is_constant(self):
+        """Lista produktów: COUNT + strona, niezależnie od rozmiaru strony"""
+        for size in (5, 30):
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('product-list'), {'page_size': size})
+            self.assertEqual(len(response.data['results']), size)
+        product = response.data['results'][0]
+        self.assertNotIn('reviews', product)
+        self.assertEqual(product['review_count'], 3)
+        self.assertEqual(product['average_rating'], 4.0)
+        self.assertEqual(product['owner'], 'critic')
+        Review.objects.filter(product_id=product['id']).delete()
+        product = self.client.get(reverse('product-list'), {'page_size': 30}).data['results'][0]
+        self.assertEqual((product['review_count'], product['average_rating']), (0, None))
+
+    def test_expanded_list_prefetches_reviews(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('product-list'), {'page_size': 30, 'expand': 'reviews'})
+        self.assertEqual(len(response.data['results'][0]['reviews']), 3)
+        self.assertEqual(response.data['results'][0]['reviews'][0]['user'], 'reviewer2')
+
+    def test_detail_query_count(self):
+        """updated_at dla ETag-a + produkt z relacjami + opinie"""
+        product = Product.objects.first()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('product-detail', args=[product.id]))
+        self.assertEqual(len(response.data['reviews']), 3)
+
+
+class OrderHistoryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='loyal', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.product = Product.objects.create(name="Sweter", price=120, owner=self.other, sku='SW-1')
+        now = timezone.now()
+        Order.objects.bulk_create([
+            Order(user=self.user, ordered_at=now - timedelta(days=i), total_price=10 * i, item_count=i)
+            for i in range(1, 26)
+        ])
+        self.latest = Order.objects.get(user=self.user, item_count=1)
+        OrderLine.objects.create(
+            order=self.latest, product=self.product, product_name="Sweter", sku='SW-1',
+            quantity=1, unit_price=Decimal('99.00'), line_total=Decimal('99.00'),
+        )
+        for i in range(12):
+            Review.objects.create(product=self.product, user=self.user, rating=5, content=f"Opinia {i}")
+
+    def test_profile_pages_orders_and_reviews(self):
+        """Profil: stała liczba zapytań i osobne kursory dla zamówień i opinii"""
+        self.client.force_login(self.user)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual([order.item_count for order in response.context['orders']], list(range(1, 11)))
+        self.assertEqual(len(response.context['reviews']), 10)
+        self.assertContains(response, "10.00 PLN")
+
+        response = self.client.get(reverse('profile') + response.context['orders_next'])
+        self.assertEqual([order.item_count for order in response.context['orders']], list(range(11, 21)))
+        self.assertEqual(len(response.context['reviews']), 10)
+        response = self.client.get(reverse('profile') + response.context['reviews_next'])
+        self.assertEqual(len(response.context['reviews']), 2)
+        self.assertEqual(response.context['orders'].object_list[0].item_count, 11)
+
+    def test_order_details_are_loaded_separately(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('order-detail-html', args=[self.latest.id]))
+        self.assertContains(response, "SW-1")
+        self.assertContains(response, "99.00 PLN")
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('order-detail-html', args=[self.latest.id])).status_code, 404)
+
+    def test_api_returns_order_history(self):
+        self.client.force_authenticate(self.user)
+        page = self.client.get(reverse('order-list')).data
+        self.assertEqual(len(page['results']), 10)
+        self.assertNotIn('items', page['results'][0])
+        self.assertEqual(self.client.get(page['next']).data['results'][0]['item_count'], 11)
+        order = self.client.get(reverse('order-detail', args=[self.latest.id])).data
+        self.assertEqual(order['items'], [{
+            'product': self.product.id, 'product_name': "Sweter", 'sku': 'SW-1',
+            'quantity': 1, 'unit_price': '99.00', 'line_total': '99.00',
+        }])
+        reviews = self.client.get(reverse('user-review-list')).data
+        self.assertEqual(reviews['results'][0]['product_name'], "Sweter")
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(reverse('order-detail', args=[self.latest.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('order-list')).data['results'], [])
+
+
+class SalesRollupTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='analyst', password='password', is_staff=True)
+        self.buyer = User.objects.create_user(username='shopper', password='password')
+        self.brand = Brand.objects.create(name="Marka", country="PL")
+        self.coats = Category.objects.create(name="Kurtki")
+        self.coat = Product.objects.create(name="Kurtka", price=200, stock_count=10, owner=self.admin, brand=self.brand, category=self.coats)
+        self.hat = Product.objects.create(name="Czapka", price=30, stock_count=10, owner=self.admin, brand=self.brand)
+        self.orders = []
+        for quantity in (1, 2):
+            cart = get_open_cart(self.buyer)
+            add_to_cart(cart, self.coat, quantity)
+            add_to_cart(cart, self.hat, 1)
+            self.orders.append(checkout_cart(cart))
+        run_pending_jobs()
+
+    def rollups(self):
+        return sorted(SalesRollup.objects.exclude(orders=0, units=0).values_list('dimension', 'key', 'status', 'orders', 'units', 'revenue'))
+
+    def test_checkout_and_status_changes_update_rollups(self):
+        """Zadanie z checkout wlicza zamówienie raz; zmiana statusu przenosi je między wierszami"""
+        self.assertIn(('total', 0, 'waiting', 2, 5, Decimal('660.00')), self.rollups())
+        self.assertIn(('brand', self.brand.id, 'waiting', 2, 5, Decimal('660.00')), self.rollups())
+        self.assertIn(('category', 0, 'waiting', 2, 2, Decimal('60.00')), self.rollups())
+        self.assertFalse(sync_order_rollup(self.orders[0].pk))
+
+        order = self.orders[1]
+        order.status = Order.Status.CANCELLED
+        order.save()
+        run_pending_jobs()
+        self.assertIn(('total', 0, 'cancelled', 1, 3, Decimal('430.00')), self.rollups())
+        self.assertIn(('product', self.coat.id, 'waiting', 1, 1, Decimal('200.00')), self.rollups())
+        incremental = self.rollups()
+        rebuild_sales_rollups(batch_size=1)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_reports_read_rollups(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get(reverse('sales-report')).status_code, 403)
+        self.client.force_authenticate(self.admin)
+        Order.objects.filter(pk=self.orders[0].pk).update(status=Order.Status.CANCELLED)
+        sync_order_rollup(self.orders[0].pk)
+        with self.assertNumQueries(2):
+            report = self.client.get(reverse('sales-report'), {'dimension': 'category'}).data
+        self.assertEqual([(row['label'], row['orders'], row['units'], row['revenue']) for row in report['results']], [
+            ("-", 1, 1, '30.00'), ("Kurtki", 1, 2, '400.00'),
+        ])
+        report = self.client.get(reverse('sales-report'), {'status': ['cancelled', 'waiting']}).data
+        self.assertEqual(report['results'][0]['revenue'], '660.00')
+        top = self.client.get(reverse('top-products-report'), {'order_by': 'revenue', 'limit': 1}).data['results']
+        self.assertEqual(top, [{
+            'product': self.coat.id, 'name': "Kurtka", 'sku': self.coat.sku, 'stock_count': 7, 'available': 7,
+            'orders': 1, 'units': 2, 'revenue': '400.00',
+        }])
+        self.assertEqual(self.client.get(reverse('sales-report'), {'start': '2026-01-01', 'end': '2025-01-01'}).status_code, 400)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, SERVER_TIMING=True)
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='budget', password='password')
+        brand = Brand.objects.create(name="BrandB", country="PL")
+        category = Category.objects.create(name="CatB")
+        reviewers = [User.objects.create_user(username=f'critic{i}', password='password') for i in range(3)]
+        self.products = [
+            Product.objects.create(name=f"Produkt {i}", price=10, stock_count=5, owner=self.owner, brand=brand, category=category, sku=f'B-{i}')
+            for i in range(10)
+        ]
+        for product in self.products[:3]:
+            for reviewer in reviewers:
+                Review.objects.create(product=product, user=reviewer, rating=4, content="ok")
+        self.client.force_login(self.owner)
+
+    def requests(self):
+        """(metoda, adres, dane) - każda nazwa adresu ze store/urls.py, w kolejności, która zostawia dane dla następnych."""
+        first, second, third = (product.pk for product in self.products[:3])
+        csv = SimpleUploadedFile('catalogue.csv', b"sku,name,price,stock_count\nB-0,Produkt 0,12,5\nB-NEW,Nowy,20,1\n", content_type='text/csv')
+        return [
+            ('get', reverse('product-list'), {}),
+            ('post', reverse('product-list'), {'name': "Nowy", 'price': '15.00', 'brand': '', 'category': ''}),
+            ('get', reverse('product-facets'), {'sale': 1}),
+            ('patch', reverse('product-bulk-update'), {'items': [{'sku': 'B-0', 'price': '11.00'}, {'sku': 'B-1', 'sale': True}]}),
+            ('post', reverse('product-stock-adjust'), {'items': [{'sku': 'B-0', 'delta': 1}, {'sku': 'B-1', 'delta': -1}]}),
+            ('post', reverse('product-import'), {'file': csv}),
+            ('get', reverse('product-export', args=['csv']), {}),
+            ('get', reverse('product-detail', args=[first]), {}),
+            ('get', reverse('product-reviews', args=[first]), {}),
+            ('post', reverse('api_token_auth'), {'username': 'budget', 'password': 'password'}),
+            ('get', reverse('welcome'), {}),
+            ('get', reverse('product-list-html'), {}),
+            ('get', reverse('product-detail-html', args=[first]), {}),
+            ('post', reverse('product-detail-html', args=[first]), {'rating': 5, 'content': "Świetny"}),
+            ('get', reverse('product-reviews-html', args=[first]), {}),
+            ('get', reverse('product-create-html'), {}),
+            ('get', reverse('register'), {}),
+            ('get', reverse('login'), {}),
+            ('get', reverse('cache-stats'), {}),
+            ('get', reverse('request-metrics'), {}),
+            ('get', reverse('add-to-cart', args=[first]), {}),
+            ('post', reverse('cart-bulk-add'), {'items': [{'product': second, 'quantity': 1}, {'product': third, 'quantity': 2}]}),
+            ('get', reverse('cart-detail'), {}),
+            ('get', lambda: reverse('remove-from-cart', args=[CartItem.objects.get(product_id=third).pk]), {}),
+            ('get', reverse('checkout'), {}),
+            ('get', reverse('profile'), {}),
+            ('get', lambda: reverse('order-detail-html', args=[Order.objects.get(user=self.owner).pk]), {}),
+            ('get', reverse('order-list'), {}),
+            ('get', lambda: reverse('order-detail', args=[Order.objects.get(user=self.owner).pk]), {}),
+            ('get', reverse('user-review-list'), {}),
+            ('get', reverse('sales-report'), {'dimension': 'category'}),
+            ('get', reverse('top-products-report'), {'order_by': 'revenue'}),
+            ('post', reverse('product-delete-html', args=[third]), {}),
+            ('post', reverse('logout'), {}),
+        ]
+
+    def test_every_view_declares_budget(self):
+        self.assertEqual(set(metric_names()) - set(QUERY_BUDGETS), set())
+
+    def test_views_stay_within_query_budget(self):
+        self.owner.is_staff = True
+        self.owner.save()
+        visited = set()
+        for method, url, data in self.requests():
+            url = url() if callable(url) else url
+            kwargs = {'content_type': 'application/json'} if method == 'patch' or 'items' in data else {}
+            if kwargs:
+                data = json.dumps(data)
+            response = getattr(self.client, method)(url, data, **kwargs)
+            self.assertLess(response.status_code, 400, url)
+            visited.add(response.resolver_match.url_name)
+        self.assertEqual(visited, set(metric_names()))
+
+    def test_over_budget_raises(self):
+        with mock.patch.dict(QUERY_BUDGETS, {'product-list': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('product-list'))
+
+    def test_metrics_header_and_endpoint(self):
+        reset_metrics()
+        response = self.client.get(reverse('product-list-html'))
+        # ETag strony kursora bez COUNT(*) - liczbę produktów szacuje osobne MAX(id).
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="5 queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertGreater(response.metrics.template_time, 0)
+        self.assertEqual(response.metrics.size, len(response.content))
+        self.owner.is_staff = True
+        self.owner.save()
+        stats = self.client.get(reverse('request-metrics')).json()
+        self.assertEqual(stats['product-list-html']['requests'], 1)
+        self.assertEqual(stats['product-list-html']['avg_queries'], 5)
+        self.assertEqual(stats['product-list-html']['query_budget'], QUERY_BUDGETS['product-list-html'])
+
+    def test_repeated_selects_are_duplicates(self):
+        """Te same SELECT-y (także z listą IN innej długości) to N+1; powtarzane UPDATE-y nie"""
+        metrics = RequestMetrics()
+        select = 'SELECT "store_review"."id" FROM "store_review" WHERE "store_review"."product_id" IN ({})'
+        metrics.queries = [(select.format(', '.join(['%s'] * n)), 0.001) for n in (1, 2, 5)]
+        metrics.queries += [('UPDATE "store_product" SET "stock_count" = %s', 0.001)] * 3
+        self.assertEqual(metrics.duplicates(), {select.format('...'): 3})
+
+
+class ProductRatingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rater', password='password')
+        self.other = User.objects.create_user(username='rater2', password='password')
+        self.product = Product.objects.create(name="Kurtka", price=200, owner=self.user)
+        self.second = Product.objects.create(name="Sweter", price=100, owner=self.user)
+
+    def snapshot(self):
+        fields = ['review_count', 'rating_sum', 'rating_average', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+        return list(Product.objects.order_by('id').values_list(*fields))
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rebuild_ratings()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_create_edit_delete_keep_aggregates(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=5, content="super")
+        Review.objects.create(product=self.product, user=self.other, rating=2, content="słabo")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.rating_average, 3.5)
+        self.assertEqual(self.product.rating_histogram(), {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+        self.assertMatchesRebuild()
+
+        review.rating = 3
+        review.save()
+        self.assertMatchesRebuild()
+
+        review.product = self.second
+        review.save()
+        self.assertMatchesRebuild()
+        self.second.refresh_from_db()
+        self.assertEqual((self.second.review_count, self.second.rating_average), (1, 3.0))
+
+        review.delete()
+        self.assertMatchesRebuild()
+        self.second.refresh_from_db()
+        self.assertEqual((self.second.review_count, self.second.rating_average), (0, 0.0))
+
+    def test_sort_by_rating(self):
+        Review.objects.create(product=self.second, user=self.user, rating=5, content="super")
+        Review.objects.create(product=self.product, user=self.user, rating=1, content="słabo")
+        response = self.client.get(reverse('product-list'), {'sort': 'rating'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.second.id, self.product.id])
+
+
+class ReviewFeedTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='feed', password='password')
+        self.product = Product.objects.create(name="Kurtka", price=200, owner=self.user)
+        reviewers = [User.objects.create_user(username=f'feed{i}', password='password') for i in range(25)]
+        self.reviews = [
+            Review.objects.create(product=self.product, user=reviewer, rating=4, content=f"opinia {i}")
+            for i, reviewer in enumerate(reviewers)
+        ]
+
+    def test_api_pages_with_cursor(self):
+        url = reverse('product-reviews', args=[self.product.id])
+        response = self.client.get(url)
+        self.assertEqual([r['content'] for r in response.data['results']], [f"opinia {i}" for i in range(24, 14, -1)])
+        seen = [r['id'] for r in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [r['id'] for r in response.data['results']]
+        self.assertEqual(seen, [r.id for r in reversed(self.reviews)])
+        self.assertEqual(self.client.get(reverse('product-reviews', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_first_page_is_cached_and_invalidated(self):
+        # Zalogowany użytkownik omija cache całych stron, więc widać sam cache opinii.
+        self.client.force_login(self.user)
+        url = reverse('product-detail-html', args=[self.product.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(any('store_review' in q['sql'] for q in queries.captured_queries))
+        self.assertEqual(len(response.context['reviews']), 10)
+
+        Review.objects.create(product=self.product, user=self.user, rating=1, content="najnowsza")
+        response = self.client.get(reverse('product-reviews-html', args=[self.product.id]))
+        self.assertContains(response, "najnowsza")
+        self.reviews[-1].delete()
+        response = self.client.get(reverse('product-reviews', args=[self.product.id]))
+        self.assertNotIn(self.reviews[-1].content, [r['content'] for r in response.data['results']])
+
+
+class AdminScaleTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='root', password='password', email='root@example.com')
+        self.client.force_login(self.admin)
+        self.brand = Brand.objects.create(name="Marka", country="PL")
+        self.category = Category.objects.create(name="Swetry")
+        self.add_rows(3)
+
+    def add_rows(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'klient{User.objects.count()}', password='password')
+            product = Product.objects.create(name=f"Sweter {user.username}", price=50, owner=self.admin, brand=self.brand, category=self.category)
+            Review.objects.create(product=product, user=user, rating=4, content="ok")
+            Order.objects.create(user=user, ordered_at=timezone.now(), total_price=50, item_count=1)
+            add_to_cart(get_open_cart(user), product, 1)
+
+    def test_changelists_do_not_query_per_row(self):
+        names = ['store_product', 'store_cart', 'store_order', 'store_review', 'auth_user']
+        urls = [reverse(f'admin:{name.split("_", 1)[0]}_{name.split("_", 1)[1]}_changelist') for name in names]
+        before = {}
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            before[url] = len(queries)
+            self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries), url)
+        self.add_rows(5)
+        for url in urls:
+            with self.assertNumQueries(before[url]):
+                self.client.get(url)
+
+    def test_product_search_uses_sku_and_full_text(self):
+        product = Product.objects.first()
+        url = reverse('admin:store_product_changelist')
+        response = self.client.get(url, {'q': product.sku.lower()})
+        self.assertEqual(list(response.context['cl'].result_list), [product])
+        response = self.client.get(url, {'q': product.name})
+        self.assertEqual(list(response.context['cl'].result_list), [product])
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'store', 'model_name': 'review', 'field_name': 'product', 'term': 'sweter',
+        })
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_user_inlines_are_capped(self):
+        user = User.objects.get(username='klient1')
+        Order.objects.bulk_create([Order(user=user, ordered_at=timezone.now(), total_price=1, item_count=1) for _ in range(30)])
+        response = self.client.get(reverse('admin:auth_user_change', args=[user.pk]))
+        formsets = {formset.formset.model: formset.formset for formset in response.context['inline_admin_formsets']}
+        self.assertEqual(len(formsets[Order].forms), 20)
+        self.assertEqual(len(formsets[Review].forms), 1)
+
+
+class CatalogCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cacher', password='password')
+        self.shirts = Category.objects.create(name="Koszule")
+        self.coats = Category.objects.create(name="Płaszcze")
+        self.shirt = Product.objects.create(name="Koszula", price=80, owner=self.user, category=self.shirts)
+        self.coat = Product.objects.create(name="Plaszcz", price=400, owner=self.user, category=self.coats)
+
+    def test_anonymous_list_is_cached_until_product_changes(self):
+        url = reverse('product-list-html')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "Koszula")
+        self.shirt.name = "Koszula lniana"
+        self.shirt.save()
+        self.assertContains(self.client.get(url), "Koszula lniana")
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_category_page_survives_changes_in_other_categories(self):
+        url = reverse('product-list')
+        params = {'category': self.shirts.id}
+        self.client.get(url, params)
+        self.coat.price = 350
+        self.coat.save()
+        with self.assertNumQueries(0):
+            self.client.get(url, params)
+        self.shirt.price = 70
+        self.shirt.save()
+        response = self.client.get(url, params)
+        self.assertEqual(response.data['results'][0]['price'], '70.00')
+
+    def test_checkout_invalidates_cached_list(self):
+        url = reverse('product-list')
+        self.shirt.stock_count = 5
+        self.shirt.save()
+        self.client.get(url)
+        cart = get_open_cart(self.user)
+        add_to_cart(cart, self.shirt, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout_cart(cart)
+        stock = {product['id']: product['stock_count'] for product in self.client.get(url).data['results']}
+        self.assertEqual(stock[self.shirt.id], 3)
+
+    def test_review_invalidates_detail_page(self):
+        url = reverse('product-detail-html', args=[self.shirt.id])
+        self.client.get(url)
+        Review.objects.create(product=self.shirt, user=self.user, rating=2, content="za mała")
+        response = self.client.get(url)
+        self.assertContains(response, "za mała")
+        self.assertEqual(response.context['average_rating'], 2.0)
+
+    def test_authenticated_requests_bypass_page_cache(self):
+        self.client.login(username='cacher', password='password')
+        url = reverse('product-list-html')
+        self.client.get(url)
+        self.shirt.name = "Koszula w kratę"
+        self.shirt.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Koszula w kratę")
+        self.assertContains(response, "Dodaj do Koszyka")
+        self.assertEqual(cache_stats()['hits'] + cache_stats()['misses'], 0)
+
+    def test_stats_endpoint_requires_staff(self):
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get(reverse('cache-stats')).data['hits'], 0)
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', password='password')
+        self.product = Product.objects.create(name="Czapka", price=40, owner=self.user)
+        self.other = Product.objects.create(name="Szalik", price=60, owner=self.user)
+
+    def test_list_returns_304_without_serializing(self):
+        url = reverse('product-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.data['count'], 2)
+        # Anonimowo odpowiada cache strony, zalogowany klient płaci jednym agregatem.
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.other.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cursor_pages_run_no_count(self):
+        self.client.force_authenticate(self.user)
+        self.client.force_login(self.user)
+        pages = [
+            (reverse('product-list'), {'pagination': 'cursor', 'page_size': 1, 'sale': '0'}),
+            (reverse('product-list-html'), {}),
+        ]
+        etags = []
+        for url, params in pages:
+            with CaptureQueriesContext(connection) as queries:
+                etags.append(self.client.get(url, params)['ETag'])
+            self.assertNotIn('COUNT(', ' '.join(query['sql'] for query in queries))
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etags[-1])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # Usunięcie starszego produktu nie zmienia MAX(updated_at) - ETag zmienia podbita wersja katalogu.
+        self.product.delete()
+        for (url, params), etag in zip(pages, etags):
+            self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_review_edit_changes_detail_etag(self):
+        url = reverse('product-detail', args=[self.product.id])
+        review = Review.objects.create(product=self.product, user=self.user, rating=4, content="ok")
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        review.content = "jednak świetna"
+        review.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_html_etag_depends_on_user(self):
+        url = reverse('product-detail-html', args=[self.product.id])
+        anonymous = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class AsyncViewsTest(TestCase):
+    """Pod ASGI (AsyncClient) te same adresy obsługują widoki async."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='async', password='password')
+        self.brand = Brand.objects.create(name="Vistula")
+        self.product = Product.objects.create(name="Czapka", price=40, owner=self.user, brand=self.brand)
+        Product.objects.create(name="Szalik", price=60, owner=self.user)
+        Review.objects.create(product=self.product, user=self.user, rating=4, content="Ciepła")
+
+    async def test_api_matches_sync_views(self):
+        for url in (reverse('product-list') + '?sale=0', reverse('product-detail', args=[self.product.id])):
+            expected = await sync_to_async(self.client.get)(url)
+            response = await self.async_client.get(url)
+            self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+            self.assertEqual(response.json(), expected.json())
+            self.assertEqual(response['ETag'], expected['ETag'])
+        # Zapytania z wątków sync_to_async i asyncio.gather też trafiają do pomiaru.
+        self.assertEqual(response.metrics.query_count, expected.metrics.query_count)
+        missing = await self.async_client.get(reverse('product-detail', args=[999999]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_list_pagination_edge_cases_match_sync_views(self):
+        url = reverse('product-list')
+        for params in ({'pagination': 'cursor', 'count': 'estimated'}, {'page': 99}):
+            expected = await sync_to_async(self.client.get)(url, params)
+            response = await self.async_client.get(url, params)
+            self.assertEqual(response.status_code, expected.status_code)
+            self.assertEqual(response.json(), expected.json())
+
+    async def test_conditional_get_and_page_cache(self):
+        url = reverse('product-detail', args=[self.product.id])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        list_url = reverse('product-list-html')
+        await self.async_client.get(list_url)
+        response = await self.async_client.get(list_url)
+        self.assertContains(response, "Szalik")
+        self.assertEqual((await sync_to_async(cache_stats)())['hits'], 1)
+
+    async def test_writes_fall_back_to_sync_views(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.post(
+            reverse('product-detail-html', args=[self.product.id]), {'rating': 5, 'content': "Super"},
+        )
+        self.assertRedirects(response, reverse('product-detail-html', args=[self.product.id]), fetch_redirect_response=False)
+        response = await self.async_client.post(
+            reverse('product-list'), {'name': "Bluza", 'price': '99.00', 'brand': '', 'category': ''},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(await Review.objects.filter(product=self.product).acount(), 2)
+
+
+class ProductImageTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=0)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='photographer', password='password')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, name='zdjecie.png', size=(800, 600)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_generates_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Bluza", price=90, owner=self.user, image=self.upload())
+        product.refresh_from_db()
+        self.assertEqual((product.image_width, product.image_height), (800, 600))
+        self.assertEqual(sorted(product.image_variants['jpeg']), ['120', '240', '480'])
+        self.assertIn('webp', product.image_variants)
+        for paths in product.image_variants.values():
+            for name in paths.values():
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+        with Image.open(os.path.join(self.media_root, product.image_variants['jpeg']['120'])) as thumbnail:
+            self.assertEqual(thumbnail.size, (120, 90))
+
+        response = self.client.get(reverse('product-detail', args=[product.id]))
+        self.assertEqual(response.data['image_variants']['jpeg'][0]['width'], 120)
+        self.assertTrue(response.data['image_variants']['jpeg'][0]['url'].startswith('http://testserver/media/'))
+        response = self.client.get(reverse('product-list-html'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, product.thumbnail_url())
+
+    def test_replacing_image_removes_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Bluza", price=90, owner=self.user, image=self.upload())
+        product.refresh_from_db()
+        old_thumbnail = os.path.join(self.media_root, product.image_variants['jpeg']['120'])
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.upload('nowe.png', (100, 100))
+            product.save()
+        product.refresh_from_db()
+        self.assertFalse(os.path.exists(old_thumbnail))
+        self.assertEqual(list(product.image_variants['jpeg']), ['100'])
+
+    def test_backfill_command(self):
+        product = Product.objects.create(name="Bluza", price=90, owner=self.user, image=self.upload())
+        self.assertEqual(Product.objects.get(pk=product.pk).image_variants, {})
+        out = StringIO()
+        call_command('build_image_variants', workers=1, stdout=out)
+        self.assertIn("1 z 1", out.getvalue())
+        self.assertIn('jpeg', Product.objects.get(pk=product.pk).image_variants)
+
+
+class ProductImportExportTest(APITestCase):
+    CSV = (
+        "sku,name,price,stock_count,size,fabric,gender,colors,sale,brand,category\n"
+        ",Koszula,99.90,5,M,C,M,B,true,Vistula,Koszule\n"
+        ",Bluza,120,3,L,C,N,B,false,vistula,\n"
+        ",Kurtka,-5,1,M,C,N,B,false,,\n"
+        ",Sweter,80,1,M,C,N,B,false,Nieznana,\n"
+        ",Sweter 2,80,1,M,C,N,B,false,,\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='supplier', password='password')
+        self.other = User.objects.create_user(username='competitor', password='password')
+        self.brand = Brand.objects.create(name="Vistula", country="PL")
+        self.category = Category.objects.create(name="Koszule")
+
+    def test_csv_import_with_row_errors(self):
+        report = import_products(StringIO(self.CSV), 'csv', self.user, batch_size=2)
+        self.assertEqual((report.created, report.updated, report.error_count), (2, 0, 3))
+        self.assertEqual([error['line'] for error in report.errors], [4, 5, 6])
+        self.assertIn('price', report.errors[0]['errors'])
+        self.assertIn('brand', report.errors[1]['errors'])
+        self.assertIn('name', report.errors[2]['errors'])
+        self.assertFalse(report.as_dict()['truncated'])
+
+        shirt = Product.objects.get(name="Koszula")
+        self.assertEqual((shirt.brand, shirt.category, shirt.sale), (self.brand, self.category, True))
+        self.assertTrue(shirt.sku.startswith('M-C-B-M-'))
+        self.assertEqual(len(shirt.sku), len('M-C-B-M-') + 8)
+        self.assertEqual(Product.objects.get(name="Bluza").brand, self.brand)
+        self.assertEqual([p.name for p in search_products(Product.objects.all(), "koszula")], ["Koszula"])
+        stored = sorted(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'))
+        rebuild_facet_counts()
+        self.assertEqual(stored, sorted(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count')))
+
+    def test_error_report_is_flagged_when_truncated(self):
+        with mock.patch('store.importer.MAX_REPORTED_ERRORS', 2):
+            report = import_products(StringIO(self.CSV), 'csv', self.user).as_dict()
+        self.assertEqual((report['error_count'], len(report['errors']), report['truncated']), (3, 2, True))
+
+    def test_jsonl_updates_existing_skus_of_owner_only(self):
+        mine = Product.objects.create(name="Czapka", price=30, owner=self.user, sku='CAP-1')
+        theirs = Product.objects.create(name="Szalik", price=50, owner=self.other, sku='SCARF-1')
+        lines = [
+            '{"sku": "cap-1", "stock_count": 40, "category": "Koszule"}',
+            '{"sku": "SCARF-1", "stock_count": 0}',
+            'nie json',
+        ]
+        report = import_products(StringIO('\n'.join(lines)), 'jsonl', self.user)
+        self.assertEqual((report.created, report.updated, report.error_count), (0, 1, 2))
+        mine.refresh_from_db()
+        self.assertEqual((mine.stock_count, mine.price, mine.category), (40, Decimal('30.00'), self.category))
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.stock_count, 1)
+
+    def test_api_export_round_trip(self):
+        import_products(StringIO(self.CSV), 'csv', self.user)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('product-export', args=['csv']))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        exported = b''.join(response.streaming_content)
+        self.assertIn(b'Koszula,,M,M,C,B,99.90,5,True,Vistula,Koszule', exported)
+
+        upload = SimpleUploadedFile('catalogue.csv', exported, content_type='text/csv')
+        response = self.client.post(reverse('product-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('product-export', args=['xml'])).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductBulkUpdateTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='warehouse', password='password')
+        self.other = User.objects.create_user(username='stranger', password='password')
+        self.cap = Product.objects.create(name="Czapka", price=30, stock_count=10, owner=self.user, sku='CAP-1')
+        self.scarf = Product.objects.create(name="Szalik", price=50, stock_count=5, owner=self.user, sku='SCARF-1')
+        self.foreign = Product.objects.create(name="Rękawiczki", price=40, stock_count=5, owner=self.other, sku='GLOVE-1')
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_patch_uses_single_update(self):
+        items = [
+            {'sku': 'cap-1', 'price': '25.00', 'sale': True},
+            {'sku': 'SCARF-1', 'stock_count': 0},
+            {'sku': 'GLOVE-1', 'stock_count': 0},
+            {'sku': 'NOPE', 'stock_count': 1},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse('product-bulk-update'), {'items': items}, format='json')
+        self.assertEqual([r['updated'] for r in response.data['results']], [True, True, False, False])
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "store_product"') for q in queries.captured_queries), 1)
+        self.cap.refresh_from_db()
+        self.assertEqual((self.cap.price, self.cap.sale, self.cap.stock_count), (Decimal('25.00'), True, 10))
+        self.assertEqual(Product.objects.get(sku='SCARF-1').stock_count, 0)
+        self.assertEqual(Product.objects.get(sku='GLOVE-1').stock_count, 5)
+        self.assertEqual(FacetCount.objects.get(facet='sale', value='1').count, 1)
+        stored = sorted(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'))
+        rebuild_facet_counts()
+        self.assertEqual(stored, sorted(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count')))
+
+    def test_bulk_patch_rejects_invalid_rows(self):
+        response = self.client.patch(reverse('product-bulk-update'), {'items': [{'sku': 'CAP-1'}, {'sku': 'CAP-1', 'price': '-1'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['items']), 2)
+
+    def test_adjust_stock_by_delta(self):
+        items = [{'sku': 'CAP-1', 'delta': -3}, {'sku': 'CAP-1', 'delta': -2}, {'sku': 'SCARF-1', 'delta': -6}, {'sku': 'GLOVE-1', 'delta': 1}]
+        response = self.client.post(reverse('product-stock-adjust'), {'items': items}, format='json')
+        results = {r['sku']: r for r in response.data['results']}
+        self.assertEqual(results['CAP-1'], {'sku': 'CAP-1', 'updated': True, 'stock_count': 5})
+        self.assertFalse(results['SCARF-1']['updated'])
+        self.assertFalse(results['GLOVE-1']['updated'])
+        self.assertEqual(list(Product.objects.order_by('id').values_list('stock_count', flat=True)), [5, 5, 5])
@@ -5,19 +5,81 @@ from django.contrib.auth.views import LoginView, LogoutView
 
 urlpatterns = [
     path('products/', views.ProductList.as_view(), name='product-list'),
+    path('products/facets/', views.ProductFacetList.as_view(), name='product-facets'),
+    path('products/bulk/', views.ProductBulkUpdate.as_view(), name='product-bulk-update'),
+    path('products/stock/', views.ProductStockAdjust.as_view(), name='product-stock-adjust'),
+    path('products/import/', views.ProductImport.as_view(), name='product-import'),
+    path('products/export/<str:file_format>/', views.ProductExport.as_view(), name='product-export'),
     path('products/<int:pk>/', views.ProductDetail.as_view(), name='product-detail'),
+    path('products/<int:pk>/reviews/', views.ProductReviewList.as_view(), name='product-reviews'),
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
     path('welcome/', views.welcome_view, name='welcome'),
     path('html/products/', views.product_list_html, name='product-list-html'),
     path('html/products/<int:id>/', views.product_detail_html, name='product-detail-html'),
+    path('html/products/<int:id>/reviews/', views.product_reviews_html, name='product-reviews-html'),
     path('html/products/add/', views.product_create_html, name='product-create-html'),
     path('html/products/<int:id>/delete/', views.product_delete_html, name='product-delete-html'),
     path('accounts/login/', LoginView.as_view(template_name='store/registration/login.html'), name='login'),
     path('accounts/logout/', LogoutView.as_view(next_page='product-list-html'), name='logout'),
     path('accounts/register/', views.register_view, name='register'),
     path('cart/', views.cart_detail_view, name='cart-detail'),
+    path('cart/items/', views.CartBulkAdd.as_view(), name='cart-bulk-add'),
     path('cart/add/<int:product_id>/', views.add_to_cart_view, name='add-to-cart'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart_view, name='remove-from-cart'),
+    path('cache/stats/', views.CacheStats.as_view(), name='cache-stats'),
+    path('metrics/', views.RequestMetrics.as_view(), name='request-metrics'),
     path('checkout/', views.checkout, name='checkout'),
     path('profile/', views.profile_view, name='profile'),
-]
\ No newline at end of file
+    path('profile/orders/<int:id>/', views.order_detail_html, name='order-detail-html'),
+    path('orders/', views.OrderList.as_view(), name='order-list'),
+    path('orders/<int:pk>/', views.OrderDetail.as_view(), name='order-detail'),
+    path('reviews/mine/', views.UserReviewList.as_view(), name='user-review-list'),
+    path('reports/sales/', views.SalesReport.as_view(), name='sales-report'),
+    path('reports/top-products/', views.TopProductsReport.as_view(), name='top-products-report'),
+]
+
+# Maksymalna liczba zapytań SQL na żądanie, dla zalogowanego użytkownika (sesja i użytkownik
+# to 2 zapytania, SAVEPOINT-y też się liczą). Egzekwowane w testach (QueryBudgetTest),
+# w produkcji przekroczenie trafia do logu store.instrumentation. Słownik zamiast liczby
+# to osobne budżety dla metod; metody spoza słownika nie mają budżetu. Adresy operujące
+# na wielu pozycjach (import, koszyk, checkout) mają budżet na kilka pozycji - każda
+# pozycja to warunkowy UPDATE stanu.
+QUERY_BUDGETS = {
+    # Zapis produktu aktualizuje liczniki faset i indeks wyszukiwania.
+    'product-list': {'GET': 4, 'POST': 20},
+    # Pierwsze żądanie z filtrami: osobny GROUP BY dla każdej fasety; powtórzone czyta
+    # liczniki z cache (facets.facet_counts) i kosztuje tyle co sama lista.
+    'product-facets': 11,
+    'product-bulk-update': 11,
+    'product-stock-adjust': 6,
+    'product-import': 24,
+    'product-export': 2,
+    'product-detail': 5,
+    'product-reviews': 4,
+    'api_token_auth': 7,
+    'welcome': 0,
+    'product-list-html': 5,
+    'product-detail-html': {'GET': 5, 'POST': 8},
+    'product-reviews-html': 2,
+    'product-create-html': 5,
+    # Kasowanie kaskadowe; pozycje zamówień tracą tylko odnośnik do produktu (UPDATE).
+    'product-delete-html': 19,
+    'login': 8,
+    'logout': 4,
+    'register': 8,
+    'cart-detail': 4,
+    'cart-bulk-add': 33,
+    'add-to-cart': 23,
+    'remove-from-cart': 14,
+    'cache-stats': 2,
+    'request-metrics': 2,
+    # Zamówienie i jego pozycje to dwa INSERT-y niezależnie od liczby pozycji.
+    'checkout': 15,
+    'profile': 4,
+    'order-detail-html': 4,
+    'order-list': 3,
+    'order-detail': 4,
+    'user-review-list': 3,
+    'sales-report': 3,
+    'top-products-report': 3,
+}
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import async_views
+
+# Adresy i nazwy jak w urls.py - pod ASGI te wzorce są dopasowywane pierwsze.
+urlpatterns = [
+    path('products/', async_views.product_list, name='product-list'),
+    path('products/<int:pk>/', async_views.product_detail, name='product-detail'),
+    path('html/products/', async_views.product_list_html, name='product-list-html'),
+    path('html/products/<int:id>/', async_views.product_detail_html, name='product-detail-html'),
+]
@@ -2,80 +2,253 @@ from django.shortcuts import render, get_object_or_404, redirect
 from rest_framework import generics, permissions, status
 from .forms import ProductForm, ReviewForm
 from .models import Product, Category, Brand, Cart, CartItem, Review
-from .serializers import ProductSerializer
+from .serializers import (
+    ProductSerializer, ProductListSerializer, CartBulkAddSerializer, ReviewSerializer,
+    ProductBulkUpdateSerializer, StockAdjustSerializer, OrderSerializer, OrderSummarySerializer, UserReviewSerializer,
+    SalesSeriesParamsSerializer, SalesRowSerializer, TopProductsParamsSerializer, TopProductSerializer,
+)
 from .permissions import IsOwnerOrReadOnly
+from .caching import attach_versions, cache_anonymous_page, cache_stats, detail_scopes, list_scopes
+from .instrumentation import request_metrics
+from .conditional import conditional_detail, conditional_list, known_list_count
+from .exporter import EXPORT_CONTENT_TYPES, export_products
+from .facets import facet_counts
+from .filters import custom_ordering, filter_products, param_values, sort_products
+from .history import (
+    OrderKeysetPagination, UserReviewPagination, order_detail, order_page, user_orders, user_review_page, user_reviews,
+)
+from .importer import IMPORT_FORMATS, import_products
+from .pagination import ProductPagination, ProductKeysetPagination, cursor_requested, estimate_count, keyset_page
+from .reservations import OutOfStock, hold_stock
+from .reviews import ReviewKeysetPagination, product_reviews, review_page
+from .rollups import sales_report, top_products
+from .services import (
+    checkout_cart, get_open_cart, add_to_cart, add_many_to_cart, remove_from_cart, CheckoutError,
+    bulk_update_products, adjust_stock,
+)
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
 from django.contrib import messages
-from django.db.models import Avg
+from django.utils.decorators import method_decorator
 from django.core.paginator import Paginator
-from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.response import Response
 
 
-class ProductPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+class KeysetPaginationMixin:
+    """
+    ?cursor=... (albo ?pagination=cursor) przełącza listę na stronicowanie kursorem.
+    Z ?q=... albo ?sort=... lista zostaje przy numerach stron, żeby nie gubić ich kolejności.
+    """
 
-class ProductList(generics.ListCreateAPIView):
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if cursor_requested(self.request.query_params):
+                self._paginator = ProductKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+class ProductListMixin(KeysetPaginationMixin):
+    """
+    Wspólny queryset list produktów: relacje w jednym JOIN-ie, oceny zapisane na produkcie
+    zamiast pełnej listy opinii; ?expand=reviews dołącza opinie jednym dodatkowym zapytaniem.
+    ?sort=rating i wyszukiwanie ?q=... zawsze stronicowane są numerami stron (kursor idzie po dacie).
+    """
+
+    def expand_reviews(self):
+        return 'reviews' in param_values(self.request.query_params, 'expand')
+
+    def get_queryset(self):
+        queryset = filter_products(Product.objects.with_relations(), self.request.query_params)
+        queryset = sort_products(queryset, self.request.query_params)
+        if self.expand_reviews():
+            return queryset.with_reviews()
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method in permissions.SAFE_METHODS and not self.expand_reviews():
+            return ProductListSerializer
+        return ProductSerializer
+
+class ProductList(ProductListMixin, generics.ListCreateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = ProductPagination
 
+    @method_decorator([
+        cache_anonymous_page(lambda request: list_scopes(request.GET)), conditional_list(keyset=cursor_requested),
+    ])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-    def get_queryset(self):
-        queryset = Product.objects.all()
-        name_param = self.request.query_params.get('name', None)
-        if name_param:
-            queryset = queryset.filter(name__icontains=name_param)
-        return queryset
-    
+class ProductFacetList(ProductListMixin, generics.ListAPIView):
+    """Lista produktów zawężona filtrami wraz z licznikami każdej fasety."""
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ProductPagination
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = facet_counts(request.query_params)
+        return response
+
 class ProductDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all()
+    queryset = Product.objects.with_relations().with_reviews()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
+    @method_decorator(conditional_detail())
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class ProductReviewList(generics.ListAPIView):
+    """Opinie produktu od najnowszych, stronicowane kursorem (?cursor=..., ?page_size=...)."""
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ReviewKeysetPagination
+
+    def get_queryset(self):
+        if not Product.objects.filter(pk=self.kwargs['pk']).exists():
+            raise Http404
+        return product_reviews(self.kwargs['pk'])
+
+class ProductBulkUpdate(generics.GenericAPIView):
+    """PATCH listy {sku, stock_count, price, sale} - zmiany wielu produktów w jednej transakcji."""
+    serializer_class = ProductBulkUpdateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def patch(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_update_products(request.user, serializer.validated_data['items'])
+        return Response({'results': results})
+
+class ProductStockAdjust(generics.GenericAPIView):
+    """POST listy {sku, delta} - zmiana stanów magazynowych o podane różnice."""
+    serializer_class = StockAdjustSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = adjust_stock(request.user, serializer.validated_data['items'])
+        return Response({'results': results})
+
+class ProductImport(generics.GenericAPIView):
+    """
+    Import katalogu z pliku CSV lub JSONL (pole file; format z pola file_format albo
+    z rozszerzenia). Produkty z istniejącym SKU są aktualizowane, pozostałe tworzone.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ["Brak pliku."]}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            return Response({'file_format': [f"Obsługiwane formaty: {', '.join(IMPORT_FORMATS)}."]}, status=status.HTTP_400_BAD_REQUEST)
+        report = import_products(upload, file_format, request.user)
+        return Response(report.as_dict())
+
+class ProductExport(generics.GenericAPIView):
+    """Strumieniowy eksport katalogu (csv albo jsonl), z tymi samymi filtrami co lista."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, file_format):
+        if file_format not in EXPORT_CONTENT_TYPES:
+            raise Http404
+        products = filter_products(Product.objects.all(), request.query_params)
+        response = StreamingHttpResponse(export_products(products, file_format), content_type=EXPORT_CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
+class CacheStats(generics.GenericAPIView):
+    """Liczniki trafień i chybień cache stron katalogu (tylko dla administracji)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+class RequestMetrics(generics.GenericAPIView):
+    """Średnie czasy, liczby zapytań i rozmiary odpowiedzi dla każdego adresu sklepu (tylko dla administracji)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(request_metrics())
+
 def welcome_view(request):
     return render(request, 'store/welcome.html')
 
+def html_cursor(params):
+    """Lista HTML idzie kursorem, chyba że to wyniki wyszukiwania albo sortowanie po ocenie."""
+    return not custom_ordering(params)
+
+@cache_anonymous_page(lambda request: list_scopes(request.GET))
+@conditional_list(per_user=True, keyset=html_cursor)
 def product_list_html(request):
-    products = Product.objects.all()
-    query = request.GET.get('q')
-    if query:
-        products = products.filter(name__icontains=query)
-    paginator = Paginator(products, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return render(request, 'store/product-list.html', product_list_context(request))
 
-    return render(request, 'store/product-list.html', {'products': page_obj})
+def product_list_context(request):
+    products = filter_products(Product.objects.all(), request.GET)
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page', None)
+    context = {'query_string': params.urlencode()}
+    if not html_cursor(request.GET):
+        # Wyniki wyszukiwania (trafność) i sortowanie po ocenie zostają przy numerach stron.
+        paginator = Paginator(sort_products(products, request.GET), 6)
+        context['products'] = paginator.get_page(request.GET.get('page'))
+    else:
+        context['products'] = keyset_page(products, request.GET.get('cursor'), 6)
+        count = known_list_count(request)
+        context['estimated_count'] = estimate_count(products) if count is None else count
+    attach_versions(context['products'])
+    return context
 
+@cache_anonymous_page(lambda request, id: detail_scopes(id))
+@conditional_detail('id', per_user=True)
 def product_detail_html(request, id):
     product = get_object_or_404(Product, pk=id)
-    form = ReviewForm()
-    if request.method == 'POST' and request.user.is_authenticated:
-        form = ReviewForm(request.POST)
-        if form.is_valid():
-            review = form.save(commit=False)
-            review.product = product
-            review.user = request.user
-            review.save()
-            return redirect('product-detail-html', id=id)
-        else:
-            form = ReviewForm()
-    reviews = product.reviews.all().order_by('-created_at')
-    average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-    context = {
+    if submit_review(request, product):
+        return redirect('product-detail-html', id=id)
+    reviews = review_page(product.id, request.GET.get('cursor'))
+    return render(request, 'store/product-detail.html', product_detail_context(product, reviews))
+
+def submit_review(request, product):
+    """Zapisuje opinię z formularza POST; zwraca True, gdy została dodana."""
+    if request.method != 'POST' or not request.user.is_authenticated:
+        return False
+    form = ReviewForm(request.POST)
+    if not form.is_valid():
+        return False
+    review = form.save(commit=False)
+    review.product = product
+    review.user = request.user
+    review.save()
+    return True
+
+def product_detail_context(product, reviews):
+    return {
         'product': product,
         'reviews': reviews,
-        'form': form,
-        'average_rating': average_rating
+        'form': ReviewForm(),
+        'average_rating': product.rating_average if product.review_count else None
     }
-    return render(request, 'store/product-detail.html', context)
+
+def product_reviews_html(request, id):
+    """Sam fragment listy opinii - kolejne strony doczytywane kursorem."""
+    product = get_object_or_404(Product.objects.only('id'), pk=id)
+    reviews = review_page(product.id, request.GET.get('cursor'))
+    return render(request, 'store/reviews/page.html', {'product': product, 'reviews': reviews})
 
 @login_required
 def product_create_html(request):
@@ -116,55 +289,156 @@ def register_view(request):
 @login_required
 def add_to_cart_view(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    if product.stock_count <= 0:
+    cart = get_open_cart(request.user)
+    try:
+        with transaction.atomic():
+            hold_stock(cart, product)
+            add_to_cart(cart, product)
+    except OutOfStock:
         messages.warning(request, "Brak produktu na stanie")
         return redirect('product-list-html')
-    cart, created = Cart.objects.get_or_create(user=request.user, is_ordered=False)
-    cart_item, item_created = CartItem.objects.get_or_create(cart=cart, product=product)
-    if not item_created:
-        cart_item.quantity += 1
-        cart_item.save()
     return redirect('cart-detail')
 
+class CartBulkAdd(generics.GenericAPIView):
+    """Dodaje wiele produktów do koszyka w jednym żądaniu."""
+    serializer_class = CartBulkAddSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = serializer.validated_data['items']
+        products = Product.objects.in_bulk({line['product'] for line in lines})
+
+        cart = get_open_cart(request.user)
+        results = []
+        accepted = []
+        with transaction.atomic():
+            for line in lines:
+                product = products.get(line['product'])
+                if product is None:
+                    results.append({'product': line['product'], 'added': False, 'error': "Produkt nie istnieje"})
+                    continue
+                try:
+                    hold_stock(cart, product, line['quantity'])
+                except OutOfStock:
+                    results.append({'product': line['product'], 'added': False, 'error': "Brak produktu na stanie"})
+                else:
+                    accepted.append((product, line['quantity']))
+                    results.append({'product': line['product'], 'added': True, 'quantity': line['quantity']})
+            add_many_to_cart(cart, accepted)
+        cart.refresh_from_db(fields=['total_price', 'item_count'])
+        response_status = status.HTTP_200_OK if accepted else status.HTTP_400_BAD_REQUEST
+        return Response({
+            'cart': cart.id,
+            'total_price': cart.total_price,
+            'item_count': cart.item_count,
+            'items': results,
+        }, status=response_status)
+
 @login_required
 def remove_from_cart_view(request, item_id):
     cart = get_object_or_404(Cart, user=request.user, is_ordered=False)
     item = get_object_or_404(CartItem, id=item_id, cart=cart)
-    item.delete()
+    remove_from_cart(cart, item)
     return redirect('cart-detail')
 
 @login_required
 def cart_detail_view(request):
-    cart, created = Cart.objects.get_or_create(user=request.user, is_ordered=False)
-    return render(request, 'store/cart/detail.html', {'cart': cart})
+    cart = get_open_cart(request.user)
+    items = cart.cart_items.select_related('product')
+    return render(request, 'store/cart/detail.html', {'cart': cart, 'items': items})
 
 @login_required
 def checkout(request):
     cart = Cart.objects.filter(user=request.user, is_ordered=False).first()
     if not cart:
         return redirect('product-list-html')
-    items = cart.cart_items.all()
-    for item in items:
-        if item.product.stock_count < item.quantity:
+    try:
+        checkout_cart(cart)
+    except CheckoutError as error:
+        for item in error.failed_items:
             messages.error(request, f"Niestety, produkt {item.product.name} jest już niedostępny w tej ilości.")
-            return redirect('cart-detail')
-    for item in items:
-        item.product.stock_count -= item.quantity
-        item.product.save()
-        
-    if cart:
-        cart.is_ordered = True
-        cart.ordered_at = timezone.now()
-        cart.save()
-        Cart.objects.create(user=request.user, is_ordered=False)
+        return redirect('cart-detail')
+    except Cart.DoesNotExist:
+        pass
     return redirect('product-list-html')
 
 @login_required
 def profile_view(request):
-    orders = Cart.objects.filter(user=request.user, is_ordered=True).prefetch_related('cart_items__product').order_by('-ordered_at')
-    reviews = Review.objects.filter(user=request.user).select_related('product').order_by('-created_at')
+    """Strona historii zamówień i opinii; obie listy stronicowane niezależnie (?orders=..., ?reviews=...)."""
+    orders = order_page(request.user, request.GET.get('orders'))
+    reviews = user_review_page(request.user, request.GET.get('reviews'))
+
+    def link(param, cursor):
+        params = request.GET.copy()
+        params[param] = cursor
+        return f'?{params.urlencode()}'
+
     context = {
         'orders': orders,
         'reviews': reviews,
+        'orders_next': orders.has_next and link('orders', orders.next_cursor),
+        'orders_previous': orders.has_previous and link('orders', orders.previous_cursor),
+        'reviews_next': reviews.has_next and link('reviews', reviews.next_cursor),
+        'reviews_previous': reviews.has_previous and link('reviews', reviews.previous_cursor),
     }
-    return render(request, 'store/profile.html', context)
\ No newline at end of file
+    return render(request, 'store/profile.html', context)
+
+@login_required
+def order_detail_html(request, id):
+    return render(request, 'store/orders/detail.html', {'order': order_detail(request.user, id)})
+
+class OrderList(generics.ListAPIView):
+    """Zamówienia zalogowanego użytkownika od najnowszych - podsumowania, stronicowane kursorem."""
+    serializer_class = OrderSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderKeysetPagination
+
+    def get_queryset(self):
+        return user_orders(self.request.user)
+
+class OrderDetail(generics.RetrieveAPIView):
+    """Zamówienie z pozycjami; cudze zamówienia dają 404."""
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self):
+        return order_detail(self.request.user, self.kwargs['pk'])
+
+class UserReviewList(generics.ListAPIView):
+    """Opinie zalogowanego użytkownika od najnowszych, stronicowane kursorem."""
+    serializer_class = UserReviewSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserReviewPagination
+
+    def get_queryset(self):
+        return user_reviews(self.request.user)
+
+class SalesReport(generics.GenericAPIView):
+    """Sprzedaż dzień po dniu z dziennych sum (rollups.py), łącznie albo dla produktów, marek, kategorii (tylko dla administracji)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = SalesSeriesParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        rows = sales_report(query['start'], query['end'], query['dimension'], query['status'], query.get('key'))
+        return Response({
+            'start': query['start'], 'end': query['end'], 'dimension': query['dimension'],
+            'results': SalesRowSerializer(rows, many=True).data,
+        })
+
+class TopProductsReport(generics.GenericAPIView):
+    """Najlepiej sprzedające się produkty w okresie, z bieżącym stanem magazynowym (tylko dla administracji)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = TopProductsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        rows = top_products(query['start'], query['end'], query['status'], query['order_by'], query['limit'])
+        return Response({
+            'start': query['start'], 'end': query['end'],
+            'results': TopProductSerializer(rows, many=True).data,
+        })